@@ -0,0 +1,340 @@
+import argparse
+import contextlib
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import types
+
+FUNCTION_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cert-expiry-function")
+sys.path.insert(0, FUNCTION_DIRECTORY)
+
+import oci
+from oci.certificates_management.models import CertificateCollection, CertificateSummary, CertificateSubject, \
+    CertificateSubjectAlternativeName, CertificateVersionSummary, Validity
+from oci.identity.models import RegionSubscription, Tenancy
+from oci.resource_search.models import ResourceSummary, ResourceSummaryCollection
+from oci_certificates import OCICertificates
+from certificate_index import ExpiryIndex
+from client_pool import ClientPool
+from request_scheduler import RequestScheduler
+from oci_topic import StubNotificationClient
+
+TENANCY_ID = "ocid1.tenancy.oc1..simulated"
+COMPARTMENT_ID = "ocid1.compartment.oc1..simulated{0}"
+CERTIFICATE_ID = "ocid1.certificate.oc1.{0}.simulated{1}"
+# Rough size of one serialized certificate summary for the response_bytes counters
+CERTIFICATE_BYTES = 700
+
+
+##########################################################################
+# Synthetic tenancy served page by page from the certificate number, so
+# the inventory is never held in memory by the stubs. Certificate i is in
+# region i % regions and compartment (i // regions) % compartments and
+# expires somewhere between a year ago and a year from now
+##########################################################################
+class SimulatedTenancy:
+
+    def __init__(self, regions=40, compartments=2000, certificates=100000, page_size=100, latency_seconds=0.0):
+        self.regions = [(f"sim-region-{number}", f"R{number:02d}") for number in range(regions)]
+        self.compartments = compartments
+        self.certificates = certificates
+        self.page_size = page_size
+        self.latency_seconds = latency_seconds
+        self.now = datetime.datetime.now(datetime.timezone.utc)
+        self.__region_numbers = {}
+        for number, (region_name, region_key) in enumerate(self.regions):
+            self.__region_numbers[region_name] = number
+            self.__region_numbers[region_key] = number
+
+    def get_description(self):
+        return {"regions": len(self.regions), "compartments": self.compartments, "certificates": self.certificates,
+                "page_size": self.page_size, "latency_seconds": self.latency_seconds}
+
+    def create_client(self, name, region):
+        if name == "identity":
+            return SimulatedIdentityClient(self)
+        if name == "resource_search":
+            return SimulatedSearchClient(self, self.__region_numbers[region])
+        if name == "certificates_management":
+            return SimulatedCertificatesClient(self, self.__region_numbers[region])
+        if name == "notification":
+            return StubNotificationClient()
+        raise ValueError(f"No simulated client for {name}")
+
+    ##########################################################################
+    # Returns the certificate numbers of a compartment in a region
+    ##########################################################################
+    def get_certificate_numbers(self, region_number, compartment_number):
+        stride = len(self.regions) * self.compartments
+        return range(region_number + len(self.regions) * compartment_number, self.certificates, stride)
+
+    def get_common_name(self, number):
+        return f"host{number}.example.com"
+
+    def create_summary(self, number):
+        region_key = self.regions[number % len(self.regions)][1].lower()
+        not_after = self.now + datetime.timedelta(days=(number * 7919) % 730 - 365)
+        return CertificateSummary(
+            id=CERTIFICATE_ID.format(region_key, number),
+            name=f"certificate{number}",
+            compartment_id=COMPARTMENT_ID.format((number // len(self.regions)) % self.compartments),
+            lifecycle_state="ACTIVE",
+            config_type="IMPORTED",
+            time_created=self.now,
+            subject=CertificateSubject(common_name=self.get_common_name(number)),
+            current_version_summary=CertificateVersionSummary(
+                version_number=1,
+                serial_number=format(number, 'x'),
+                subject_alternative_names=[CertificateSubjectAlternativeName(type="DNS", value=f"alt{number}.example.com")],
+                validity=Validity(time_of_validity_not_before=self.now - datetime.timedelta(days=365),
+                                  time_of_validity_not_after=not_after)))
+
+    ##########################################################################
+    # Returns one page as an SDK Response after the call latency. Only the
+    # page's items are built into models by create_item
+    ##########################################################################
+    def create_response(self, values, page, create_item, collection, item_bytes):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        start = int(page) if page else 0
+        end = start + self.page_size
+        items = [create_item(value) for value in values[start:end]]
+        headers = {"content-length": str(item_bytes * len(items))}
+        if end < len(values):
+            headers['opc-next-page'] = str(end)
+        return oci.response.Response(200, headers, collection(items=items), None)
+
+
+class SimulatedIdentityClient:
+
+    def __init__(self, tenancy):
+        self.__tenancy = tenancy
+
+    def get_tenancy(self, tenancy_id, **kwargs):
+        return oci.response.Response(200, {}, Tenancy(id=tenancy_id, name="simulated",
+                                                      home_region_key=self.__tenancy.regions[0][1]), None)
+
+    def list_region_subscriptions(self, tenancy_id, **kwargs):
+        return oci.response.Response(200, {}, [
+            RegionSubscription(region_name=region_name, region_key=region_key, status="READY", is_home_region=number == 0)
+            for number, (region_name, region_key) in enumerate(self.__tenancy.regions)], None)
+
+
+class SimulatedSearchClient:
+
+    def __init__(self, tenancy, region_number):
+        self.__tenancy = tenancy
+        self.__region_number = region_number
+        self.__numbers = None
+
+    def search_resources(self, search_details, page=None, **kwargs):
+        tenancy = self.__tenancy
+        region_key = tenancy.regions[self.__region_number][1].lower()
+        if self.__numbers is None:
+            self.__numbers = [number for compartment in range(tenancy.compartments)
+                              for number in tenancy.get_certificate_numbers(self.__region_number, compartment)]
+
+        def create_item(number):
+            return ResourceSummary(identifier=CERTIFICATE_ID.format(region_key, number), resource_type="Certificate",
+                                   compartment_id=COMPARTMENT_ID.format((number // len(tenancy.regions)) % tenancy.compartments))
+        return tenancy.create_response(self.__numbers, page, create_item, ResourceSummaryCollection, 200)
+
+
+class SimulatedCertificatesClient:
+
+    def __init__(self, tenancy, region_number):
+        self.__tenancy = tenancy
+        self.__region_number = region_number
+
+    def list_certificates(self, compartment_id=None, page=None, **kwargs):
+        tenancy = self.__tenancy
+        compartment = int(compartment_id[len(COMPARTMENT_ID.format("")):])
+        numbers = tenancy.get_certificate_numbers(self.__region_number, compartment)
+        return tenancy.create_response(numbers, page, tenancy.create_summary, CertificateCollection, CERTIFICATE_BYTES)
+
+
+##########################################################################
+# Stand in for RegionalClientFactory handing out simulated clients
+##########################################################################
+class SimulatedClientFactory:
+
+    def __init__(self, tenancy):
+        self.__tenancy = tenancy
+
+    def get_home_region(self):
+        return self.__tenancy.regions[0][0]
+
+    def get_tenancy_id(self):
+        return TENANCY_ID
+
+    def get_client(self, name, client_class, region):
+        return self.__tenancy.create_client(name, region)
+
+
+##########################################################################
+# ClientPool for func.handler whose credentials and clients are simulated
+##########################################################################
+class SimulatedClientPool(ClientPool):
+
+    def __init__(self, tenancy):
+        super().__init__()
+        self.__tenancy = tenancy
+
+    def get_credentials(self, factory, max_age_seconds=None):
+        return super().get_credentials(
+            lambda: ({"region": self.__tenancy.regions[0][0], "tenancy": TENANCY_ID}, types.SimpleNamespace()),
+            max_age_seconds)
+
+    def get_client(self, name, region, factory):
+        return super().get_client(name, region, lambda: self.__tenancy.create_client(name, region))
+
+
+class SimulatedContext:
+
+    def __init__(self, config):
+        self.__config = config
+
+    def Config(self):
+        return self.__config
+
+    def SetResponseHeaders(self, headers, status_code):
+        pass
+
+
+##########################################################################
+# Input: function to benchmark, number of runs and the number of items
+# each run processes
+# Action: runs the function silently, timed runs first and then one run
+# under tracemalloc for its peak memory
+# Returns: dict with the median seconds, throughput and peak memory
+##########################################################################
+def measure(func, runs, items):
+    seconds = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            seconds.append(time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            func()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    median = statistics.median(seconds)
+    return {
+        "median_seconds": round(median, 4),
+        "min_seconds": round(min(seconds), 4),
+        "items": items,
+        "items_per_second": round(items / median, 1) if median else None,
+        "peak_memory_mb": round(peak_bytes / 1024 / 1024, 2)}
+
+
+def run_benchmark(tenancy, runs, max_workers, lookups):
+    factory = SimulatedClientFactory(tenancy)
+    report = {"python": platform.python_version(), "tenancy": tenancy.get_description(),
+              "max_workers": max_workers, "runs": runs, "benchmarks": {}}
+    benchmarks = report['benchmarks']
+
+    # The simulated tenancy never throttles, calls are only limited by max_workers
+    def collect():
+        scheduler = RequestScheduler(rate_per_second=1e9, burst=10 ** 9, initial_concurrency=max_workers,
+                                     max_concurrency=max_workers)
+        return OCICertificates(config={}, signer=None, client_factory=factory, max_workers=max_workers,
+                               scheduler=scheduler)
+    benchmarks['collection'] = measure(collect, runs, tenancy.certificates)
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        oci_certs = collect()
+    names = [tenancy.get_common_name(random.randrange(tenancy.certificates)) for _ in range(lookups)]
+
+    def lookup():
+        for name in names:
+            oci_certs.get_oci_certificates_with_cname(name)
+    benchmarks['cname_lookup'] = measure(lookup, runs, lookups)
+
+    def filter_expiry():
+        index = ExpiryIndex(oci_certs.get_oci_certificates())
+        index.get_buckets((7, 14, 30, 60), datetime.datetime.now(datetime.timezone.utc))
+        oci_certs.get_oci_certificates_by_expiry_bucket()
+    benchmarks['expiry_filter'] = measure(filter_expiry, runs, tenancy.certificates)
+
+    try:
+        import func
+    except ImportError as e:
+        print(f"Skipping the handler benchmark, the function dependencies are not installed: {e}")
+        return report
+    # The handler logs every run, only its warnings and errors are kept
+    logging.disable(logging.INFO)
+    context = SimulatedContext({"TOPIC_OCID": "ocid1.onstopic.oc1..simulated", "MAX_WORKERS": str(max_workers),
+                                "DEDUPLICATE_ALERTS": "false", "API_REQUESTS_PER_SECOND": "1000000000"})
+
+    def handle():
+        # A new pool per run so every run is a cold invocation
+        func.CLIENT_POOL = SimulatedClientPool(tenancy)
+        func.handler(context)
+    benchmarks['handler'] = measure(handle, runs, tenancy.certificates)
+    return report
+
+
+##########################################################################
+# Input: current report, baseline report and allowed regression percent
+# Action: prints the change in median time of each benchmark
+# Returns: True if every benchmark is within the allowed percent
+##########################################################################
+def compare_to_baseline(report, baseline, max_regression_percent):
+    within = True
+    for name, result in report['benchmarks'].items():
+        baseline_result = baseline.get('benchmarks', {}).get(name)
+        if not baseline_result:
+            print(f"  new  {name}: {result['median_seconds']}s")
+            continue
+        change = (result['median_seconds'] - baseline_result['median_seconds']) / baseline_result['median_seconds'] * 100
+        memory_change = result['peak_memory_mb'] - baseline_result['peak_memory_mb']
+        print(f"  {name}: {baseline_result['median_seconds']}s -> {result['median_seconds']}s ({change:+.1f}%), "
+              f"peak memory {memory_change:+.2f}MB")
+        if change > max_regression_percent:
+            within = False
+    return within
+
+
+def get_parser_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark collection against a simulated tenancy")
+    parser.add_argument('--regions', type=int, default=40, help="Number of subscribed regions")
+    parser.add_argument('--compartments', type=int, default=2000, help="Number of compartments")
+    parser.add_argument('--certificates', type=int, default=100000, help="Number of certificates")
+    parser.add_argument('--page-size', dest='page_size', type=int, default=100, help="Items per list page")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds each simulated API call takes")
+    parser.add_argument('--max-workers', dest='max_workers', type=int, default=8, help="Collection worker threads")
+    parser.add_argument('--lookups', type=int, default=10000, help="Number of cname lookups to time")
+    parser.add_argument('--runs', type=int, default=3, help="Number of timed runs of each benchmark")
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    parser.add_argument('--baseline', help="Compare against a report written by a previous release")
+    parser.add_argument('--max-regression', dest='max_regression', type=float, default=10.0,
+                        help="Exit non zero when a benchmark's median time regresses by more than this percent")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_parser_arguments()
+    random.seed(0)
+    simulated_tenancy = SimulatedTenancy(regions=args.regions, compartments=args.compartments,
+                                         certificates=args.certificates, page_size=args.page_size,
+                                         latency_seconds=args.latency)
+    report = run_benchmark(simulated_tenancy, args.runs, args.max_workers, args.lookups)
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, 'w') as report_file:
+            json.dump(report, report_file, indent=4)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if not compare_to_baseline(report, baseline, args.max_regression):
+            sys.exit(1)
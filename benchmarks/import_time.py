@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+FUNCTION_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cert-expiry-function")
+
+TIMING_SCRIPT = "import time; start = time.perf_counter(); import {0}; print(time.perf_counter() - start)"
+
+
+##########################################################################
+# Input: module name and the directory to import it from
+# Action: imports the module in a fresh interpreter
+# Returns: seconds spent importing the module
+##########################################################################
+def measure_import_seconds(module, directory):
+    result = subprocess.run([sys.executable, "-c", TIMING_SCRIPT.format(module)],
+                            cwd=directory, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+##########################################################################
+# Input: module name and the directory to import it from
+# Action: imports the module in a fresh interpreter with -X importtime
+# Returns: dict of imported module to cumulative microseconds and depth
+##########################################################################
+def measure_import_tree(module, directory):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=directory, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            cumulative_us = int(fields[1])
+        except (IndexError, ValueError):
+            # Header line
+            continue
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = {"cumulative_us": cumulative_us, "depth": depth}
+    return modules
+
+
+##########################################################################
+# Input: module, directory, number of runs and number of modules to report
+# Action: one untimed warm up import to compile bytecode, then timed runs
+# Returns: report dict with median import time and the slowest imports
+# of the module and of its direct dependencies
+##########################################################################
+def run_benchmark(module, directory, runs, top):
+    measure_import_seconds(module, directory)
+    seconds = [measure_import_seconds(module, directory) for _ in range(runs)]
+
+    trees = [measure_import_tree(module, directory) for _ in range(runs)]
+    cumulative = {}
+    for tree in trees:
+        for name, values in tree.items():
+            if values['depth'] <= 1:
+                cumulative.setdefault(name, []).append(values['cumulative_us'])
+    slowest = sorted(((statistics.median(values) / 1000, name) for name, values in cumulative.items()), reverse=True)
+
+    return {
+        "module": module,
+        "python": platform.python_version(),
+        "runs": runs,
+        "median_seconds": round(statistics.median(seconds), 4),
+        "min_seconds": round(min(seconds), 4),
+        "max_seconds": round(max(seconds), 4),
+        "slowest_imports_ms": {name: round(milliseconds, 2) for milliseconds, name in slowest[:top]}
+    }
+
+
+##########################################################################
+# Input: current report, baseline report and allowed regression percent
+# Action: prints the change in median import time against the baseline
+# Returns: True if the regression is within the allowed percent
+##########################################################################
+def compare_to_baseline(report, baseline, max_regression_percent):
+    change = (report['median_seconds'] - baseline['median_seconds']) / baseline['median_seconds'] * 100
+    print(f"Median import time {report['median_seconds']}s, baseline {baseline['median_seconds']}s ({change:+.1f}%)")
+    for name, milliseconds in report['slowest_imports_ms'].items():
+        baseline_milliseconds = baseline.get('slowest_imports_ms', {}).get(name)
+        if baseline_milliseconds is None:
+            print(f"  new  {name}: {milliseconds}ms")
+        elif milliseconds - baseline_milliseconds > 1:
+            print(f"  slower {name}: {baseline_milliseconds}ms -> {milliseconds}ms")
+    return change <= max_regression_percent
+
+
+def get_parser_arguments():
+    parser = argparse.ArgumentParser(description="Measure the cold start import time of the expiry function")
+    parser.add_argument('--module', default='func', help="Module to import (default func)")
+    parser.add_argument('--directory', default=FUNCTION_DIRECTORY, help="Directory to import the module from")
+    parser.add_argument('--runs', type=int, default=5, help="Number of timed imports")
+    parser.add_argument('--top', type=int, default=15, help="Number of slowest imports to report")
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    parser.add_argument('--baseline', help="Compare against a report written by a previous release")
+    parser.add_argument('--max-regression', dest='max_regression', type=float, default=10.0,
+                        help="Exit non zero when the median import time regresses by more than this percent")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_parser_arguments()
+    report = run_benchmark(args.module, args.directory, args.runs, args.top)
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, 'w') as report_file:
+            json.dump(report, report_file, indent=4)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if not compare_to_baseline(report, baseline, args.max_regression):
+            sys.exit(1)
@@ -0,0 +1,134 @@
+import json
+import math
+import sqlite3
+import time
+from contextlib import closing
+
+
+##########################################################################
+# Alert state kept as one JSON document in a certificate cache backend,
+# so it lives next to the inventory cache in a local directory or an
+# Object Storage bucket
+##########################################################################
+class JsonAlertStateStore:
+
+    def __init__(self, backend, key="alert-state.json"):
+        self.__backend = backend
+        self.__key = key
+
+    ##########################################################################
+    # Returns a dict of certificate id to the last alert sent for it,
+    # {"threshold": days, "expiration_date": str, "notified_at": epoch}
+    ##########################################################################
+    def load(self):
+        data = self.__backend.read(self.__key)
+        if data is None:
+            return {}
+        try:
+            return json.loads(data)
+        except ValueError:
+            print(f"Discarding unreadable alert state {self.__key}")
+            return {}
+
+    def save(self, notified, resolved_ids):
+        state = self.load()
+        state.update(notified)
+        for certificate_id in resolved_ids:
+            state.pop(certificate_id, None)
+        self.__backend.write(self.__key, json.dumps(state).encode('utf8'))
+
+
+##########################################################################
+# Alert state kept in a SQLite database, one row per certificate
+##########################################################################
+class SqliteAlertStateStore:
+
+    def __init__(self, path):
+        self.__path = path
+        with closing(self.__connect()) as connection, connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS alert_state (certificate_id TEXT PRIMARY KEY, "
+                               "threshold INTEGER, expiration_date TEXT, notified_at REAL)")
+
+    def __connect(self):
+        return sqlite3.connect(self.__path)
+
+    def load(self):
+        with closing(self.__connect()) as connection, connection:
+            rows = connection.execute(
+                "SELECT certificate_id, threshold, expiration_date, notified_at FROM alert_state").fetchall()
+        return {certificate_id: {"threshold": threshold, "expiration_date": expiration_date, "notified_at": notified_at}
+                for certificate_id, threshold, expiration_date, notified_at in rows}
+
+    def save(self, notified, resolved_ids):
+        with closing(self.__connect()) as connection, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO alert_state VALUES (?, ?, ?, ?)",
+                [(certificate_id, entry['threshold'], entry['expiration_date'], entry['notified_at'])
+                 for certificate_id, entry in notified.items()])
+            connection.executemany("DELETE FROM alert_state WHERE certificate_id = ?",
+                                   [(certificate_id,) for certificate_id in resolved_ids])
+
+
+##########################################################################
+# Decides which near expiry alerts to publish against an alert state store.
+# A certificate is alerted when it is new to the state, when it moved into
+# a tighter threshold than the one it was last alerted at, or when its
+# expiration date changed. Certificates that were collected and are no
+# longer near expiry are dropped from the state so they alert again if
+# they come back. A certificate missing from the collection, because its
+# region or compartment failed or was filtered out, keeps its state until
+# it has not been notified for missing_retention_seconds
+##########################################################################
+class AlertTracker:
+
+    def __init__(self, store, missing_retention_seconds=30 * 86400):
+        self.__store = store
+        self.__missing_retention_seconds = missing_retention_seconds
+        self.__state = store.load()
+        self.__current = {}
+        self.__resolved_ids = set()
+
+    ##########################################################################
+    # Takes: near expiry records, a dict of certificate id to its expiry
+    # bucket threshold in days and the ids of every certificate collected
+    # from a region without errors
+    # Returns: the records to publish, in record order
+    ##########################################################################
+    def select(self, records, thresholds_by_id, collected_ids):
+        self.__current = {record['id']: (thresholds_by_id.get(record['id']), record['expiration_date'])
+                          for record in records}
+        current_ids = set(self.__current)
+        notified_ids = set(self.__state)
+        alert_ids = current_ids - notified_ids
+        for certificate_id in current_ids & notified_ids:
+            threshold, expiration_date = self.__current[certificate_id]
+            previous = self.__state[certificate_id]
+            if expiration_date != previous['expiration_date'] or \
+                    self.__threshold_key(threshold) < self.__threshold_key(previous['threshold']):
+                alert_ids.add(certificate_id)
+        collected_ids = set(collected_ids)
+        missing_before = time.time() - self.__missing_retention_seconds
+        self.__resolved_ids = {certificate_id for certificate_id in notified_ids - current_ids
+                               if certificate_id in collected_ids or
+                               self.__state[certificate_id]['notified_at'] < missing_before}
+        print(f"{len(alert_ids)} of {len(current_ids)} near expiry certificates are new or escalated")
+        return [record for record in records if record['id'] in alert_ids]
+
+    ##########################################################################
+    # Records the published records in the state store and drops resolved ones
+    ##########################################################################
+    def commit(self, published_records):
+        notified_at = time.time()
+        notified = {}
+        for record in published_records:
+            threshold, expiration_date = self.__current[record['id']]
+            notified[record['id']] = {"threshold": threshold, "expiration_date": expiration_date,
+                                      "notified_at": notified_at}
+        self.__store.save(notified, self.__resolved_ids)
+        self.__state.update(notified)
+        for certificate_id in self.__resolved_ids:
+            self.__state.pop(certificate_id, None)
+
+    # Certificates beyond the largest threshold have none and rank least urgent
+    def __threshold_key(self, threshold):
+        return math.inf if threshold is None else threshold
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import tempfile
+import oci
+
+
+##########################################################################
+# Cache backend storing each entry as a file in a local directory.
+# Writes go through a temporary file so a reader never sees a partial entry
+##########################################################################
+class LocalFileCacheBackend:
+
+    def __init__(self, directory):
+        self.__directory = directory
+        os.makedirs(self.__directory, exist_ok=True)
+
+    def read(self, key):
+        try:
+            with open(os.path.join(self.__directory, key), 'rb') as cache_file:
+                return cache_file.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, key, data):
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.__directory, prefix=".tmp-")
+        try:
+            with os.fdopen(file_descriptor, 'wb') as cache_file:
+                cache_file.write(data)
+            os.replace(temp_path, os.path.join(self.__directory, key))
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    def delete(self, key):
+        try:
+            os.remove(os.path.join(self.__directory, key))
+        except FileNotFoundError:
+            pass
+
+    def list_keys(self, prefix=""):
+        return [name for name in os.listdir(self.__directory)
+                if name.startswith(prefix) and not name.startswith(".tmp-")]
+
+
+##########################################################################
+# Cache backend storing each entry as an object in an Object Storage bucket
+##########################################################################
+class ObjectStorageCacheBackend:
+
+    def __init__(self, config, signer, bucket_name, namespace=None, prefix="certificate-cache/", client=None):
+        self.__client = client if client else oci.object_storage.ObjectStorageClient(config, signer=signer)
+        self.__bucket_name = bucket_name
+        self.__namespace = namespace if namespace else self.__client.get_namespace().data
+        self.__prefix = prefix
+
+    def read(self, key):
+        try:
+            return self.__client.get_object(self.__namespace, self.__bucket_name, self.__prefix + key).data.content
+        except oci.exceptions.ServiceError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def write(self, key, data):
+        self.__client.put_object(self.__namespace, self.__bucket_name, self.__prefix + key, data)
+
+    def delete(self, key):
+        try:
+            self.__client.delete_object(self.__namespace, self.__bucket_name, self.__prefix + key)
+        except oci.exceptions.ServiceError as e:
+            if e.status != 404:
+                raise
+
+    def list_keys(self, prefix=""):
+        objects = oci.pagination.list_call_get_all_results(
+            self.__client.list_objects, self.__namespace, self.__bucket_name,
+            prefix=self.__prefix + prefix).data.objects
+        return [item.name[len(self.__prefix):] for item in objects]
+
+
+##########################################################################
+# Per region certificate inventory cache on top of a backend.
+# An entry younger than its region's TTL is fresh and used as is, an older
+# one is the baseline for an incremental refresh and one older than
+# max_age_seconds is evicted so the region is collected from scratch
+##########################################################################
+class CertificateInventoryCache:
+
+    def __init__(self, backend, ttl_seconds=3600, region_ttls=None, max_age_seconds=86400):
+        self.__backend = backend
+        self.__ttl_seconds = ttl_seconds
+        self.__region_ttls = region_ttls if region_ttls else {}
+        self.__max_age_seconds = max_age_seconds
+
+    def __key(self, tenancy_id, region):
+        return f"{tenancy_id}.{region}.json"
+
+    def get_region_ttl(self, region):
+        return self.__region_ttls.get(region, self.__ttl_seconds)
+
+    ##########################################################################
+    # Returns the cached entry for a region or None if missing or evicted.
+    # An entry is a dict of region, fetched_at epoch seconds and the
+    # serialized certificates
+    ##########################################################################
+    def load_region(self, tenancy_id, region):
+        key = self.__key(tenancy_id, region)
+        try:
+            data = self.__backend.read(key)
+        except Exception as e:
+            print(f"Failed to read cache entry {key}: {e}")
+            return None
+        if data is None:
+            return None
+        try:
+            entry = json.loads(data)
+        except ValueError:
+            self.__backend.delete(key)
+            return None
+        if self.__max_age_seconds is not None and self.get_age(entry) > self.__max_age_seconds:
+            self.__backend.delete(key)
+            return None
+        return entry
+
+    def get_age(self, entry):
+        return time.time() - entry['fetched_at']
+
+    def is_fresh(self, entry):
+        return self.get_age(entry) < self.get_region_ttl(entry['region'])
+
+    def save_region(self, tenancy_id, region, fetched_at, certificates):
+        entry = {"region": region, "fetched_at": fetched_at, "certificates": certificates}
+        try:
+            self.__backend.write(self.__key(tenancy_id, region), json.dumps(entry).encode('utf8'))
+        except Exception as e:
+            print(f"Failed to write cache entry for {region}: {e}")
+
+    ##########################################################################
+    # Deletes the entries of regions the tenancy is no longer subscribed to
+    ##########################################################################
+    def evict_regions(self, tenancy_id, keep_regions):
+        keep_keys = {self.__key(tenancy_id, region) for region in keep_regions}
+        for key in self.__backend.list_keys(prefix=tenancy_id + "."):
+            if key not in keep_keys:
+                self.__backend.delete(key)
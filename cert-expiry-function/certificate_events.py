@@ -0,0 +1,177 @@
+import json
+import sys
+
+# OCI Events type prefix of the Certificates service
+EVENT_TYPE_PREFIX = "com.oraclecloud.certificatesmanagement."
+
+# Events that take a certificate out of the inventory, every other
+# certificate event re-reads the certificate from OCI. A certificate
+# scheduled for deletion stays in the inventory as PENDING_DELETION, as it
+# does when collected
+DELETE_EVENTS = {"deletecertificate"}
+UPSERT_EVENTS = {"createcertificate", "updatecertificate", "changecertificatecompartment",
+                 "schedulecertificatedeletion", "cancelcertificatedeletion", "createcertificateversion",
+                 "updatecertificateversion", "schedulecertificateversiondeletion", "cancelcertificateversiondeletion"}
+
+
+##########################################################################
+# Input: an event in the OCI Events JSON format
+# Returns: {"action", "certificate_id", "event_type", "event_id",
+# "event_time"} with action upsert or delete, None when the event is not
+# about a certificate or is the begin event of a long running operation
+##########################################################################
+def parse_certificate_event(event):
+    event_type = (event.get('eventType') or "").lower()
+    if not event_type.startswith(EVENT_TYPE_PREFIX):
+        return None
+    name = event_type[len(EVENT_TYPE_PREFIX):]
+    if name.endswith(".begin"):
+        return None
+    if name.endswith(".end"):
+        name = name[:-len(".end")]
+    if name in DELETE_EVENTS:
+        action = "delete"
+    elif name in UPSERT_EVENTS:
+        action = "upsert"
+    else:
+        return None
+    data = event.get('data') or {}
+    certificate_id = data.get('resourceId') or ""
+    if not certificate_id.startswith("ocid1.certificate."):
+        # Version events may name the version, the certificate is in the details
+        certificate_id = (data.get('additionalDetails') or {}).get('certificateId') or ""
+    if not certificate_id.startswith("ocid1.certificate."):
+        return None
+    return {"action": action, "certificate_id": certificate_id, "event_type": event.get('eventType'),
+            "event_id": event.get('eventID'), "event_time": event.get('eventTime')}
+
+
+##########################################################################
+# Input: text stream of events, a JSON array, one event per line or
+# pretty printed events one after another
+# Returns: generator of event dicts, read as the stream is read so stdin
+# can be followed. Brackets outside strings are counted so lines are only
+# decoded once they close every value they open
+##########################################################################
+def read_events(stream):
+    decoder = json.JSONDecoder()
+    lines = []
+    depth = 0
+    in_string = False
+    escaped = False
+    for line in stream:
+        lines.append(line)
+        for char in line:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in '{[':
+                depth += 1
+            elif char in '}]':
+                depth -= 1
+        if depth > 0 or in_string:
+            # The value continues on the next line
+            continue
+        buffer = "".join(lines).strip()
+        lines = []
+        depth = 0
+        while buffer:
+            try:
+                value, end = decoder.raw_decode(buffer)
+            except ValueError:
+                print(f"Discarding malformed event: {buffer[:80]}")
+                break
+            buffer = buffer[end:].lstrip()
+            for event in (value if isinstance(value, list) else [value]):
+                yield event
+    if "".join(lines).strip():
+        print(f"Discarding incomplete event at end of stream: {''.join(lines).strip()[:80]}")
+
+
+##########################################################################
+# Input: path of an events file, - for stdin
+# Returns: generator of event dicts, a file holding a JSON array is
+# loaded in one go
+##########################################################################
+def read_events_from_file(path):
+    if path == "-":
+        yield from read_events(sys.stdin)
+        return
+    with open(path, 'r') as events_file:
+        first_char = events_file.read(1)
+        while first_char.isspace():
+            first_char = events_file.read(1)
+        events_file.seek(0)
+        if first_char == "[":
+            yield from json.load(events_file)
+        else:
+            yield from read_events(events_file)
+
+
+##########################################################################
+# Applies certificate events to an OCICertificates inventory one at a
+# time. A delete removes the certificate, any other change re-reads the
+# certificate so its validity and names are current, only that one
+# certificate is updated in the indexes. Events are applied in the order
+# they are read, a failed event is reported and the rest still applied
+##########################################################################
+class CertificateEventProcessor:
+
+    def __init__(self, oci_certificates):
+        self.__oci_certificates = oci_certificates
+        self.__changed_regions = set()
+        self.__stats = {"events": 0, "ignored": 0, "upserted": 0, "removed": 0, "unchanged": 0, "failed": 0}
+
+    ##########################################################################
+    # Returns: {"status", "certificate_id", "action"} with status ignored,
+    # upserted, removed, unchanged or failed, and the error when failed
+    ##########################################################################
+    def apply(self, event):
+        self.__stats['events'] += 1
+        parsed = parse_certificate_event(event) if isinstance(event, dict) else None
+        if parsed is None:
+            self.__stats['ignored'] += 1
+            return {"status": "ignored", "certificate_id": None, "action": None}
+        result = {"status": "unchanged", "certificate_id": parsed['certificate_id'], "action": parsed['action']}
+        try:
+            record = None
+            if parsed['action'] == "upsert":
+                record = self.__oci_certificates.fetch_certificate_record(parsed['certificate_id'])
+            if record is not None:
+                changed = self.__oci_certificates.upsert_certificate(record)
+                status = "upserted"
+            else:
+                # Deleted, or already gone by the time it was read
+                changed = self.__oci_certificates.remove_certificate(parsed['certificate_id'])
+                status = "removed"
+        except Exception as e:
+            print(f"Failed to apply {parsed['event_type']} for {parsed['certificate_id']}: {e}")
+            self.__stats['failed'] += 1
+            return dict(result, status="failed", error=str(e))
+        if changed:
+            result['status'] = status
+            self.__changed_regions.add(self.__oci_certificates.get_region_name(parsed['certificate_id'].split(".")[3]))
+        self.__stats[result['status']] += 1
+        return result
+
+    ##########################################################################
+    # Returns: generator of results, one per event, as each is applied
+    ##########################################################################
+    def apply_events(self, events):
+        for event in events:
+            yield self.apply(event)
+
+    ##########################################################################
+    # Returns the names of the regions changed by applied events
+    ##########################################################################
+    def get_changed_regions(self):
+        return set(self.__changed_regions)
+
+    def get_stats(self):
+        return dict(self.__stats)
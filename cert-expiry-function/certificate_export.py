@@ -0,0 +1,162 @@
+import glob
+import json
+import os
+import time
+import uuid
+
+# Columnar export is optional, only NDJSON is available without pyarrow
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Columns of each exported dataset, in order
+CERTIFICATE_COLUMNS = ("id", "name", "compartment_id", "region", "common_name", "not_after", "lifecycle_state",
+                       "sans", "serial_number", "collected_at")
+NEAR_EXPIRY_COLUMNS = ("id", "link", "expiration_date", "region", "compartment_id", "collected_at")
+
+
+##########################################################################
+# Input: OCICertificates, region name and the export time in epoch seconds
+# Returns: generator of certificate rows of the region, one flat dict per
+# certificate with not_after and collected_at as epoch seconds
+##########################################################################
+def iter_certificate_rows(oci_certificates, region, collected_at):
+    for cert in oci_certificates.get_certificate_index().get_by_region(region):
+        yield {"id": cert.id, "name": cert.name, "compartment_id": cert.compartment_id, "region": region,
+               "common_name": cert.common_name, "not_after": cert.not_after, "lifecycle_state": cert.lifecycle_state,
+               "sans": list(cert.sans), "serial_number": cert.serial_number, "collected_at": collected_at}
+
+
+##########################################################################
+# Input: OCICertificates
+# Returns: dict of region name to its near expiry records, grouped in one
+# pass over the near expiry list
+##########################################################################
+def group_near_expiry_records(oci_certificates):
+    records_by_region = {}
+    for record in oci_certificates.get_oci_certificates_near_expiration():
+        records_by_region.setdefault(record['region'], []).append(record)
+    return records_by_region
+
+
+def iter_near_expiry_rows(records, collected_at):
+    for record in records:
+        yield dict(record, collected_at=collected_at)
+
+
+##########################################################################
+# Writes datasets as partitioned directories, one directory per region:
+#   <directory>/<dataset>/region=<region>/part-<collected_at>-<uuid>.<format>
+# so a region is exported again on its own and readers such as pyarrow,
+# DuckDB or Spark scan the whole dataset with region as a partition
+# column. Without append a region's previous parts are replaced once the
+# new part is complete, with append they are kept as history. Rows are
+# written in batches of batch_size so memory stays bounded.
+# format is ndjson, parquet or arrow, the last two need pyarrow
+##########################################################################
+class CertificateExporter:
+    __extensions = {"ndjson": "ndjson", "parquet": "parquet", "arrow": "arrow"}
+
+    def __init__(self, directory, format="ndjson", batch_size=10000, append=False):
+        if format not in self.__extensions:
+            raise ValueError(f"Unknown export format {format}, use one of {', '.join(self.__extensions)}")
+        if format != "ndjson" and pyarrow is None:
+            raise ImportError(f"pyarrow is required to export {format}")
+        self.__directory = directory
+        self.__format = format
+        self.__batch_size = max(1, int(batch_size))
+        self.__append = append
+
+    ##########################################################################
+    # Exports the certificates and near expiry certificates of regions, all
+    # collected regions when None
+    # Returns: dict of region to the number of certificate rows written
+    ##########################################################################
+    def export(self, oci_certificates, regions=None):
+        collected_at = int(time.time())
+        regions = oci_certificates.get_regions() if regions is None else \
+            [oci_certificates.get_region_name(region) for region in regions]
+        near_expiry_records = group_near_expiry_records(oci_certificates)
+        counts = {}
+        for region in regions:
+            if region is None:
+                continue
+            counts[region] = self.write_region(
+                "certificates", region, iter_certificate_rows(oci_certificates, region, collected_at), collected_at)
+            self.write_region(
+                "near_expiry", region, iter_near_expiry_rows(near_expiry_records.get(region, []), collected_at),
+                collected_at)
+        return counts
+
+    ##########################################################################
+    # Writes rows as a new part of a region's partition of a dataset
+    # Returns: number of rows written
+    ##########################################################################
+    def write_region(self, dataset, region, rows, collected_at=None):
+        collected_at = int(time.time()) if collected_at is None else collected_at
+        partition = os.path.join(self.__directory, dataset, f"region={region}")
+        os.makedirs(partition, exist_ok=True)
+        extension = self.__extensions[self.__format]
+        # The uuid keeps parts written within the same second apart
+        name = f"part-{collected_at}-{uuid.uuid4().hex}.{extension}"
+        path = os.path.join(partition, name)
+        # Written under a hidden temporary name so readers never scan a partial part
+        temporary_path = os.path.join(partition, f".{name}.tmp")
+        columns = CERTIFICATE_COLUMNS if dataset == "certificates" else NEAR_EXPIRY_COLUMNS
+        try:
+            if self.__format == "ndjson":
+                count = self.__write_ndjson(temporary_path, rows)
+            else:
+                count = self.__write_arrow(temporary_path, rows, self.__get_schema(columns))
+        except Exception:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        os.replace(temporary_path, path)
+        if not self.__append:
+            for previous_path in glob.glob(os.path.join(partition, f"part-*.{extension}")):
+                if previous_path != path:
+                    os.remove(previous_path)
+        return count
+
+    def __write_ndjson(self, path, rows):
+        count = 0
+        with open(path, 'w') as ndjson_file:
+            for row in rows:
+                ndjson_file.write(json.dumps(row) + "\n")
+                count += 1
+        return count
+
+    def __write_arrow(self, path, rows, schema):
+        count = 0
+        if self.__format == "parquet":
+            writer = pyarrow.parquet.ParquetWriter(path, schema)
+        else:
+            writer = pyarrow.ipc.new_file(path, schema)
+        try:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= self.__batch_size:
+                    writer.write_batch(self.__to_record_batch(batch, schema))
+                    count += len(batch)
+                    batch = []
+            if batch or not count:
+                writer.write_batch(self.__to_record_batch(batch, schema))
+                count += len(batch)
+        finally:
+            writer.close()
+        return count
+
+    # Epoch seconds convert directly to the second resolution timestamps
+    def __to_record_batch(self, rows, schema):
+        return pyarrow.RecordBatch.from_pydict(
+            {field.name: [row.get(field.name) for row in rows] for field in schema}, schema=schema)
+
+    def __get_schema(self, columns):
+        timestamp = pyarrow.timestamp("s", tz="UTC")
+        types = {"not_after": timestamp, "collected_at": timestamp, "sans": pyarrow.list_(pyarrow.string())}
+        return pyarrow.schema([(column, types.get(column, pyarrow.string())) for column in columns])
@@ -0,0 +1,176 @@
+import bisect
+import datetime
+
+
+##########################################################################
+# In memory lookup tables over a collected CertificateRecord inventory.
+# Names are matched case insensitively, certificates are kept in
+# inventory order within each lookup. Compartments and regions hold their
+# certificates in a dict by id so a single certificate is added or removed
+# in O(1), names hold the few certificates sharing them in a list
+##########################################################################
+class CertificateIndex:
+
+    def __init__(self, certificates, region_name_from_key):
+        self.__region_name_from_key = region_name_from_key
+        self.__by_id = {}
+        self.__by_common_name = {}
+        self.__by_san = {}
+        self.__by_compartment = {}
+        self.__by_region = {}
+        for cert in certificates:
+            self.add(cert)
+
+    ##########################################################################
+    # Adds a certificate to every lookup table
+    ##########################################################################
+    def add(self, cert):
+        self.__by_id[cert.id] = cert
+        for table, key in self.__get_name_keys(cert):
+            table.setdefault(key, []).append(cert)
+        for table, key in self.__get_group_keys(cert):
+            table.setdefault(key, {})[cert.id] = cert
+
+    ##########################################################################
+    # Removes a certificate from every lookup table, the record must be the
+    # one that was added
+    ##########################################################################
+    def remove(self, cert):
+        self.__by_id.pop(cert.id, None)
+        for table, key in self.__get_name_keys(cert):
+            certs = [named for named in table.get(key, []) if named.id != cert.id]
+            if certs:
+                table[key] = certs
+            else:
+                table.pop(key, None)
+        for table, key in self.__get_group_keys(cert):
+            certs = table.get(key)
+            if certs is not None:
+                certs.pop(cert.id, None)
+                if not certs:
+                    del table[key]
+
+    def __get_name_keys(self, cert):
+        keys = [(self.__by_san, san) for san in {san.lower() for san in cert.sans}]
+        if cert.common_name:
+            keys.append((self.__by_common_name, cert.common_name.lower()))
+        return keys
+
+    def __get_group_keys(self, cert):
+        return [(self.__by_compartment, cert.compartment_id),
+                (self.__by_region, self.__region_name_from_key(cert.region_key))]
+
+    def get_by_id(self, certificate_id):
+        return self.__by_id.get(certificate_id)
+
+    ##########################################################################
+    # Returns every certificate in the order it was added
+    ##########################################################################
+    def get_all(self):
+        return list(self.__by_id.values())
+
+    def get_by_common_name(self, common_name):
+        return self.__by_common_name.get(common_name.lower(), [])
+
+    def get_by_san(self, name):
+        return self.__by_san.get(name.lower(), [])
+
+    ##########################################################################
+    # Returns the certificates with the name as common name or SAN
+    ##########################################################################
+    def get_by_name(self, name):
+        key = name.lower()
+        results = list(self.__by_common_name.get(key, []))
+        seen = {cert.id for cert in results}
+        results.extend(cert for cert in self.__by_san.get(key, []) if cert.id not in seen)
+        return results
+
+    def get_by_compartment(self, compartment_id):
+        return list(self.__by_compartment.get(compartment_id, {}).values())
+
+    def get_by_region(self, region_name):
+        return list(self.__by_region.get(region_name, {}).values())
+
+    ##########################################################################
+    # Bulk lookups, one pass over the names returning a dict of name to matches
+    ##########################################################################
+    def get_by_common_names(self, common_names):
+        return {name: self.get_by_common_name(name) for name in common_names}
+
+    def get_by_names(self, names):
+        return {name: self.get_by_name(name) for name in names}
+
+    def __len__(self):
+        return len(self.__by_id)
+
+
+##########################################################################
+# CertificateRecords sorted by not_after. Window queries are
+# answered by bisection and every expiry bucket is sliced in one pass.
+# Single certificates are added and removed by bisection as well.
+# Certificates without validity are not indexed
+##########################################################################
+class ExpiryIndex:
+
+    def __init__(self, certificates):
+        entries = []
+        for cert in certificates:
+            if cert.not_after is not None:
+                entries.append((cert.not_after, len(entries), cert))
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+        self.__not_after = [entry[0] for entry in entries]
+        self.__certificates = [entry[2] for entry in entries]
+
+    ##########################################################################
+    # Inserts a certificate after those with the same not_after
+    ##########################################################################
+    def add(self, cert):
+        if cert.not_after is None:
+            return
+        position = bisect.bisect_right(self.__not_after, cert.not_after)
+        self.__not_after.insert(position, cert.not_after)
+        self.__certificates.insert(position, cert)
+
+    ##########################################################################
+    # Removes a certificate, the record must be the one that was added
+    ##########################################################################
+    def remove(self, cert):
+        if cert.not_after is None:
+            return
+        position = bisect.bisect_left(self.__not_after, cert.not_after)
+        while position < len(self.__not_after) and self.__not_after[position] == cert.not_after:
+            if self.__certificates[position].id == cert.id:
+                del self.__not_after[position]
+                del self.__certificates[position]
+                return
+            position += 1
+
+    ##########################################################################
+    # Returns certificates expiring after start and up to and including end,
+    # soonest first. Either bound may be None for an open window
+    ##########################################################################
+    def get_expiring_between(self, start=None, end=None):
+        low = 0 if start is None else bisect.bisect_right(self.__not_after, start.timestamp())
+        high = len(self.__not_after) if end is None else bisect.bisect_right(self.__not_after, end.timestamp())
+        return self.__certificates[low:high]
+
+    def get_expiring_before(self, end):
+        return self.get_expiring_between(None, end)
+
+    ##########################################################################
+    # Splits certificates into tiered buckets keyed by days. Bucket 0 holds the
+    # certificates already expired at now and each threshold bucket holds those
+    # expiring after the previous threshold and within its own, so each
+    # certificate lands only in the tightest bucket it belongs to
+    ##########################################################################
+    def get_buckets(self, thresholds, now):
+        buckets = {}
+        low = 0
+        for days in sorted({0, *thresholds}):
+            high = bisect.bisect_right(self.__not_after, (now + datetime.timedelta(days=days)).timestamp(), lo=low)
+            buckets[days] = self.__certificates[low:high]
+            low = high
+        return buckets
+
+    def __len__(self):
+        return len(self.__certificates)
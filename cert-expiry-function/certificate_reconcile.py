@@ -0,0 +1,177 @@
+import re
+import base64
+import datetime
+import hashlib
+
+##########################################################################
+# Joins DigiCert TLM certificates with OCI certificates through hash
+# indexes on serial number, fingerprint and common name, one pass over
+# each inventory. For every common name only the latest TLM issuance is
+# expected in OCI:
+#   matched      - OCI holds the latest TLM issuance
+#   stale_in_oci - OCI holds an older issuance than the latest in TLM
+#   missing_in_oci - the latest TLM issuance has no OCI certificate
+#   orphaned     - the OCI certificate is not known to TLM
+##########################################################################
+class CertificateReconciler:
+
+    ##########################################################################
+    # The TLM field names default to the certificate-search item fields.
+    # oci_fingerprint is an optional callable returning the fingerprint of
+    # an OCI certificate, OCI certificate records do not carry one
+    ##########################################################################
+    def __init__(self, tlm_serial_field='serial_number', tlm_fingerprint_field='thumbprint',
+                 tlm_common_name_field='common_name', tlm_not_after_field='valid_to', oci_fingerprint=None):
+        self.__tlm_serial_field = tlm_serial_field
+        self.__tlm_fingerprint_field = tlm_fingerprint_field
+        self.__tlm_common_name_field = tlm_common_name_field
+        self.__tlm_not_after_field = tlm_not_after_field
+        self.__oci_fingerprint = oci_fingerprint
+
+    ##########################################################################
+    # Takes: iterables of TLM certificate dicts and OCI CertificateRecords
+    # Returns: dict of category to list of {"oci": cert, "tlm": item} dicts
+    ##########################################################################
+    def reconcile(self, tlm_certificates, oci_certificates):
+        tlm_by_serial = {}
+        tlm_by_fingerprint = {}
+        tlm_latest_by_common_name = {}
+        tlm_without_common_name = []
+        tlm_not_after = {}
+        for item in tlm_certificates:
+            tlm_not_after[id(item)] = parse_datetime(item.get(self.__tlm_not_after_field))
+            serial = normalize_hex(item.get(self.__tlm_serial_field))
+            if serial:
+                tlm_by_serial[serial] = item
+            fingerprint = normalize_hex(item.get(self.__tlm_fingerprint_field))
+            if fingerprint:
+                tlm_by_fingerprint[fingerprint] = item
+            common_name = normalize_name(item.get(self.__tlm_common_name_field))
+            if not common_name:
+                tlm_without_common_name.append(item)
+                continue
+            latest = tlm_latest_by_common_name.get(common_name)
+            if latest is None or tlm_not_after[id(item)] > tlm_not_after[id(latest)]:
+                tlm_latest_by_common_name[common_name] = item
+
+        results = {"matched": [], "stale_in_oci": [], "missing_in_oci": [], "orphaned": []}
+        covered = set()
+        for cert in oci_certificates:
+            tlm_item = tlm_by_serial.get(normalize_hex(get_oci_serial_number(cert)))
+            if tlm_item is None and self.__oci_fingerprint:
+                tlm_item = tlm_by_fingerprint.get(normalize_hex(self.__oci_fingerprint(cert)))
+            # A matched certificate is looked up under its TLM common name
+            common_name = None
+            if tlm_item is not None:
+                common_name = normalize_name(tlm_item.get(self.__tlm_common_name_field))
+            if not common_name:
+                common_name = normalize_name(get_oci_common_name(cert))
+            latest = tlm_latest_by_common_name.get(common_name)
+
+            if tlm_item is not None:
+                covered.add(id(tlm_item))
+                if latest is None or latest is tlm_item or \
+                        tlm_not_after[id(latest)] <= tlm_not_after[id(tlm_item)]:
+                    results['matched'].append({"oci": cert, "tlm": tlm_item})
+                else:
+                    covered.add(id(latest))
+                    results['stale_in_oci'].append({"oci": cert, "tlm": latest})
+            elif latest is not None and tlm_not_after[id(latest)] > self.__oci_not_after(cert):
+                covered.add(id(latest))
+                results['stale_in_oci'].append({"oci": cert, "tlm": latest})
+            else:
+                results['orphaned'].append({"oci": cert, "tlm": None})
+
+        for item in list(tlm_latest_by_common_name.values()) + tlm_without_common_name:
+            if id(item) not in covered:
+                results['missing_in_oci'].append({"oci": None, "tlm": item})
+        return results
+
+    def __oci_not_after(self, cert):
+        return get_oci_not_after(cert) or datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+
+
+##########################################################################
+# Returns the number of certificates in each reconciliation category
+##########################################################################
+def summarize_reconciliation(results):
+    return {category: len(entries) for category, entries in results.items()}
+
+
+def reconcile_certificates(tlm_certificates, oci_certificates, **kwargs):
+    return CertificateReconciler(**kwargs).reconcile(tlm_certificates, oci_certificates)
+
+
+##########################################################################
+# Input: OCICertificates and the hash of the TLM thumbprints
+# Returns: oci_fingerprint callable for CertificateReconciler that fetches
+# the current certificate PEM of an OCI certificate and hashes its DER.
+# It is only called for certificates whose serial number is not in TLM,
+# a certificate whose PEM cannot be fetched has no fingerprint
+##########################################################################
+def create_oci_pem_fingerprint(oci_certificates, algorithm='sha1'):
+    def oci_fingerprint(cert):
+        try:
+            pem = oci_certificates.get_oci_certificate_pem(cert.id, cert.region_key)
+        except Exception as e:
+            print(f"Unable to get the certificate PEM of {cert.id}: {e}")
+            return None
+        return pem_fingerprint(pem, algorithm)
+    return oci_fingerprint
+
+
+##########################################################################
+# Returns the hex digest of the DER of the first certificate in a PEM
+# string, None when it holds no certificate
+##########################################################################
+def pem_fingerprint(pem, algorithm='sha1'):
+    match = re.search(r'-----BEGIN CERTIFICATE-----(.+?)-----END CERTIFICATE-----', pem or "", re.DOTALL)
+    if not match:
+        return None
+    return hashlib.new(algorithm, base64.b64decode("".join(match.group(1).split()))).hexdigest()
+
+
+##########################################################################
+# Serials and fingerprints compare as lower case hex without separators
+# or leading zeros, names compare case insensitively
+##########################################################################
+def normalize_hex(value):
+    if not value:
+        return None
+    return re.sub(r'[^0-9a-f]', '', str(value).lower()).lstrip('0') or '0'
+
+
+def normalize_name(value):
+    return value.strip().lower() if value else None
+
+
+##########################################################################
+# Parses TLM ISO 8601 timestamps, unparsable values sort as oldest
+##########################################################################
+def parse_datetime(value):
+    oldest = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+    if not value:
+        return oldest
+    if isinstance(value, datetime.datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return oldest
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+##########################################################################
+# OCI CertificateRecord field accessors
+##########################################################################
+def get_oci_serial_number(cert):
+    return cert.serial_number
+
+
+def get_oci_common_name(cert):
+    return cert.common_name
+
+
+def get_oci_not_after(cert):
+    return cert.get_not_after_datetime()
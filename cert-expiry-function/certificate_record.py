@@ -0,0 +1,106 @@
+import datetime
+from collections.abc import Mapping
+
+
+##########################################################################
+# Compact in memory form of an OCI CertificateSummary holding only the
+# fields the function uses. not_after is epoch seconds, None when the
+# certificate has no current version validity. region_key is the region
+# part of the OCID, a lower case region key or a region name
+##########################################################################
+class CertificateRecord:
+    __slots__ = ("id", "name", "compartment_id", "region_key", "common_name", "not_after", "lifecycle_state",
+                 "sans", "serial_number")
+
+    def __init__(self, id, name, compartment_id, region_key, common_name, not_after, lifecycle_state,
+                 sans=(), serial_number=None):
+        self.id = id
+        self.name = name
+        self.compartment_id = compartment_id
+        self.region_key = region_key
+        self.common_name = common_name
+        self.not_after = not_after
+        self.lifecycle_state = lifecycle_state
+        self.sans = sans
+        self.serial_number = serial_number
+
+    ##########################################################################
+    # Takes: a CertificateSummary or Certificate SDK model
+    ##########################################################################
+    @classmethod
+    def from_summary(cls, summary):
+        # Summaries carry current_version_summary and full certificates current_version
+        version = getattr(summary, 'current_version_summary', None) or getattr(summary, 'current_version', None)
+        not_after = None
+        sans = ()
+        serial_number = None
+        if version:
+            if version.validity and version.validity.time_of_validity_not_after:
+                not_after = int(version.validity.time_of_validity_not_after.timestamp())
+            if version.subject_alternative_names:
+                sans = tuple(san.value for san in version.subject_alternative_names if san.value)
+            serial_number = version.serial_number
+        return cls(id=summary.id,
+                   name=summary.name,
+                   compartment_id=summary.compartment_id,
+                   region_key=summary.id.split(".")[3],
+                   common_name=summary.subject.common_name if summary.subject else None,
+                   not_after=not_after,
+                   lifecycle_state=summary.lifecycle_state,
+                   sans=sans,
+                   serial_number=serial_number)
+
+    ##########################################################################
+    # Plain dict of the fields for JSON, from_dict reverses it
+    ##########################################################################
+    def to_dict(self):
+        record = {field: getattr(self, field) for field in self.__slots__}
+        record['sans'] = list(self.sans)
+        return record
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(id=record['id'],
+                   name=record['name'],
+                   compartment_id=record['compartment_id'],
+                   region_key=record['region_key'],
+                   common_name=record['common_name'],
+                   not_after=record['not_after'],
+                   lifecycle_state=record['lifecycle_state'],
+                   sans=tuple(record.get('sans') or ()),
+                   serial_number=record.get('serial_number'))
+
+    ##########################################################################
+    # Read only dict view over the record, values are read on access
+    ##########################################################################
+    def as_dict(self):
+        return CertificateRecordView(self)
+
+    def get_not_after_datetime(self):
+        if self.not_after is None:
+            return None
+        return datetime.datetime.fromtimestamp(self.not_after, tz=datetime.timezone.utc)
+
+    def __repr__(self):
+        return f"CertificateRecord(id={self.id!r}, common_name={self.common_name!r}, not_after={self.not_after!r})"
+
+
+class CertificateRecordView(Mapping):
+    __slots__ = ("__record",)
+
+    def __init__(self, record):
+        self.__record = record
+
+    def __getitem__(self, key):
+        if key not in CertificateRecord.__slots__:
+            raise KeyError(key)
+        return getattr(self.__record, key)
+
+    def __iter__(self):
+        return iter(CertificateRecord.__slots__)
+
+    def __len__(self):
+        return len(CertificateRecord.__slots__)
+
+    def __repr__(self):
+        return repr(dict(self))
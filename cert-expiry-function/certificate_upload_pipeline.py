@@ -0,0 +1,168 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+##########################################################################
+# Returns the SHA-256 fingerprint of the first certificate in a PEM string
+##########################################################################
+def pem_fingerprint(pem):
+    match = re.search(r'-----BEGIN CERTIFICATE-----(.+?)-----END CERTIFICATE-----', pem or "", re.DOTALL)
+    if not match:
+        return None
+    der = base64.b64decode("".join(match.group(1).split()))
+    return hashlib.sha256(der).hexdigest()
+
+
+##########################################################################
+# Limits each region to max_concurrent calls in flight and spaces the
+# start of its calls at least min_interval_seconds apart
+##########################################################################
+class RegionRateLimiter:
+
+    def __init__(self, max_concurrent=2, min_interval_seconds=0.0):
+        self.__max_concurrent = max(1, int(max_concurrent))
+        self.__min_interval_seconds = min_interval_seconds
+        self.__lock = threading.Lock()
+        self.__semaphores = {}
+        self.__next_start = {}
+
+    def call(self, region, func):
+        with self.__lock:
+            semaphore = self.__semaphores.setdefault(region, threading.BoundedSemaphore(self.__max_concurrent))
+        with semaphore:
+            with self.__lock:
+                now = time.monotonic()
+                start = max(now, self.__next_start.get(region, now))
+                self.__next_start[region] = start + self.__min_interval_seconds
+            if start > now:
+                time.sleep(start - now)
+            return func()
+
+
+##########################################################################
+# Append only JSON lines journal of finished bundles. The last line for a
+# bundle key wins, so an interrupted run resumes where it stopped
+##########################################################################
+class UploadJournal:
+
+    def __init__(self, path):
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__entries = {}
+        if path and os.path.exists(path):
+            with open(path) as journal_file:
+                for line in journal_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A partial last line from an interrupted run
+                        continue
+                    self.__entries[entry['key']] = entry
+
+    def get(self, key):
+        return self.__entries.get(key)
+
+    def record(self, entry):
+        with self.__lock:
+            self.__entries[entry['key']] = entry
+            if self.__path:
+                with open(self.__path, 'a') as journal_file:
+                    journal_file.write(json.dumps(entry) + "\n")
+
+
+##########################################################################
+# Imports many certificate bundles into OCI concurrently.
+# A bundle is a dict with the read_certificate_files fields cert_chain,
+# certificate_pem and private_key_pem, plus region and either certificate_id
+# or name and compartment_id. A bundle without certificate_id updates the
+# certificate of the same name in its compartment if there is one, otherwise
+# a new certificate is created, certificates pending deletion or deleted
+# are not matched by name. Bundles whose certificate fingerprint matches
+# the current OCI version are skipped as unchanged
+##########################################################################
+class CertificateUploadPipeline:
+    # Journal statuses that mean a bundle needs no further work
+    __completed_statuses = ("created", "updated", "unchanged")
+    # Lifecycle states of certificates that can no longer be updated
+    __deleted_states = ("PENDING_DELETION", "DELETED")
+
+    def __init__(self, oci_certificates, journal_path=None, max_workers=8, region_concurrency=2,
+                 region_min_interval_seconds=0.0):
+        self.__oci_certificates = oci_certificates
+        self.__journal = UploadJournal(journal_path)
+        self.__max_workers = max(1, int(max_workers))
+        self.__rate_limiter = RegionRateLimiter(region_concurrency, region_min_interval_seconds)
+        self.__existing_ids = {}
+
+    ##########################################################################
+    # Takes: iterable of bundles
+    # Returns: report with one result dict per bundle, in bundle order
+    ##########################################################################
+    def run(self, bundles):
+        # Existing certificates by region, compartment and name, built once per run
+        self.__existing_ids = {}
+        for cert in self.__oci_certificates.get_oci_certificates():
+            if cert.lifecycle_state in self.__deleted_states:
+                continue
+            region = self.__oci_certificates.get_region_name(cert.region_key)
+            self.__existing_ids.setdefault((region, cert.compartment_id, cert.name), cert.id)
+        with ThreadPoolExecutor(max_workers=self.__max_workers) as executor:
+            report = list(executor.map(self.__process_bundle, bundles))
+        counts = {}
+        for result in report:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        print(f"Processed {len(report)} certificate bundles: {counts}")
+        return report
+
+    def __process_bundle(self, bundle):
+        region = self.__oci_certificates.get_region_name(bundle['region'])
+        key = bundle.get('certificate_id') or f"{region or bundle['region']}/{bundle.get('compartment_id')}/{bundle.get('name')}"
+        fingerprint = pem_fingerprint(bundle['certificate_pem'])
+        result = {"key": key, "region": region, "certificate_id": bundle.get('certificate_id'),
+                  "fingerprint": fingerprint, "status": None, "error": None}
+
+        journal_entry = self.__journal.get(key)
+        if journal_entry and journal_entry['fingerprint'] == fingerprint and \
+                journal_entry['status'] in self.__completed_statuses:
+            result.update(certificate_id=journal_entry['certificate_id'], status="resumed")
+            return result
+
+        try:
+            if region is None:
+                raise ValueError(f"Region {bundle['region']} is not subscribed")
+            certificate_id = bundle.get('certificate_id') or self.__find_existing(region, bundle)
+            if certificate_id:
+                current_pem = self.__rate_limiter.call(
+                    region, lambda: self.__oci_certificates.get_oci_certificate_pem(certificate_id, region))
+                if pem_fingerprint(current_pem) == fingerprint:
+                    result.update(certificate_id=certificate_id, status="unchanged")
+                else:
+                    self.__rate_limiter.call(region, lambda: self.__oci_certificates.update_oci_imported_certificate(
+                        certificate_id=certificate_id, region=region, cert_chain=bundle['cert_chain'],
+                        certificate_pem=bundle['certificate_pem'], private_key_pem=bundle['private_key_pem']))
+                    result.update(certificate_id=certificate_id, status="updated")
+            else:
+                created = self.__rate_limiter.call(region, lambda: self.__oci_certificates.add_new_oci_imported_certificate(
+                    name=bundle['name'], compartment_id=bundle['compartment_id'], region=region,
+                    cert_chain=bundle['cert_chain'], certificate_pem=bundle['certificate_pem'],
+                    private_key_pem=bundle['private_key_pem']))
+                result.update(certificate_id=created.id, status="created")
+        except Exception as e:
+            print(f"Failed to upload certificate bundle {key}: {e}")
+            result.update(status="failed", error=str(e))
+
+        self.__journal.record({"key": key, "status": result['status'], "certificate_id": result['certificate_id'],
+                               "fingerprint": fingerprint, "error": result['error'], "time": time.time()})
+        return result
+
+    ##########################################################################
+    # Returns the id of the collected certificate with the bundle's name in
+    # its compartment and region, None if there is none
+    ##########################################################################
+    def __find_existing(self, region, bundle):
+        return self.__existing_ids.get((region, bundle.get('compartment_id'), bundle.get('name')))
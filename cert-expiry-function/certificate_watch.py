@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+##########################################################################
+# Keeps an OCICertificates inventory current from a background thread.
+# Each region is refreshed incrementally when its interval has passed and
+# every region is collected in full once per full_sweep_seconds so deleted
+# certificates drop out. region_intervals maps region names or keys to
+# their own interval in seconds, the rest use interval_seconds.
+# on_refresh is called with the names of the regions collected by a round
+##########################################################################
+class CertificateWatcher:
+
+    def __init__(self, oci_certificates, interval_seconds=900, full_sweep_seconds=86400, region_intervals=None,
+                 on_refresh=None):
+        self.__oci_certificates = oci_certificates
+        self.__on_refresh = on_refresh
+        self.__interval_seconds = interval_seconds
+        self.__full_sweep_seconds = full_sweep_seconds
+        self.__region_intervals = {}
+        for region, seconds in (region_intervals or {}).items():
+            region_name = oci_certificates.get_region_name(region)
+            if region_name is None:
+                print(f"Region {region} in the region intervals is not subscribed, skipping it")
+                continue
+            self.__region_intervals[region_name] = seconds
+        now = time.time()
+        fetched_at = oci_certificates.get_region_fetched_at()
+        self.__next_refresh = {region_name: fetched_at.get(region_name, now) + self.__get_interval(region_name)
+                               for region_name in oci_certificates.get_regions()}
+        self.__next_full_sweep = now + full_sweep_seconds
+        self.__stop_event = threading.Event()
+        self.__thread = None
+        self.__stats = {"refreshes": 0, "full_sweeps": 0, "failed_region_refreshes": 0, "last_refresh": None}
+
+    def __get_interval(self, region_name):
+        return self.__region_intervals.get(region_name, self.__interval_seconds)
+
+    def get_oci_certificates(self):
+        return self.__oci_certificates
+
+    ##########################################################################
+    # Runs one round: a full sweep when it is due, otherwise an incremental
+    # refresh of the regions whose interval has passed
+    # Returns: dict of refreshed region to True when it was collected
+    ##########################################################################
+    def run_once(self, now=None):
+        now = time.time() if now is None else now
+        full = now >= self.__next_full_sweep
+        if full:
+            regions = list(self.__next_refresh)
+            self.__next_full_sweep = now + self.__full_sweep_seconds
+        else:
+            regions = [region_name for region_name, due in self.__next_refresh.items() if due <= now]
+        if not regions:
+            return {}
+        refreshed = self.__oci_certificates.refresh(regions, full=full)
+        finished = time.time()
+        for region_name in regions:
+            self.__next_refresh[region_name] = finished + self.__get_interval(region_name)
+        self.__stats['refreshes'] += 1
+        self.__stats['full_sweeps'] += 1 if full else 0
+        self.__stats['failed_region_refreshes'] += sum(1 for collected in refreshed.values() if not collected)
+        self.__stats['last_refresh'] = {"at": finished, "full": full, "regions": refreshed}
+        collected = [region_name for region_name, is_collected in refreshed.items() if is_collected]
+        if self.__on_refresh and collected:
+            self.__on_refresh(collected)
+        return refreshed
+
+    def __run(self):
+        while not self.__stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Certificate refresh failed: {e}")
+            wait = min([*self.__next_refresh.values(), self.__next_full_sweep]) - time.time()
+            self.__stop_event.wait(max(1.0, wait))
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__run, name="certificate-watch", daemon=True)
+        self.__thread.start()
+
+    def stop(self, timeout=None):
+        self.__stop_event.set()
+        if self.__thread:
+            self.__thread.join(timeout)
+
+    ##########################################################################
+    # Returns the refresh counters, the inventory size and each region's
+    # last fetch and next refresh time
+    ##########################################################################
+    def get_status(self):
+        fetched_at = self.__oci_certificates.get_region_fetched_at()
+        return dict(self.__stats,
+                    certificates=len(self.__oci_certificates.get_oci_certificates()),
+                    near_expiration=len(self.__oci_certificates.get_oci_certificates_near_expiration()),
+                    next_full_sweep=self.__next_full_sweep,
+                    regions={region_name: {"fetched_at": fetched_at.get(region_name), "next_refresh": due,
+                                           "interval_seconds": self.__get_interval(region_name)}
+                             for region_name, due in self.__next_refresh.items()},
+                    errors=self.__oci_certificates.get_errors())
+
+
+##########################################################################
+# Read only JSON endpoints over the watcher's inventory
+#   GET /near-expiry                      near expiry certificates
+#   GET /expiry-buckets                   near expiry certificates by bucket
+#   GET /cname?name=a&name=b[&sans=true]  certificates for each name
+#   GET /status                           refresh status and region errors
+##########################################################################
+class CertificateRequestHandler(BaseHTTPRequestHandler):
+    watcher = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        oci_certs = self.watcher.get_oci_certificates()
+        if url.path == "/near-expiry":
+            self.__send_json(200, oci_certs.get_oci_certificates_near_expiration())
+        elif url.path == "/expiry-buckets":
+            self.__send_json(200, {str(days): certs
+                                   for days, certs in oci_certs.get_oci_certificates_by_expiry_bucket().items()})
+        elif url.path == "/cname":
+            names = query.get('name', [])
+            if not names:
+                self.__send_json(400, {"error": "name is required"})
+                return
+            include_sans = query.get('sans', ['false'])[0].lower() == 'true'
+            matches = oci_certs.get_oci_certificates_with_cnames(names, include_sans=include_sans)
+            self.__send_json(200, matches)
+        elif url.path == "/status":
+            self.__send_json(200, self.watcher.get_status())
+        else:
+            self.__send_json(404, {"error": f"Unknown path {url.path}"})
+
+    def __send_json(self, status, data):
+        body = json.dumps(data).encode('utf8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+##########################################################################
+# Returns a threaded HTTP server serving the watcher's inventory, call
+# serve_forever on it to start serving
+##########################################################################
+def create_http_server(watcher, host="127.0.0.1", port=8080):
+    handler_class = type("WatcherRequestHandler", (CertificateRequestHandler,), {"watcher": watcher})
+    return ThreadingHTTPServer((host, port), handler_class)
@@ -0,0 +1,99 @@
+import threading
+import time
+
+
+##########################################################################
+# Holds one set of credentials and the OCI clients built with them so a
+# warm function container reuses them, and their HTTP sessions, across
+# invocations. Credentials older than max_age_seconds are recreated and
+# every pooled client is dropped with them. Clients are built outside the
+# pool lock under a lock of their own name and region, so a slow client
+# does not hold up the others
+##########################################################################
+class ClientPool:
+
+    def __init__(self):
+        self.__lock = threading.RLock()
+        self.__credentials = None
+        self.__credentials_created = 0
+        self.__clients = {}
+        self.__client_locks = {}
+        # Bumped whenever the clients are dropped, a client built with older
+        # credentials is then returned but not pooled
+        self.__generation = 0
+        self.__counters = {
+            "credential_hits": 0,
+            "credential_misses": 0,
+            "credential_refreshes": 0,
+            "client_hits": 0,
+            "client_misses": 0}
+
+    ##########################################################################
+    # Returns the pooled config and signer, creating them with factory when
+    # missing or older than max_age_seconds
+    # Takes: factory returning a (config, signer) tuple
+    ##########################################################################
+    def get_credentials(self, factory, max_age_seconds=None):
+        with self.__lock:
+            if self.__credentials is not None:
+                if max_age_seconds is None or time.time() - self.__credentials_created < max_age_seconds:
+                    self.__counters['credential_hits'] += 1
+                    return self.__credentials
+                self.__counters['credential_refreshes'] += 1
+                self.__clients = {}
+                self.__generation += 1
+            else:
+                self.__counters['credential_misses'] += 1
+            self.__credentials = factory()
+            self.__credentials_created = time.time()
+            return self.__credentials
+
+    ##########################################################################
+    # Returns the pooled client for a name and region, creating it with
+    # factory on first use
+    ##########################################################################
+    def get_client(self, name, region, factory):
+        key = (name, region)
+        with self.__lock:
+            client = self.__clients.get(key)
+            if client is not None:
+                self.__counters['client_hits'] += 1
+                return client
+            client_lock = self.__client_locks.setdefault(key, threading.Lock())
+        with client_lock:
+            with self.__lock:
+                # Another thread may have built it while this one waited
+                client = self.__clients.get(key)
+                if client is not None:
+                    self.__counters['client_hits'] += 1
+                    return client
+                self.__counters['client_misses'] += 1
+                generation = self.__generation
+            client = factory()
+            with self.__lock:
+                if generation == self.__generation:
+                    self.__clients[key] = client
+            return client
+
+    ##########################################################################
+    # Drops the credentials and all clients, used when a call was rejected
+    # as unauthorized so the next invocation authenticates again
+    ##########################################################################
+    def invalidate(self):
+        with self.__lock:
+            self.__credentials = None
+            self.__clients = {}
+            self.__generation += 1
+
+    ##########################################################################
+    # Returns the counters and reuse rates of credentials and clients
+    ##########################################################################
+    def get_stats(self):
+        with self.__lock:
+            stats = dict(self.__counters)
+            stats['clients'] = len(self.__clients)
+        credential_requests = stats['credential_hits'] + stats['credential_misses'] + stats['credential_refreshes']
+        client_requests = stats['client_hits'] + stats['client_misses']
+        stats['credential_reuse_rate'] = round(stats['credential_hits'] / credential_requests, 3) if credential_requests else 0.0
+        stats['client_reuse_rate'] = round(stats['client_hits'] / client_requests, 3) if client_requests else 0.0
+        return stats
@@ -0,0 +1,137 @@
+import os
+import time
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from request_scheduler import RETRY_STATUS_CODES, get_backoff_delay
+
+
+class DigiCertTLM:
+
+    ##########################################################################
+    # server and api_key default to the DigiCertTLMServer and DigiCertTLMAPIKey
+    # environment variables. With max_workers above 1 the pages after the
+    # first are fetched concurrently, at most max_workers * 2 pages ahead.
+    # A session passed in is used as is apart from the API key headers
+    ##########################################################################
+    def __init__(self, tag_name='DigiCertTLM', server=None, api_key=None, page_size=100, max_workers=1,
+                 max_retries=5, backoff_seconds=1.0, timeout=30, session=None):
+        self.__digicert_tlm_server = server if server else os.environ.get('DigiCertTLMServer')
+        self.__digicert_tlm_api_key = api_key if api_key else os.environ.get('DigiCertTLMAPIKey')
+        self.__oci_tag_name = tag_name
+        self.__digicert_tlm_url = self.__digicert_tlm_server + "/mpki/api/v1/certificate-search"
+        self.__tlm_certificates = []
+        self.__page_size = page_size
+        self.__max_workers = max(1, int(max_workers))
+        self.__max_retries = max_retries
+        self.__backoff_seconds = backoff_seconds
+        self.__timeout = timeout
+        self.__session = session if session else self.__create_session()
+        self.__session.headers.update({'x-api-key': self.__digicert_tlm_api_key, 'Accept': 'application/json'})
+
+    ##########################################################################
+    # One pooled session reused for every page request
+    ##########################################################################
+    def __create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(10, self.__max_workers))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def get_certificates_from_tlm(self):
+        if not self.__tlm_certificates:
+            self.__tlm_certificates = list(self.iter_certificates())
+        return self.__tlm_certificates
+
+    def get_get_oci_tag_name(self):
+        return self.__oci_tag_name
+
+    ##########################################################################
+    # Yields every certificate in TLM page by page as the pages arrive.
+    # Offsets advance by the items actually returned since the server may
+    # cap limit below page_size, and paging ends at total or, without a
+    # total, at the first empty page
+    ##########################################################################
+    def iter_certificates(self):
+        first_page = self.__query_certificates_from_tlm(0)
+        items = first_page.get('items', [])
+        yield from items
+        if not items:
+            return
+
+        total = first_page.get('total')
+        if total is not None and self.__max_workers > 1:
+            # The first page's size is the largest page the server returns
+            stride = len(items)
+            offsets = range(stride, total, stride)
+            for offset, page in zip(offsets, self.__query_pages_concurrently(offsets)):
+                page_items = page.get('items', [])
+                yield from page_items
+                # A page shorter than the stride leaves a gap, it is read in order
+                if page_items:
+                    yield from self.__iter_offsets(offset + len(page_items), min(offset + stride, total))
+            return
+
+        yield from self.__iter_offsets(len(items), total)
+
+    ##########################################################################
+    # Yields the certificates from offset up to end one page after another,
+    # up to the first empty page when end is None
+    ##########################################################################
+    def __iter_offsets(self, offset, end):
+        while end is None or offset < end:
+            items = self.__query_certificates_from_tlm(offset).get('items', [])
+            if not items:
+                return
+            yield from items
+            offset += len(items)
+
+    ##########################################################################
+    # Yields pages in offset order while keeping a bounded window of page
+    # requests in flight
+    ##########################################################################
+    def __query_pages_concurrently(self, offsets):
+        offsets = iter(offsets)
+        with ThreadPoolExecutor(max_workers=self.__max_workers) as executor:
+            pending = deque(executor.submit(self.__query_certificates_from_tlm, offset)
+                            for offset in itertools.islice(offsets, self.__max_workers * 2))
+            while pending:
+                page = pending.popleft().result()
+                next_offset = next(offsets, None)
+                if next_offset is not None:
+                    pending.append(executor.submit(self.__query_certificates_from_tlm, next_offset))
+                yield page
+
+    ##########################################################################
+    # Returns one page of the certificate search, retrying throttled and
+    # server errors, connection failures and timeouts with exponential
+    # backoff or the server's Retry-After
+    ##########################################################################
+    def __query_certificates_from_tlm(self, offset):
+        params = {'offset': offset, 'limit': self.__page_size}
+        for attempt in range(self.__max_retries + 1):
+            try:
+                response = self.__session.get(self.__digicert_tlm_url, params=params, timeout=self.__timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.__max_retries:
+                    raise
+                delay = get_backoff_delay(attempt, self.__backoff_seconds)
+                print(f"DigiCert TLM request for offset {offset} failed, retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+                continue
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.__max_retries:
+                delay = self.__get_retry_delay(response, attempt)
+                print(f"DigiCert TLM returned {response.status_code} for offset {offset}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    def __get_retry_delay(self, response, attempt):
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return get_backoff_delay(attempt, self.__backoff_seconds)
@@ -5,13 +5,28 @@ import logging
 from fdk import response
 import time
 import datetime
-import pytz
-import oci
+# Only the SDK modules needed to authenticate are imported up front, service
+# modules load on first use through the SDK's lazy imports
+import oci.auth.signers
+import oci.config
+import oci.exceptions
+import oci.signer
 from oci_certificates import OCICertificates
-from oci_topic import publish_message_to_topic
+from certificate_cache import CertificateInventoryCache, LocalFileCacheBackend, ObjectStorageCacheBackend
+from oci_topic import create_notification_client, parse_topic_routes, TopicRouter, TopicPublisher
+from client_pool import ClientPool
+from instrumentation import Instrumentation
+from request_scheduler import RequestScheduler
+from certificate_events import CertificateEventProcessor, read_events
+from alert_state import AlertTracker, JsonAlertStateStore, SqliteAlertStateStore
 
 start_time = time.time()
-start_datetime = datetime.datetime.now().replace(tzinfo=pytz.UTC)
+start_datetime = datetime.datetime.now().replace(tzinfo=datetime.timezone.utc)
+
+# Credentials and clients kept for the life of the function container
+CLIENT_POOL = ClientPool()
+# Request schedulers by rate, kept so learned concurrency limits carry over
+REQUEST_SCHEDULERS = {}
 
 
 ##########################################################################
@@ -123,6 +138,68 @@ def create_signer(file_location, config_profile, is_instance_principals, is_dele
             raise SystemExit
 
 
+##########################################################################
+# Create the cache backend from the function configuration
+# CACHE_BUCKET selects Object Storage, CACHE_DIRECTORY a local directory
+# Returns None when neither is set
+##########################################################################
+def create_cache_backend(ctx_data, config, signer):
+    if ctx_data.get('CACHE_BUCKET'):
+        import oci.object_storage
+        client = CLIENT_POOL.get_client(
+            "object_storage", config['region'], lambda: oci.object_storage.ObjectStorageClient(config, signer=signer))
+        return ObjectStorageCacheBackend(config=config, signer=signer, bucket_name=ctx_data['CACHE_BUCKET'], client=client)
+    if ctx_data.get('CACHE_DIRECTORY'):
+        return LocalFileCacheBackend(ctx_data['CACHE_DIRECTORY'])
+    return None
+
+##########################################################################
+# Create the certificate inventory cache, None when no backend is set
+##########################################################################
+def create_certificate_cache(ctx_data, backend):
+    try:
+        ttl_seconds = int(ctx_data['CACHE_TTL_SECONDS'])
+    except:
+        ttl_seconds = 3600
+
+    if backend is None:
+        return None
+    return CertificateInventoryCache(backend, ttl_seconds=ttl_seconds, max_age_seconds=max(ttl_seconds * 24, 86400))
+
+##########################################################################
+# Create the alert tracker, ALERT_STATE_DATABASE selects SQLite, otherwise
+# the state is kept in the cache backend. Returns None when alerts are not
+# deduplicated
+##########################################################################
+def create_alert_tracker(ctx_data, backend):
+    if ctx_data.get('DEDUPLICATE_ALERTS', 'true').lower() == 'false':
+        return None
+    if ctx_data.get('ALERT_STATE_DATABASE'):
+        return AlertTracker(SqliteAlertStateStore(ctx_data['ALERT_STATE_DATABASE']))
+    if backend is not None:
+        return AlertTracker(JsonAlertStateStore(backend))
+    return None
+
+##########################################################################
+# Returns the container's request scheduler for a rate of SDK calls per
+# second in each region and service
+##########################################################################
+def get_request_scheduler(rate_per_second):
+    if rate_per_second not in REQUEST_SCHEDULERS:
+        REQUEST_SCHEDULERS[rate_per_second] = RequestScheduler(
+            rate_per_second=rate_per_second, burst=max(1, int(rate_per_second)))
+    return REQUEST_SCHEDULERS[rate_per_second]
+
+##########################################################################
+# Returns True if the error or an error it was raised from is a 401
+##########################################################################
+def is_unauthorized(error):
+    while error is not None:
+        if isinstance(error, oci.exceptions.ServiceError) and error.status == 401:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
 
 def handler(ctx, data: io.BytesIO=None):
 
@@ -133,37 +210,124 @@ def handler(ctx, data: io.BytesIO=None):
             DAYS_TO_EXPIRY = int(ctx_data['DAYS_TO_EXPIRY'])
         except:
             DAYS_TO_EXPIRY = 30 
+        try:
+            MAX_WORKERS = int(ctx_data['MAX_WORKERS'])
+        except:
+            MAX_WORKERS = 8
+        try:
+            EXPIRY_THRESHOLDS = [int(days) for days in ctx_data['EXPIRY_THRESHOLDS'].split(",")]
+        except:
+            EXPIRY_THRESHOLDS = [7, 14, 30, 60]
+        try:
+            SIGNER_MAX_AGE_SECONDS = int(ctx_data['SIGNER_MAX_AGE_SECONDS'])
+        except:
+            SIGNER_MAX_AGE_SECONDS = 3600
+        try:
+            API_REQUESTS_PER_SECOND = float(ctx_data['API_REQUESTS_PER_SECOND'])
+        except:
+            API_REQUESTS_PER_SECOND = 10.0
+        REGIONS = [region.strip() for region in ctx_data.get('REGIONS', '').split(",") if region.strip()]
+        LAZY_REGIONS = ctx_data.get('LAZY_REGIONS', 'true').lower() != 'false'
+        INSTRUMENTATION_REPORT = ctx_data.get('INSTRUMENTATION_REPORT', '').lower()
         TOPIC_OCID = ctx_data['TOPIC_OCID']
+        REGION_TOPICS = parse_topic_routes(ctx_data.get('REGION_TOPICS'))
+        COMPARTMENT_TOPICS = parse_topic_routes(ctx_data.get('COMPARTMENT_TOPICS'))
 
     except (Exception, ValueError) as ex:
         logging.error('Error failed to get TOPIC OCID: ' + str(ex))
         raise
 
+    # Certificate events from an Events rule or a queue are applied on top of the collection
     try:
-        config, signer = create_signer("./.config","ociateam",False,False,False)
-        oci_certs = OCICertificates(config=config, signer=signer, days_to_expiry=DAYS_TO_EXPIRY)
+        events = list(read_events(io.StringIO(data.getvalue().decode('utf8')))) if data else []
+    except Exception as ex:
+        logging.warning('Ignoring unreadable request body: ' + str(ex))
+        events = []
+
+    instrumentation = Instrumentation()
+    try:
+        config, signer = CLIENT_POOL.get_credentials(
+            lambda: create_signer("./.config","ociateam",False,False,False), max_age_seconds=SIGNER_MAX_AGE_SECONDS)
+        cache_backend = create_cache_backend(ctx_data, config, signer)
+        cache = create_certificate_cache(ctx_data, cache_backend)
+        alert_tracker = create_alert_tracker(ctx_data, cache_backend)
+        oci_certs = OCICertificates(config=config, signer=signer, days_to_expiry=DAYS_TO_EXPIRY, max_workers=MAX_WORKERS,
+                                    cache=cache, expiry_thresholds=EXPIRY_THRESHOLDS, client_pool=CLIENT_POOL,
+                                    regions=REGIONS, lazy_regions=LAZY_REGIONS, instrumentation=instrumentation,
+                                    scheduler=get_request_scheduler(API_REQUESTS_PER_SECOND))
+        event_stats = None
+        if events:
+            event_processor = CertificateEventProcessor(oci_certs)
+            with instrumentation.span("events", events=len(events)):
+                for event_result in event_processor.apply_events(events):
+                    logging.debug(event_result)
+            oci_certs.save_cached_regions(event_processor.get_changed_regions())
+            event_stats = event_processor.get_stats()
+            logging.info(event_stats)
         oci_managed_certs = oci_certs.get_oci_certificates()
         expiring_certs = oci_certs.get_oci_certificates_near_expiration()
+        expiry_buckets = oci_certs.get_oci_certificates_by_expiry_bucket()
         
         oci_cname = oci_certs.get_oci_certificates_with_cname("www.gnlmnm.com")
         logging.debug(oci_cname)
         logging.debug(expiring_certs)
+        logging.debug(oci_certs.get_region_timings())
+        region_errors = oci_certs.get_errors()
+        for region_error in region_errors:
+            logging.warning("Incomplete collection in region {0} during {1}: {2}".format(
+                region_error['region'], region_error['id'], region_error['error']))
     except Exception as e:
-        
-        logging.ERROR("Failed to get expiring certifications with error: " + str(e))
+        if is_unauthorized(e):
+            CLIENT_POOL.invalidate()
+        logging.error("Failed to get expiring certifications with error: " + str(e))
         raise
 
-    message_text = str(len(expiring_certs)) + " certificates near expiration.\n"
-    for cert in expiring_certs:
-        message_text += cert['link'] + " - Expiration date is: " + str(cert["expiration_date"]) + " \n"
-    logging.debug(message_text)
-    
-    topic_message = publish_message_to_topic(config=config, signer=signer,
-                             topic_id=TOPIC_OCID, message=message_text)
-    logging.debug(topic_message)
+    topic_client = CLIENT_POOL.get_client(
+        "notification", config['region'], lambda: create_notification_client(config=config, signer=signer))
+    # Only certificates not alerted before or in a tighter bucket are published
+    alerts = expiring_certs
+    if alert_tracker:
+        thresholds_by_id = {cert['id']: days for days, certs in expiry_buckets.items() for cert in certs}
+        # Certificates of regions with errors may be missing, their alerts are not resolved
+        failed_regions = {region_error['region'] for region_error in region_errors}
+        collected_ids = {cert.id for cert in oci_managed_certs
+                         if oci_certs.get_region_name(cert.region_key) not in failed_regions}
+        alerts = alert_tracker.select(expiring_certs, thresholds_by_id, collected_ids)
+    router = TopicRouter(TOPIC_OCID, region_topics=REGION_TOPICS, compartment_topics=COMPARTMENT_TOPICS)
+    # Without alerts the default topic still gets a header only message, as the
+    # original function did, so subscribers can tell the function ran
+    alert_groups = router.group(alerts) or {TOPIC_OCID: []}
+    with instrumentation.span("publish", alerts=len(alerts), topics=len(alert_groups)):
+        # Headers carry the number of certificates near expiration, the lines only the alerts of the topic
+        topic_messages = TopicPublisher(topic_client, instrumentation=instrumentation).publish_alerts(
+            alert_groups, total=len(expiring_certs))
+    failed_topics = set()
+    for topic_message in topic_messages:
+        if topic_message['Status'] != "Success":
+            failed_topics.add(topic_message['topic_id'])
+            logging.error("Failed to publish part {0} to {1}: {2}".format(
+                topic_message['part'], topic_message['topic_id'], topic_message['Message']))
+    logging.debug(topic_messages)
+    if alert_tracker:
+        # Alerts of topics that failed to publish are retried on the next run
+        alert_tracker.commit([cert for topic_id, certs in alert_groups.items() if topic_id not in failed_topics
+                              for cert in certs])
+    logging.info(CLIENT_POOL.get_stats())
+    logging.info(oci_certs.get_scheduler_stats())
+    logging.debug(instrumentation.to_json())
+    response_data = {"message": "{0} Certificates near expiry".format(len(expiring_certs)),
+                     "alerts_published": len(alerts),
+                     "expiry_buckets": {str(days): len(certs) for days, certs in expiry_buckets.items()}}
+    if event_stats:
+        response_data['events'] = event_stats
+    # Regions that failed are reported so a partial inventory is not mistaken for a full one
+    if region_errors:
+        response_data['region_errors'] = region_errors
+    # INSTRUMENTATION_REPORT is summary for span summaries and counters or full to add every span
+    if INSTRUMENTATION_REPORT in ("summary", "full"):
+        response_data['instrumentation'] = instrumentation.get_report(include_spans=INSTRUMENTATION_REPORT == "full")
     return response.Response(
-        ctx, response_data=json.dumps(
-            {"message": "{0} Certificates near expiry".format(len(expiring_certs))}),
+        ctx, response_data=json.dumps(response_data),
         headers={"Content-Type": "application/json"}
     )
 
@@ -1,13 +1,14 @@
+import os
+import sys
 import time
+import threading
 import datetime
-import pytz
 import oci
-from read_certificate_files import Certificate_Files
 from oci_certificates import OCICertificates
 import argparse
 
 start_time = time.time()
-start_datetime = datetime.datetime.now().replace(tzinfo=pytz.UTC)
+start_datetime = datetime.datetime.now().replace(tzinfo=datetime.timezone.utc)
 
 
 ##########################################################################
@@ -164,6 +165,72 @@ def get_parser_arguments():
     return result.release,result.issue,result.config,result.collect_only
 
 
+##########################################################################
+# Input: Command line arguments
+# Action : Reads the watch mode arguments, others are left alone
+# Returns: watch mode arguments
+##########################################################################
+def get_watch_arguments():
+
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        default=False,
+        help="Keep running, refresh the inventory on a schedule and serve it over HTTP")
+    parser.add_argument('--host', default="127.0.0.1", help="Address the HTTP server listens on")
+    parser.add_argument('--port', type=int, default=8080, help="Port the HTTP server listens on")
+    parser.add_argument(
+        '--interval',
+        type=int,
+        default=900,
+        help="Seconds between incremental refreshes of a region")
+    parser.add_argument(
+        '--region-interval',
+        dest='region_intervals',
+        action='append',
+        default=[],
+        help="REGION=SECONDS refresh interval of one region, may be repeated")
+    parser.add_argument(
+        '--events',
+        help="File of OCI certificate events to apply, - to follow stdin")
+    parser.add_argument(
+        '--export',
+        dest='export_directory',
+        help="Directory to export the inventory and near expiry certificates to, per region")
+    parser.add_argument(
+        '--export-format',
+        dest='export_format',
+        default="ndjson",
+        choices=["ndjson", "parquet", "arrow"],
+        help="Export format, parquet and arrow need pyarrow")
+    parser.add_argument(
+        '--export-append',
+        dest='export_append',
+        action='store_true',
+        default=False,
+        help="Keep the previous parts of a region as history instead of replacing them")
+    parser.add_argument(
+        '--full-sweep-interval',
+        dest='full_sweep_interval',
+        type=int,
+        default=86400,
+        help="Seconds between full collections of every region")
+    parser.add_argument(
+        '--certificates',
+        dest='certificate_directory',
+        help="Directory of cert, privkey and chain PEM files to read for upload")
+
+    result, _ = parser.parse_known_args()
+    region_intervals = {}
+    for region_interval in result.region_intervals:
+        region, seconds = region_interval.split("=", 1)
+        region_intervals[region.strip()] = int(seconds)
+    result.region_intervals = region_intervals
+    return result
+
+
+watch_arguments = get_watch_arguments()
 config, signer = create_signer("","",False,False,False)
 
 oci_certs = OCICertificates(config=config, signer=signer)
@@ -172,13 +239,73 @@ oci_cname = oci_certs.get_oci_certificates_with_cname("www.gnlmnm.com")
 print(oci_cname)
 oci_certificates_near_expiration = oci_certs.get_oci_certificates_near_expiration()
 print(oci_certificates_near_expiration)
-
+print(oci_certs.get_instrumentation().to_json(include_spans=False))
+
+# Compare against DigiCert TLM when a TLM server is configured
+if os.environ.get('DigiCertTLMServer'):
+    from digicert_tlm import DigiCertTLM
+    from certificate_reconcile import reconcile_certificates, summarize_reconciliation, create_oci_pem_fingerprint
+    # Certificates without a serial match are matched on the thumbprint of their OCI PEM
+    reconciliation = reconcile_certificates(DigiCertTLM().iter_certificates(), oci_managed_certs,
+                                            oci_fingerprint=create_oci_pem_fingerprint(oci_certs))
+    print(summarize_reconciliation(reconciliation))
+    for entry in reconciliation['stale_in_oci']:
+        print(f"Stale in OCI: {entry['oci'].id} - latest TLM serial {entry['tlm'].get('serial_number')}")
+    for entry in reconciliation['missing_in_oci']:
+        print(f"Missing in OCI: {entry['tlm'].get('common_name')} - TLM serial {entry['tlm'].get('serial_number')}")
+
+# Export the inventory per region, in watch mode each refreshed region is exported again
+exporter = None
+if watch_arguments.export_directory:
+    from certificate_export import CertificateExporter
+    exporter = CertificateExporter(watch_arguments.export_directory, format=watch_arguments.export_format,
+                                   append=watch_arguments.export_append)
+    print(exporter.export(oci_certs))
+
+# Certificate events are applied one by one on top of the collection, in
+# watch mode they are followed in the background
+if watch_arguments.events:
+    from certificate_events import CertificateEventProcessor, read_events_from_file
+
+    def apply_events():
+        event_processor = CertificateEventProcessor(oci_certs)
+        for event_result in event_processor.apply_events(read_events_from_file(watch_arguments.events)):
+            print(event_result)
+        print(event_processor.get_stats())
+
+    if watch_arguments.watch:
+        threading.Thread(target=apply_events, name="certificate-events", daemon=True).start()
+    else:
+        apply_events()
+        print(oci_certs.get_oci_certificates_near_expiration())
+
+# Watch mode keeps the inventory in memory, refreshing stale regions on a
+# schedule, and serves near expiry certificates and cname lookups over HTTP
+if watch_arguments.watch:
+    from certificate_watch import CertificateWatcher, create_http_server
+    watcher = CertificateWatcher(oci_certs, interval_seconds=watch_arguments.interval,
+                                 full_sweep_seconds=watch_arguments.full_sweep_interval,
+                                 region_intervals=watch_arguments.region_intervals,
+                                 on_refresh=(lambda regions: exporter.export(oci_certs, regions)) if exporter else None)
+    watcher.start()
+    server = create_http_server(watcher, watch_arguments.host, watch_arguments.port)
+    print(f"Serving certificates on http://{watch_arguments.host}:{watch_arguments.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        watcher.stop()
+
+# Upload support is only loaded when certificate files are read
+if watch_arguments.certificate_directory:
+    from read_certificate_files import Certificate_Files
+    certificate_json = Certificate_Files().get_certificates(directory=watch_arguments.certificate_directory)
+    print({field: value for field, value in certificate_json.items() if field != 'private_key_pem'})
 
 exit()
 
-certificates_files = Certificate_Files()
-certificate_json = certificates_files.get_certificates(directory='/Users/hammer/Documents/GitHub/oci-cert-digicert/cert-function/')
-print(certificate_json)
 # response = oci_certs.add_new_oci_imported_certificate(
 #     name="testing4",
 #     compartment_id="ocid1.compartment.oc1..aaaaaaaawlfypwpntj6ftt3kk2jacwbzyuv6tepfmbdwimizkkqo4s5xw25q",
@@ -203,5 +330,12 @@ print(certificate_json)
 # print(response)
 # print("*" * 80)
 
+# Batch upload, unchanged bundles are skipped and reruns resume from the journal
+# from certificate_upload_pipeline import CertificateUploadPipeline
+# pipeline = CertificateUploadPipeline(oci_certs, journal_path="upload_journal.jsonl", region_concurrency=2)
+# report = pipeline.run([dict(certificate_json, name="testing4", region="us-ashburn-1",
+#                             compartment_id="ocid1.compartment.oc1..aaaaaaaawlfypwpntj6ftt3kk2jacwbzyuv6tepfmbdwimizkkqo4s5xw25q")])
+# print(report)
+
 
 print("--- %s seconds ---" % (time.time() - start_time))
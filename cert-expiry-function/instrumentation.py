@@ -0,0 +1,105 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+##########################################################################
+# Thread safe spans and counters for a collection run.
+# Spans are timed blocks with attributes such as the region, counters are
+# summed per label set. Every span is aggregated by name, only the first
+# max_spans are also kept individually so the report stays bounded
+##########################################################################
+class Instrumentation:
+
+    def __init__(self, max_spans=1000):
+        self.__start = time.perf_counter()
+        self.__max_spans = max_spans
+        self.__spans = []
+        self.__dropped_spans = 0
+        self.__span_summary = {}
+        self.__counters = {}
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.__record_span(name, attributes, start, time.perf_counter(), error)
+
+    def __record_span(self, name, attributes, start, end, error):
+        duration = end - start
+        with self.__lock:
+            summary = self.__span_summary.setdefault(
+                name, {"count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            summary['count'] += 1
+            summary['total_seconds'] += duration
+            summary['max_seconds'] = max(summary['max_seconds'], duration)
+            if error:
+                summary['errors'] += 1
+            if len(self.__spans) < self.__max_spans:
+                span = {"name": name, "start_seconds": round(start - self.__start, 4),
+                        "duration_seconds": round(duration, 4)}
+                span.update(attributes)
+                if error:
+                    span['error'] = error
+                self.__spans.append(span)
+            else:
+                self.__dropped_spans += 1
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    ##########################################################################
+    # Wraps an SDK call to count it under api_calls, and under pages when it
+    # is called page by page, along with the response bytes
+    ##########################################################################
+    def wrap_call(self, func, operation, region, paginated=False):
+        def call(*args, **kwargs):
+            try:
+                response = func(*args, **kwargs)
+            except Exception:
+                self.increment("api_errors", operation=operation, region=region)
+                raise
+            self.increment("api_calls", operation=operation, region=region)
+            if paginated:
+                self.increment("pages", operation=operation, region=region)
+            headers = getattr(response, 'headers', None)
+            if headers and headers.get('content-length'):
+                self.increment("response_bytes", int(headers['content-length']), operation=operation, region=region)
+            return response
+        return call
+
+    ##########################################################################
+    # Returns: dict with the run time, span summaries, counters with their
+    # total and per label values and, with include_spans, the kept spans
+    ##########################################################################
+    def get_report(self, include_spans=True):
+        with self.__lock:
+            counters = {}
+            for (name, labels), value in sorted(self.__counters.items()):
+                counter = counters.setdefault(name, {"total": 0, "by_label": {}})
+                counter['total'] += value
+                if labels:
+                    counter['by_label'][",".join(f"{key}={label}" for key, label in labels)] = value
+            report = {
+                "elapsed_seconds": round(time.perf_counter() - self.__start, 4),
+                "span_summary": {name: dict(summary, total_seconds=round(summary['total_seconds'], 4),
+                                            max_seconds=round(summary['max_seconds'], 4))
+                                 for name, summary in self.__span_summary.items()},
+                "counters": counters}
+            if include_spans:
+                report['spans'] = list(self.__spans)
+                report['dropped_spans'] = self.__dropped_spans
+        return report
+
+    def to_json(self, include_spans=True):
+        return json.dumps(self.get_report(include_spans), indent=4)
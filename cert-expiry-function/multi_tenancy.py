@@ -0,0 +1,231 @@
+import argparse
+import configparser
+import contextlib
+import datetime
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import oci
+from oci_certificates import OCICertificates
+
+
+##########################################################################
+# Input: config file profiles, config files and whether every profile of
+# a config file is scanned
+# Returns: list of tenancy targets {"name", "config_file", "profile"}.
+# A profile may be given as PROFILE for the default config file or as
+# CONFIG_FILE:PROFILE, a config file alone uses its DEFAULT profile
+##########################################################################
+def parse_tenancy_targets(profiles=None, config_files=None, all_profiles=False):
+    targets = []
+    for profile in profiles or []:
+        config_file, _, name = profile.rpartition(":")
+        config_file = config_file if config_file else oci.config.DEFAULT_LOCATION
+        targets.append({"name": name, "config_file": config_file, "profile": name})
+    for config_file in config_files or []:
+        if all_profiles:
+            parser = configparser.ConfigParser(interpolation=None)
+            parser.read(os.path.expanduser(config_file))
+            for name in parser.sections():
+                targets.append({"name": name, "config_file": config_file, "profile": name})
+            if parser.defaults():
+                targets.append({"name": oci.config.DEFAULT_PROFILE, "config_file": config_file,
+                                "profile": oci.config.DEFAULT_PROFILE})
+        else:
+            targets.append({"name": config_file, "config_file": config_file, "profile": oci.config.DEFAULT_PROFILE})
+    # Names are the report keys, repeated names get their config file added
+    seen = set()
+    for target in targets:
+        if target['name'] in seen:
+            target['name'] = f"{target['config_file']}:{target['profile']}"
+        seen.add(target['name'])
+    return targets
+
+
+##########################################################################
+# Create config and signer for a tenancy target from its config file
+# profile, a profile with a security_token_file uses a session token
+##########################################################################
+def create_target_signer(target):
+    config = oci.config.from_file(target['config_file'], target['profile'])
+    if config.get('security_token_file'):
+        with open(os.path.expanduser(config['security_token_file']), 'r') as token_file:
+            token = token_file.read()
+        private_key = oci.signer.load_private_key_from_file(config['key_file'])
+        return config, oci.auth.signers.SecurityTokenSigner(token, private_key)
+    signer = oci.signer.Signer(
+        tenancy=config["tenancy"],
+        user=config["user"],
+        fingerprint=config["fingerprint"],
+        private_key_file_location=config.get("key_file"),
+        pass_phrase=oci.config.get_config_value_or_default(config, "pass_phrase"),
+        private_key_content=config.get("key_content")
+    )
+    return config, signer
+
+
+##########################################################################
+# Input: tenancy target and OCICertificates keyword arguments
+# Action: collects the tenancy's certificates in a pool worker process
+# Returns: picklable tenancy result, a failure is returned with its error
+# instead of raised so it never reaches the other tenancies. Collection
+# progress is printed to stderr, stdout only carries the report
+##########################################################################
+def scan_tenancy(target, options=None):
+    start = time.perf_counter()
+    result = {"name": target['name'], "profile": target['profile'], "config_file": target['config_file'],
+              "status": "Success", "error": None}
+    try:
+        config, signer = create_target_signer(target)
+        with contextlib.redirect_stdout(sys.stderr):
+            oci_certs = OCICertificates(config=config, signer=signer, **(options or {}))
+        result.update({
+            "tenancy_id": config.get('tenancy'),
+            "certificates": len(oci_certs.get_oci_certificates()),
+            "near_expiration": oci_certs.get_oci_certificates_near_expiration(),
+            "expiry_buckets": {days: len(certs)
+                               for days, certs in oci_certs.get_oci_certificates_by_expiry_bucket().items()},
+            "region_errors": oci_certs.get_errors(),
+            "instrumentation": oci_certs.get_instrumentation().get_report(include_spans=False)})
+    except Exception as e:
+        # Errors stay with their tenancy, SystemExit and KeyboardInterrupt still stop the scan
+        result.update({"status": "Error", "error": f"{type(e).__name__}: {e}"})
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+##########################################################################
+# Input: tenancy targets, number of worker processes, OCICertificates
+# keyword arguments and the per tenancy scan function
+# Action: shards the tenancies across a process pool, signing and parsing
+# responses are CPU bound so tenancies run in their own interpreters.
+# A worker process that dies breaks the pool for every tenancy in flight,
+# those are scanned again each in its own process so only the tenancy
+# that crashed fails
+# Returns: generator of tenancy results in the order tenancies finish
+##########################################################################
+def scan_tenancies(targets, processes=None, options=None, scan_function=scan_tenancy):
+    if not targets:
+        return
+    processes = processes if processes else min(len(targets), os.cpu_count() or 1)
+    broken_targets = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(scan_function, target, options): target for target in targets}
+        for future in as_completed(futures):
+            target = futures[future]
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                broken_targets.append(target)
+            except Exception as e:
+                # The result could not be returned from the worker
+                yield get_failed_result(target, e)
+    if not broken_targets:
+        return
+    print(f"Worker process crashed, scanning {len(broken_targets)} tenancies again in their own processes",
+          file=sys.stderr)
+    with ThreadPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(scan_tenancy_isolated, scan_function, target, options): target
+                   for target in broken_targets}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield get_failed_result(futures[future], e)
+
+
+##########################################################################
+# Runs the scan of one tenancy in a process of its own
+##########################################################################
+def scan_tenancy_isolated(scan_function, target, options):
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(scan_function, target, options).result()
+
+
+def get_failed_result(target, error):
+    return {"name": target['name'], "profile": target['profile'], "config_file": target['config_file'],
+            "status": "Error", "error": f"{type(error).__name__}: {error}", "seconds": None}
+
+
+##########################################################################
+# Input: tenancy results
+# Returns: one expiry report with totals, expiry buckets summed over the
+# tenancies, every near expiry certificate tagged with its tenancy sorted
+# by expiration date and a summary of each tenancy
+##########################################################################
+def merge_tenancy_results(results):
+    report = {"generated_at": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+              "totals": {"tenancies": 0, "failed": 0, "certificates": 0, "near_expiration": 0},
+              "expiry_buckets": {}, "near_expiration": [], "tenancies": {}, "failed_tenancies": []}
+    totals = report['totals']
+    for result in results:
+        totals['tenancies'] += 1
+        summary = {"status": result['status'], "seconds": result.get('seconds')}
+        report['tenancies'][result['name']] = summary
+        if result['status'] != "Success":
+            totals['failed'] += 1
+            summary['error'] = result['error']
+            report['failed_tenancies'].append(result['name'])
+            continue
+        summary.update({"tenancy_id": result['tenancy_id'], "certificates": result['certificates'],
+                        "near_expiration": len(result['near_expiration']),
+                        "expiry_buckets": result['expiry_buckets'], "region_errors": result['region_errors']})
+        totals['certificates'] += result['certificates']
+        totals['near_expiration'] += len(result['near_expiration'])
+        for days, count in result['expiry_buckets'].items():
+            report['expiry_buckets'][days] = report['expiry_buckets'].get(days, 0) + count
+        report['near_expiration'].extend(dict(record, tenancy=result['name']) for record in result['near_expiration'])
+    report['near_expiration'].sort(key=lambda record: record['expiration_date'])
+    report['expiry_buckets'] = dict(sorted(report['expiry_buckets'].items()))
+    return report
+
+
+##########################################################################
+# Input: Command line arguments
+# Action : Set arguments and stores arguments
+# Returns: Command line arguments
+##########################################################################
+def get_parser_arguments():
+    parser = argparse.ArgumentParser(description="Scan certificate expiry across many tenancies")
+    parser.add_argument('--profile', dest='profiles', action='append', default=[],
+                        help="Config profile of a tenancy, PROFILE or CONFIG_FILE:PROFILE, may be repeated")
+    parser.add_argument('--config-file', dest='config_files', action='append', default=[],
+                        help="Config file of a tenancy, may be repeated")
+    parser.add_argument('--all-profiles', dest='all_profiles', action='store_true', default=False,
+                        help="Scan every profile of each --config-file as its own tenancy")
+    parser.add_argument('--processes', type=int, default=None, help="Worker processes, defaults to the CPU count")
+    parser.add_argument('--max-workers', dest='max_workers', type=int, default=8,
+                        help="Region and compartment query threads in each tenancy")
+    parser.add_argument('--days-to-expiry', dest='days_to_expiry', type=int, default=30,
+                        help="Days ahead a certificate counts as near expiry")
+    parser.add_argument('--output', help="File to write the combined report to, printed when not set")
+    result = parser.parse_args()
+    if not result.profiles and not result.config_files:
+        parser.print_help()
+        sys.exit(2)
+    return result
+
+
+if __name__ == "__main__":
+    arguments = get_parser_arguments()
+    targets = parse_tenancy_targets(arguments.profiles, arguments.config_files, arguments.all_profiles)
+    options = {"days_to_expiry": arguments.days_to_expiry, "max_workers": arguments.max_workers}
+    results = []
+    # Each tenancy is reported as soon as it finishes
+    for result in scan_tenancies(targets, arguments.processes, options):
+        results.append(result)
+        if result['status'] == "Success":
+            print(f"{result['name']}: {result['certificates']} certificates, "
+                  f"{len(result['near_expiration'])} near expiry in {result['seconds']}s", file=sys.stderr)
+        else:
+            print(f"{result['name']}: failed - {result['error']}", file=sys.stderr)
+    report = json.dumps(merge_tenancy_results(results), indent=4)
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            output_file.write(report)
+    else:
+        print(report)
+    sys.exit(1 if any(result['status'] != "Success" for result in results) else 0)
@@ -1,182 +1,699 @@
 import oci
 import time
 import datetime
-import pytz
-import os
-import requests
-from requests.exceptions import HTTPError
-from copy import copy
-
-class DigiCertTLM:
-
-    def __init__(self,tag_name='DigiCertTLM'):
-       self.__digicert_tlm_server = os.environ.get('DigiCertTLMServer')
-       self.__digicert_tlm_api_key = os.environ.get('DigiCertTLMAPIKey')
-       self.__oci_tag_name = tag_name
-       self.__digicert_tlm_url = self.__digicert_tlm_server + "/mpki/api/v1/certificate-search"
-       self.__tlm_certificates = []
-    
-    def get_certificates_from_tlm(self):
-        if self.__tlm_certificates:
-            return self.__tlm_certificates
-        else:
-            return self.__query_certificates_from_tlm()
-    
-    def get_get_oci_tag_name(self):
-        return self.__oci_tag_name
-
-    def __query_certificates_from_tlm(self):
-        headers = { 
-            'x-api-key' : self.__digicert_tlm_api_key,
-            'limit' : '2'
-        }
-        try:
-            response = requests.request("GET",self.__digicert_tlm_url, headers=headers,data={})
-            response.raise_for_status()
-            # access JSON content
-            jsonResponse = response.json()
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from certificate_index import CertificateIndex, ExpiryIndex
+from certificate_record import CertificateRecord
+from regional_clients import RegionalClientFactory
+from instrumentation import Instrumentation
+from request_scheduler import RequestScheduler, list_all_results, NO_RETRY
 
-            for seat in jsonResponse['items']:
-                self.__tlm_certificates.append(seat)
-            return self.__tlm_certificates
-        except HTTPError as http_err:
-            print(f'HTTP error occurred: {http_err}')
-        except Exception as err:
-            print(f'Other error occurred: {err}')
+
+##########################################################################
+# DigiCertTLM moved to digicert_tlm.py, it is still importable from here
+# but only loaded, along with requests, when it is first used
+##########################################################################
+def __getattr__(name):
+    if name == "DigiCertTLM":
+        from digicert_tlm import DigiCertTLM
+        return DigiCertTLM
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class OCICertificates:
     # Time Format
     __time_format = "%Y-%m-%d %H:%M:%S"
+    # Resource Search is only used to find the compartments holding certificates,
+    # the certificate summaries themselves come from list_certificates, which
+    # needs a compartment. Listing every compartment in every region would cost
+    # far more calls than one search per region. The incremental query relies
+    # on the search service's timeUpdated, a search that rejects it is run as
+    # a full listing
+    __search_query = "query certificate resources"
+    __incremental_search_query = "query certificate resources where timeCreated >= '{0}' || timeUpdated >= '{0}'"
 
-    def __init__(self, config, signer, days_to_expiry=30):
+    ##########################################################################
+    # When changed_since and previous_certificates are given the collection is
+    # incremental, only compartments with certificates created or updated since
+    # then are listed again and the rest are carried over from the previous run.
+    # With a CertificateInventoryCache regions with a fresh entry are served
+    # from it and stale ones are refreshed incrementally from their entry.
+    # With a ClientPool the SDK clients are taken from and kept in the pool.
+    # A RegionalClientFactory may be passed to control how clients are built.
+    # Certificates are kept as CertificateRecords, previous_certificates must
+    # be the records of an earlier collection.
+    # regions limits collection to an allow-list of region names or keys and
+    # region_filter to regions whose subscription record it returns True for.
+    # With lazy_regions a region's clients are only created on its first query.
+    # Spans and API call counters are recorded in instrumentation, a new
+    # Instrumentation when none is passed.
+    # SDK calls are rate limited and retried by scheduler, pass a shared
+    # RequestScheduler to keep its learned limits across collections.
+    # A long running process calls refresh to collect regions again in place
+    # and upsert_certificate or remove_certificate to apply single changes
+    ##########################################################################
+    def __init__(self, config, signer, days_to_expiry=30, max_workers=8, changed_since=None, previous_certificates=None,
+                 cache=None, expiry_thresholds=(7, 14, 30, 60), client_pool=None, client_factory=None, proxy="",
+                 regions=None, region_filter=None, lazy_regions=False, instrumentation=None,
+                 scheduler=None):
         self.__cert_url = "https://cloud.oracle.com/security/certificates/certificate/"
         self.__oci_certificates = []
         self.__oci_certificates_near_expiration = []
-        self.__start_datetime = datetime.datetime.now().replace(tzinfo=pytz.UTC)
+        self.__errors = []
+        self.__region_timings = {}
+        self.__max_workers = max(1, int(max_workers))
+        self.__timings_lock = threading.Lock()
+        self.__changed_since = changed_since
+        self.__previous_certificates = previous_certificates
+        self.__cache = cache
+        self.__region_baselines = {}
+        self.__region_fetched_at = {}
+        self.__days_to_expiry = days_to_expiry
+        self.__start_datetime = datetime.datetime.now().replace(tzinfo=datetime.timezone.utc)
         self.__cert_key_time_max_datetime = self.__start_datetime + datetime.timedelta(days=days_to_expiry)
+        self.__expiry_thresholds = expiry_thresholds
         self.__regions = {}
-        self.__config = copy(config)
-        self.__signer = copy(signer)
-        self.__create_regional_signers("")
+        self.__region_names = {}
+        self.__region_allow_list = regions
+        self.__region_filter = region_filter
+        self.__lazy_regions = lazy_regions
+        self.__instrumentation = instrumentation if instrumentation else Instrumentation()
+        self.__scheduler = scheduler if scheduler else RequestScheduler()
+        self.__region_clients_lock = threading.Lock()
+        # Reentrant since refresh reads the certificate list while holding it
+        self.__update_lock = threading.RLock()
+        self.__refresh_lock = threading.Lock()
+        self.__client_factory = client_factory if client_factory else \
+            RegionalClientFactory(config, signer, proxy=proxy, client_pool=client_pool)
+        self.__create_regional_signers()
         self.__certificates_read_certificates()
-        self.__find_oci_certificates_near_expiration()
+        self.__build_indexes(self.__oci_certificates)
+
+    ##########################################################################
+    # Builds the lookup and expiry indexes and the near expiry list over
+    # certificates, then swaps them in together
+    ##########################################################################
+    def __build_indexes(self, certificates):
+        with self.__instrumentation.span("expiry_filter", certificates=len(certificates)):
+            index = CertificateIndex(certificates, self.__get_region_name_from_key)
+            expiry_index = ExpiryIndex(certificates)
+            near_expiration = self.__find_oci_certificates_near_expiration(expiry_index)
+        self.__oci_certificates, self.__index, self.__expiry_index, self.__oci_certificates_near_expiration = \
+            certificates, index, expiry_index, near_expiration
 
     ##########################################################################
-    # Create regional config, signers adds appends them to self.__regions object
+    # Gets the subscribed regions to collect into self.__regions and, unless
+    # regions are lazy, adds each region's clients to its record. Each
+    # region's clients are built by the client factory from their own config
+    # and signer copy
     ##########################################################################
-    def __create_regional_signers(self, proxy):
+    def __create_regional_signers(self):
         print("Creating regional signers and configs...")
+        home_region = self.__client_factory.get_home_region()
         try:
+            with self.__instrumentation.span("identity", region=home_region):
+                self.__identity = self.__client_factory.get_client(
+                    "identity", oci.identity.IdentityClient, home_region)
 
-            self.__identity = oci.identity.IdentityClient(
-                self.__config, signer=self.__signer)
-            if proxy:
-                self.__identity.base_client.session.proxies = {'https': proxy}
-
-            # Getting Tenancy Data and Region data
-            self.__tenancy = self.__identity.get_tenancy(
-                self.__config["tenancy"]).data
-            regions = self.__identity.list_region_subscriptions(
-                self.__tenancy.id).data
+                # Getting Tenancy Data and Region data
+                self.__tenancy = self.__schedule_call(
+                    self.__identity.get_tenancy, "get_tenancy", "identity", home_region)(
+                    self.__client_factory.get_tenancy_id(), retry_strategy=NO_RETRY).data
+                regions = self.__schedule_call(
+                    self.__identity.list_region_subscriptions, "list_region_subscriptions", "identity", home_region)(
+                    self.__tenancy.id, retry_strategy=NO_RETRY).data
             for region in regions:
                 record = oci.util.to_dict(region)
-                self.__regions[record['region_name']] = record
+                # OCIDs carry the lower case region key or the region name
+                for key in (record['region_key'], record['region_name']):
+                    self.__region_names[key] = record['region_name']
+                    self.__region_names[key.lower()] = record['region_name']
+                    self.__region_names[key.upper()] = record['region_name']
+                if self.__is_region_selected(record):
+                    self.__regions[record['region_name']] = record
 
         except Exception as e:
             raise RuntimeError("Failed to get identity information." + str(e.args))
-        
-        for region_key, region_values in self.__regions.items():
-            # Creating regional configs and signers
-            region_signer = self.__signer
-            region_signer.region_name = region_key
-            region_config = self.__config
-            region_config['region'] = region_key
-
-            try:
-                search = oci.resource_search.ResourceSearchClient(region_config, signer=region_signer)
-                if proxy:
-                    search.base_client.session.proxies = {'https': proxy}
-                region_values['search_client'] = search
-
-                certificate_client = oci.certificates_management.CertificatesManagementClient(region_config, signer=region_signer)
-                if proxy:
-                    search.base_client.session.proxies = {'https': proxy}
-                region_values['certificate_client'] = certificate_client                    
 
+        if self.__region_allow_list:
+            for region in self.__region_allow_list:
+                if self.__get_region_name_from_key(region) is None:
+                    print(f"Region {region} in the region allow-list is not subscribed, skipping it")
 
+        if self.__lazy_regions:
+            return
+        for region_key in self.__regions:
+            try:
+                self.__get_region_client(region_key, 'search_client')
+                self.__get_region_client(region_key, 'certificate_client')
             except Exception as e:
-                self.__errors.append({"id" : "__create_regional_signers", "error" : str(e)})
+                self.__errors.append({"id" : "__create_regional_signers", "region": region_key, "error" : str(e)})
                 raise RuntimeError("Failed to create regional clients for data collection: " + str(e))
 
+    ##########################################################################
+    # Returns True if a subscribed region should be collected
+    ##########################################################################
+    def __is_region_selected(self, record):
+        if record.get('status') and record['status'] != "READY":
+            return False
+        if self.__region_allow_list and not {record['region_key'].upper(), record['region_name'].upper()} & \
+                {region.upper() for region in self.__region_allow_list}:
+            return False
+        if self.__region_filter and not self.__region_filter(record):
+            return False
+        return True
+
+    ##########################################################################
+    # Returns a region's search_client or certificate_client, creating it
+    # on first use
+    ##########################################################################
+    def __get_region_client(self, region_key, client_name):
+        region_values = self.__regions[region_key]
+        client = region_values.get(client_name)
+        if client is None:
+            with self.__region_clients_lock:
+                client = region_values.get(client_name)
+                if client is None:
+                    if client_name == 'search_client':
+                        client = self.__client_factory.get_client(
+                            "resource_search", oci.resource_search.ResourceSearchClient, region_key)
+                    elif client_name == 'certificates_client':
+                        client = self.__client_factory.get_client(
+                            "certificates", oci.certificates.CertificatesClient, region_key)
+                    else:
+                        client = self.__client_factory.get_client(
+                            "certificates_management", oci.certificates_management.CertificatesManagementClient, region_key)
+                    region_values[client_name] = client
+        return client
+
     ##########################################################################
     # Query All certificates in the tenancy
+    # Results are merged in region subscription order then compartment order
     ##########################################################################
     def __certificates_read_certificates(self):
-        try:
-            for region_key, region_values in self.__regions.items():
-                certificates_data = oci.pagination.list_call_get_all_results(
-                        region_values['search_client'].search_resources,
-                        search_details=oci.resource_search.models.StructuredSearchDetails(
-                            query="query certificate resources return allAdditionalFields")
-                    ).data
-                cert_compartments = {}
-
-                for certificate in certificates_data:
-                    cert_compartments[certificate.compartment_id] = certificate.compartment_id
-
-                for compartment in cert_compartments:
-                    certs = oci.pagination.list_call_get_all_results(
-                        region_values['certificate_client'].list_certificates,
-                        compartment_id=compartment).data
-                    for cert in certs:
-                        self.__oci_certificates.append(cert)
-        except Exception as e:
-            pass
+        self.__region_baselines = self.__group_previous_certificates()
+        cached_regions = self.__load_cached_regions()
+        collected_regions = self.__collect_regions(
+            [region_key for region_key in self.__regions if region_key not in cached_regions])
+        for region_key in self.__regions:
+            if region_key in cached_regions:
+                self.__oci_certificates.extend(cached_regions[region_key])
+            elif region_key in collected_regions:
+                self.__oci_certificates.extend(collected_regions[region_key])
+        if self.__cache:
+            self.__cache.evict_regions(self.__tenancy.id, set(self.__region_names.values()))
         print(f"Found a total of {len(self.__oci_certificates)} in OCI")
 
-    def __find_oci_certificates_near_expiration(self):
-        for cert in self.__oci_certificates:
-            if cert.current_version_summary.validity and cert.current_version_summary.validity.time_of_validity_not_after <= self.__cert_key_time_max_datetime:
-                    region_id = cert.id.split(".")[3]
-                    region_name = self.__get_region_name_from_key(region_id)
-                    self.__oci_certificates_near_expiration.append({"link" : self.__cert_url + cert.id + "?region=" + region_name,
-                                                                    "expiration_date" : str(cert.current_version_summary.validity.time_of_validity_not_after.strftime(self.__time_format))})
+    ##########################################################################
+    # Regions are searched concurrently on a bounded worker pool, as each
+    # region's search completes its compartments are queued on the same pool.
+    # A compartment whose listing failed keeps its certificates from the
+    # region's baseline, only compartments listed successfully replace them
+    # Returns: dict of region to its certificates in compartment order,
+    # regions whose search failed are left out
+    def __collect_regions(self, region_keys):
+        region_compartments = {}
+        compartment_certificates = {}
+        with ThreadPoolExecutor(max_workers=self.__max_workers) as executor:
+            search_futures = {
+                executor.submit(self.__read_region_compartments, region_key): region_key
+                for region_key in region_keys}
+            list_futures = {}
+            for future in as_completed(search_futures):
+                region_key = search_futures[future]
+                try:
+                    region_compartments[region_key] = future.result()
+                except Exception as e:
+                    self.__record_region_error(region_key, "search_resources", e)
+                    continue
+                for compartment in region_compartments[region_key][1]:
+                    list_futures[executor.submit(
+                        self.__read_compartment_certificates, region_key, compartment)] = (region_key, compartment)
 
+            for future in as_completed(list_futures):
+                region_key, compartment = list_futures[future]
+                try:
+                    compartment_certificates[(region_key, compartment)] = future.result()
+                except Exception as e:
+                    self.__record_region_error(region_key, "list_certificates", e, compartment)
 
-    def get_oci_certificates_with_cname(self, cname):
-        results = []
-        for cert in self.__oci_certificates:
-            if cert.subject:
-                if cname == cert.subject.common_name:
-                    results.append(oci.util.to_dict(cert))
+        failed_regions = {error['region'] for error in self.__errors}
+        collected_regions = {}
+        for region_key in region_keys:
+            if region_key not in region_compartments:
+                continue
+            compartments, listed_compartments = region_compartments[region_key]
+            fresh = {compartment: compartment_certificates[(region_key, compartment)]
+                     for compartment in listed_compartments if (region_key, compartment) in compartment_certificates}
+            baseline = self.__region_baselines.get(region_key)
+            baseline_compartments = baseline[1] if baseline else {}
+            # Compartments no longer holding certificates are dropped
+            previous = {compartment: baseline_compartments[compartment] for compartment in compartments
+                        if compartment not in fresh and compartment in baseline_compartments}
+            region_certificates = self.__merge_region_certificates(previous, fresh)
+            collected_regions[region_key] = region_certificates
+            if self.__cache and region_key not in failed_regions:
+                self.__save_cached_region(region_key, region_certificates)
+            timing = self.__region_timings.get(region_key)
+            if timing:
+                timing['elapsed_seconds'] = round(timing.pop('_end') - timing.pop('_start'), 3)
+        return collected_regions
+
+    ##########################################################################
+    # Collects regions again in place, reusing the regional clients and the
+    # region subscriptions. Unless full is set a region is refreshed
+    # incrementally since its last fetch with its certificates in memory as
+    # the baseline. A region with any error keeps its previous certificates.
+    # Regions are collected without holding the update lock so events and
+    # readers are not held up by the network calls, the lock is only taken to
+    # swap the results in. The indexes are rebuilt and swapped in whole so
+    # readers on other threads never see a partial inventory. Refreshes run
+    # one at a time
+    # Takes: region names or keys, every collected region when None
+    # Returns: dict of refreshed region name to True when it was collected
+    ##########################################################################
+    def refresh(self, regions=None, full=False):
+        if regions is None:
+            region_keys = list(self.__regions)
+        else:
+            region_keys = [region_key for region_key in
+                           (self.__get_region_name_from_key(region) for region in regions)
+                           if region_key in self.__regions]
+        with self.__refresh_lock:
+            with self.__update_lock:
+                previous_fetched_at = dict(self.__region_fetched_at)
+                previous_certificates = self.get_oci_certificates()
+            self.__errors = [error for error in self.__errors if error['region'] not in region_keys]
+            self.__region_baselines = {}
+            for region_key in region_keys:
+                if not full and region_key in previous_fetched_at:
+                    self.__region_baselines[region_key] = (datetime.datetime.fromtimestamp(
+                        previous_fetched_at[region_key], tz=datetime.timezone.utc), {})
+            for cert in previous_certificates:
+                baseline = self.__region_baselines.get(self.__get_region_name_from_key(cert.region_key))
+                if baseline:
+                    baseline[1].setdefault(cert.compartment_id, []).append(cert)
+            collected_regions = self.__collect_regions(region_keys)
+            failed_regions = {error['region'] for error in self.__errors}
+            with self.__update_lock:
+                self.__swap_refreshed_regions(region_keys, collected_regions, failed_regions, previous_fetched_at)
+        refreshed = {region_key: region_key in collected_regions and region_key not in failed_regions
+                     for region_key in region_keys}
+        print(f"Refreshed {sum(refreshed.values())} of {len(region_keys)} regions, "
+              f"{len(self.get_oci_certificates())} certificates in OCI")
+        return refreshed
+
+    ##########################################################################
+    # Replaces the certificates of the refreshed regions and rebuilds the
+    # indexes, the other regions keep their current certificates including
+    # changes applied while the refresh was collecting
+    ##########################################################################
+    def __swap_refreshed_regions(self, region_keys, collected_regions, failed_regions, previous_fetched_at):
+        self.__start_datetime = datetime.datetime.now().replace(tzinfo=datetime.timezone.utc)
+        self.__cert_key_time_max_datetime = self.__start_datetime + datetime.timedelta(days=self.__days_to_expiry)
+        certificates_by_region = {}
+        for cert in self.get_oci_certificates():
+            certificates_by_region.setdefault(self.__get_region_name_from_key(cert.region_key), []).append(cert)
+        for region_key in region_keys:
+            if region_key in collected_regions and region_key not in failed_regions:
+                certificates_by_region[region_key] = collected_regions[region_key]
+            elif region_key in previous_fetched_at:
+                # The next refresh has to cover changes since the last good fetch
+                self.__region_fetched_at[region_key] = previous_fetched_at[region_key]
+            else:
+                self.__region_fetched_at.pop(region_key, None)
+        self.__build_indexes([cert for region_key in self.__regions
+                              for cert in certificates_by_region.get(region_key, [])])
+
+    ##########################################################################
+    # Returns the certificates of regions with a fresh cache entry and makes
+    # stale entries the baseline for an incremental refresh of their region
+    ##########################################################################
+    def __load_cached_regions(self):
+        cached_regions = {}
+        if not self.__cache:
+            return cached_regions
+        for region_key in self.__regions:
+            with self.__instrumentation.span("cache_load", region=region_key):
+                entry = self.__cache.load_region(self.__tenancy.id, region_key)
+            if entry is None:
+                continue
+            try:
+                certificates = [CertificateRecord.from_dict(record) for record in entry['certificates']]
+            except Exception as e:
+                print(f"Discarding unreadable cache entry for {region_key}: {e}")
+                continue
+            if self.__cache.is_fresh(entry):
+                cached_regions[region_key] = certificates
+                self.__region_fetched_at[region_key] = entry['fetched_at']
+                self.__region_timings[region_key] = {"cached": True, "cache_age_seconds": round(self.__cache.get_age(entry), 3),
+                                                     "certificates": len(certificates)}
+            else:
+                changed_since = datetime.datetime.fromtimestamp(entry['fetched_at'], tz=datetime.timezone.utc)
+                compartments = {}
+                for cert in certificates:
+                    compartments.setdefault(cert.compartment_id, []).append(cert)
+                self.__region_baselines[region_key] = (changed_since, compartments)
+        return cached_regions
+
+    def __save_cached_region(self, region_key, region_certificates):
+        self.__cache.save_region(self.__tenancy.id, region_key, self.__region_fetched_at[region_key],
+                                 [cert.to_dict() for cert in region_certificates])
+
+    ##########################################################################
+    # Wraps an SDK call to be counted in instrumentation and rate limited by
+    # the scheduler under the region and service, retries are counted too
+    ##########################################################################
+    def __schedule_call(self, func, operation, service, region_key, paginated=False, idempotent=True):
+        def on_retry(error):
+            print(f"{operation} in region {region_key} failed, retrying: {error}")
+            self.__instrumentation.increment("retries", operation=operation, region=region_key)
+        return self.__scheduler.wrap(
+            self.__instrumentation.wrap_call(func, operation, region_key, paginated=paginated),
+            region_key, service, on_retry=on_retry, idempotent=idempotent)
+
+    ##########################################################################
+    # Returns the sorted compartment ids holding certificates in a region and
+    # the sorted ids of those to list. Against a baseline only compartments
+    # with certificates created or updated since then, or whose certificate
+    # ids differ from the baseline's, are listed, so deletions and moves are
+    # found too. A failed incremental search lists every compartment
+    ##########################################################################
+    def __read_region_compartments(self, region_key):
+        with self.__instrumentation.span("region_search", region=region_key):
+            return self.__search_region_compartments(region_key)
+
+    def __search_region_compartments(self, region_key):
+        self.__region_fetched_at[region_key] = time.time()
+        start = time.perf_counter()
+        search_resources = self.__schedule_call(
+            self.__get_region_client(region_key, 'search_client').search_resources, "search_resources",
+            "resource_search", region_key, paginated=True)
+        certificate_ids = {}
+        for certificate in list_all_results(
+                search_resources, search_details=oci.resource_search.models.StructuredSearchDetails(
+                    query=self.__search_query)):
+            certificate_ids.setdefault(certificate.compartment_id, set()).add(certificate.identifier)
+        compartments = sorted(certificate_ids)
+        listed_compartments = compartments
+        baseline = self.__region_baselines.get(region_key)
+        is_incremental = baseline is not None
+        if is_incremental:
+            changed_since, previous_compartments = baseline
+            query = self.__incremental_search_query.format(
+                changed_since.astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"))
+            try:
+                changed = {certificate.compartment_id for certificate in list_all_results(
+                    search_resources, search_details=oci.resource_search.models.StructuredSearchDetails(query=query))}
+            except Exception as e:
+                print(f"Incremental search failed in region {region_key}, listing every compartment: {e}")
+                self.__instrumentation.increment("retries", operation="search_resources", region=region_key)
+                is_incremental = False
+            else:
+                listed_compartments = [
+                    compartment for compartment in compartments if compartment in changed or
+                    certificate_ids[compartment] != {cert.id for cert in previous_compartments.get(compartment, [])}]
+        end = time.perf_counter()
+        self.__region_timings[region_key] = {
+            "search_seconds": round(end - start, 3),
+            "list_seconds": 0.0,
+            "compartments": 0,
+            "certificates": 0,
+            "incremental": is_incremental,
+            "_start": start,
+            "_end": end}
+        self.__region_timings[region_key]['compartments'] = len(listed_compartments)
+        return compartments, listed_compartments
+
+    ##########################################################################
+    # Groups the previous run's certificates into a per region baseline of
+    # changed since time and certificates by compartment
+    ##########################################################################
+    def __group_previous_certificates(self):
+        if self.__changed_since is None or self.__previous_certificates is None:
+            return {}
+        previous_by_region = {region_key: {} for region_key in self.__regions}
+        for cert in self.__previous_certificates:
+            region_name = self.__get_region_name_from_key(cert.region_key)
+            previous_by_region.setdefault(region_name, {}).setdefault(cert.compartment_id, []).append(cert)
+        return {region_key: (self.__changed_since, compartments)
+                for region_key, compartments in previous_by_region.items()}
+
+    ##########################################################################
+    # Merges re-listed compartments over the previous compartments of a region.
+    # A certificate moved between compartments is only kept from its new one
+    ##########################################################################
+    def __merge_region_certificates(self, previous_compartments, fresh_compartments):
+        fresh_ids = {cert.id for certs in fresh_compartments.values() for cert in certs}
+        merged = []
+        for compartment in sorted(set(previous_compartments) | set(fresh_compartments)):
+            if compartment in fresh_compartments:
+                merged.extend(fresh_compartments[compartment])
+            else:
+                merged.extend(cert for cert in previous_compartments[compartment] if cert.id not in fresh_ids)
+        return merged
+
+    ##########################################################################
+    # Returns all certificates in a single compartment of a region as records,
+    # each page of SDK models is converted as it arrives and then released
+    ##########################################################################
+    def __read_compartment_certificates(self, region_key, compartment):
+        start = time.perf_counter()
+        list_certificates = self.__schedule_call(
+            self.__get_region_client(region_key, 'certificate_client').list_certificates, "list_certificates",
+            "certificates_management", region_key, paginated=True)
+        with self.__instrumentation.span("list_certificates", region=region_key, compartment=compartment):
+            certs = [CertificateRecord.from_summary(summary) for summary in
+                     list_all_results(list_certificates, compartment_id=compartment)]
+        self.__instrumentation.increment("certificates", len(certs), region=region_key)
+        end = time.perf_counter()
+        timing = self.__region_timings[region_key]
+        with self.__timings_lock:
+            timing['list_seconds'] = round(timing['list_seconds'] + end - start, 3)
+            timing['certificates'] += len(certs)
+            timing['_end'] = max(timing['_end'], end)
+        return certs
+
+    def __record_region_error(self, region_key, operation, error, compartment=None):
+        print(f"Error in region {region_key} during {operation}: {error}")
+        self.__errors.append({"id": operation, "region": region_key,
+                              "compartment": compartment, "status": getattr(error, 'status', None),
+                              "error": str(error)})
+
+    ##########################################################################
+    # Certificates expiring within days_to_expiry, soonest first
+    ##########################################################################
+    def __find_oci_certificates_near_expiration(self, expiry_index):
+        return [self.__get_expiration_record(cert)
+                for cert in expiry_index.get_expiring_before(self.__cert_key_time_max_datetime)]
+
+    def __get_expiration_record(self, cert):
+        region_name = self.__get_region_name_from_key(cert.region_key)
+        return {"id" : cert.id,
+                "link" : self.__cert_url + cert.id + "?region=" + region_name,
+                "expiration_date" : cert.get_not_after_datetime().strftime(self.__time_format),
+                "region" : region_name,
+                "compartment_id" : cert.compartment_id}
 
+    ##########################################################################
+    # Certificates with a cname as plain dicts of the record fields, ready
+    # for json.dumps
+    ##########################################################################
+    def get_oci_certificates_with_cname(self, cname):
+        results = [cert.to_dict() for cert in self.__index.get_by_common_name(cname)]
         print(f"Found {len(results)} with cname {cname}")
-        return results    
-    
+        return results
+
+    ##########################################################################
+    # Bulk cname lookup, returns a dict of each cname to its certificates
+    # Takes: list of cnames and include_sans to also match SANs
+    ##########################################################################
+    def get_oci_certificates_with_cnames(self, cnames, include_sans=False):
+        if include_sans:
+            matches = self.__index.get_by_names(cnames)
+        else:
+            matches = self.__index.get_by_common_names(cnames)
+        return {cname: [cert.to_dict() for cert in certs] for cname, certs in matches.items()}
+
+    ##########################################################################
+    # Return the lookup index over all certificates in the tenancy
+    ##########################################################################
+    def get_certificate_index(self):
+        return self.__index
 
     ##########################################################################
     # Returns a region name for a region key
-    # Takes: region key
+    # Takes: region key or region name, case insensitive
     ##########################################################################
     def __get_region_name_from_key(self, region_key):
-        for key, region_values in self.__regions.items():
-            if region_values['region_key'].upper() == region_key.upper() or region_values['region_name'].upper() == region_key.upper(): 
-                return region_values['region_name']
+        return self.__region_names.get(region_key) or self.__region_names.get(region_key.upper())
 
 
     ##########################################################################
-    # Return All certificates in the tenancy
+    # Return All certificates in the tenancy as CertificateRecords
     ##########################################################################
     def get_oci_certificates(self):
-        return self.__oci_certificates
+        certificates = self.__oci_certificates
+        if certificates is None:
+            # Rebuilt under the update lock so an event cannot change the
+            # indexes part way through
+            with self.__update_lock:
+                certificates = self.__oci_certificates
+                if certificates is None:
+                    certificates = self.__oci_certificates = self.__index.get_all()
+        return certificates
+
+    ##########################################################################
+    # Returns the current record of a certificate read from OCI, None when
+    # it no longer exists or its region is not collected
+    ##########################################################################
+    def fetch_certificate_record(self, certificate_id):
+        region_key = self.__get_region_name_from_oci_id(certificate_id)
+        if region_key is None:
+            return None
+        get_certificate = self.__schedule_call(
+            self.__get_region_client(region_key, 'certificate_client').get_certificate, "get_certificate",
+            "certificates_management", region_key)
+        try:
+            certificate = get_certificate(certificate_id, retry_strategy=NO_RETRY).data
+        except oci.exceptions.ServiceError as e:
+            if e.status == 404:
+                return None
+            raise
+        return CertificateRecord.from_summary(certificate)
+
+    ##########################################################################
+    # Adds a certificate or replaces the one with its id in the indexes,
+    # certificates of regions that are not collected are ignored. Only the
+    # one certificate is indexed, the full list and near expiry list are
+    # rebuilt from the indexes on their next read
+    # Returns: True when the inventory changed
+    ##########################################################################
+    def upsert_certificate(self, cert):
+        if self.__get_region_name_from_oci_id(cert.id) is None:
+            return False
+        with self.__update_lock:
+            self.__remove_certificate(cert.id)
+            self.__index.add(cert)
+            self.__expiry_index.add(cert)
+            self.__oci_certificates = None
+            self.__oci_certificates_near_expiration = None
+        return True
+
+    ##########################################################################
+    # Removes a certificate from the indexes
+    # Returns: True when the certificate was in the inventory
+    ##########################################################################
+    def remove_certificate(self, certificate_id):
+        with self.__update_lock:
+            removed = self.__remove_certificate(certificate_id)
+            if removed:
+                self.__oci_certificates = None
+                self.__oci_certificates_near_expiration = None
+        return removed
+
+    def __remove_certificate(self, certificate_id):
+        cert = self.__index.get_by_id(certificate_id)
+        if cert is None:
+            return False
+        self.__index.remove(cert)
+        self.__expiry_index.remove(cert)
+        return True
+
+    ##########################################################################
+    # Returns the collected region name of an OCID, None when its region is
+    # not collected
+    ##########################################################################
+    def __get_region_name_from_oci_id(self, oci_id):
+        parts = oci_id.split(".")
+        region_key = self.__get_region_name_from_key(parts[3]) if len(parts) > 3 and parts[3] else None
+        return region_key if region_key in self.__regions else None
+
+    ##########################################################################
+    # Writes the certificates in memory of regions to the cache, so changes
+    # applied since the region was fetched carry over to the next run
+    ##########################################################################
+    def save_cached_regions(self, regions):
+        if not self.__cache:
+            return
+        for region in regions:
+            region_key = self.__get_region_name_from_key(region)
+            if region_key in self.__region_fetched_at:
+                self.__save_cached_region(region_key, self.__index.get_by_region(region_key))
+
+    ##########################################################################
+    # Return the names of the regions being collected, in subscription order
+    ##########################################################################
+    def get_regions(self):
+        return list(self.__regions)
+
+    ##########################################################################
+    # Return the time each region was last fetched from OCI, epoch seconds
+    ##########################################################################
+    def get_region_fetched_at(self):
+        return dict(self.__region_fetched_at)
+
+    ##########################################################################
+    # Return the time this collection started, use it as the next changed_since
+    ##########################################################################
+    def get_collection_start_time(self):
+        return self.__start_datetime
+
+    ##########################################################################
+    # Return per region collection timings in seconds
+    ##########################################################################
+    def get_region_timings(self):
+        return self.__region_timings
+
+    ##########################################################################
+    # Return the spans and counters recorded for this collection
+    ##########################################################################
+    def get_instrumentation(self):
+        return self.__instrumentation
+
+    ##########################################################################
+    # Return the errors recorded per region during collection
+    ##########################################################################
+    def get_errors(self):
+        return self.__errors
+
+    ##########################################################################
+    # Return the request scheduler's calls, throttles, retries and
+    # concurrency limits per region and service
+    ##########################################################################
+    def get_scheduler_stats(self):
+        return self.__scheduler.get_stats()
 
     ##########################################################################
     # Return All certificates in the tenancy near expiry
     ##########################################################################
     def get_oci_certificates_near_expiration(self):
-        return self.__oci_certificates_near_expiration
+        near_expiration = self.__oci_certificates_near_expiration
+        if near_expiration is None:
+            with self.__update_lock:
+                near_expiration = self.__oci_certificates_near_expiration
+                if near_expiration is None:
+                    near_expiration = self.__oci_certificates_near_expiration = \
+                        self.__find_oci_certificates_near_expiration(self.__expiry_index)
+        return near_expiration
     
+    ##########################################################################
+    # Return certificates near expiry split into the expiry_thresholds buckets
+    # Bucket 0 holds expired certificates, each other bucket those expiring
+    # after the previous threshold and within its own number of days
+    ##########################################################################
+    def get_oci_certificates_by_expiry_bucket(self, thresholds=None):
+        buckets = self.__expiry_index.get_buckets(
+            self.__expiry_thresholds if thresholds is None else thresholds, self.__start_datetime)
+        return {days: [self.__get_expiration_record(cert) for cert in certs] for days, certs in buckets.items()}
+
+    ##########################################################################
+    # Return the certificates sorted by expiry for window queries
+    ##########################################################################
+    def get_expiry_index(self):
+        return self.__expiry_index
+
     ##########################################################################
     # Return new certificate data 
     # Takes: Add new certificate takes, region, comp,name and cert details
@@ -187,13 +704,16 @@ class OCICertificates:
             cert_chain_pem=cert_chain,
             certificate_pem=certificate_pem,
             private_key_pem=private_key_pem)
-                 
-        response = self.__regions[region]['certificate_client'].create_certificate(
+        region_key = self.__get_region_name_from_key(region)
+        create_certificate = self.__schedule_call(
+            self.__get_region_client(region_key, 'certificate_client').create_certificate, "create_certificate",
+            "certificates_management", region_key, idempotent=False)
+        response = create_certificate(
             oci.certificates_management.models.CreateCertificateDetails(
                 compartment_id=compartment_id,
                 name=name,
                 certificate_config=new_cert
-                ))       
+                ), retry_strategy=NO_RETRY)
         return response.data
     
     ##########################################################################
@@ -204,11 +724,30 @@ class OCICertificates:
             cert_chain_pem=cert_chain,
             certificate_pem=certificate_pem,
             private_key_pem=private_key_pem)
-                 
-        response = self.__regions[region]['certificate_client'].update_certificate(
+        region_key = self.__get_region_name_from_key(region)
+        update_certificate = self.__schedule_call(
+            self.__get_region_client(region_key, 'certificate_client').update_certificate, "update_certificate",
+            "certificates_management", region_key, idempotent=False)
+        response = update_certificate(
                 certificate_id=certificate_id,
                 update_certificate_details=oci.certificates_management.models.UpdateCertificateDetails(
-                certificate_config=updated_cert))       
-        
+                certificate_config=updated_cert), retry_strategy=NO_RETRY)
+
         return response.data
 
+    ##########################################################################
+    # Return the PEM of a certificate's current version
+    # Takes: certificate id and the region, name or key, holding it
+    ##########################################################################
+    def get_oci_certificate_pem(self, certificate_id, region):
+        region_key = self.__get_region_name_from_key(region)
+        certificates_client = self.__get_region_client(region_key, 'certificates_client')
+        get_certificate_bundle = self.__schedule_call(
+            certificates_client.get_certificate_bundle, "get_certificate_bundle", "certificates", region_key)
+        return get_certificate_bundle(certificate_id=certificate_id, retry_strategy=NO_RETRY).data.certificate_pem
+
+    ##########################################################################
+    # Return the region name for a region name or key, None if not subscribed
+    ##########################################################################
+    def get_region_name(self, region):
+        return self.__get_region_name_from_key(region)
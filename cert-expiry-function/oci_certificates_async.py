@@ -0,0 +1,200 @@
+import asyncio
+import datetime
+import functools
+import time
+import oci
+from certificate_index import ExpiryIndex
+from certificate_record import CertificateRecord
+from regional_clients import RegionalClientFactory
+from request_scheduler import RequestScheduler, list_all_results, NO_RETRY
+
+
+class AsyncOCICertificates:
+    # Time Format
+    __time_format = "%Y-%m-%d %H:%M:%S"
+
+    ##########################################################################
+    # Asyncio collector, nothing is queried until collect() or the individual
+    # coroutines are awaited. Blocking OCI SDK calls run on an executor with
+    # at most region_concurrency calls in flight per region, and go through
+    # the same RequestScheduler rate limits and retries as OCICertificates
+    ##########################################################################
+    def __init__(self, config, signer, days_to_expiry=30, region_concurrency=4, executor=None, proxy="",
+                 client_pool=None, client_factory=None, scheduler=None):
+        self.__cert_url = "https://cloud.oracle.com/security/certificates/certificate/"
+        self.__oci_certificates = []
+        self.__oci_certificates_near_expiration = []
+        self.__errors = []
+        self.__region_timings = {}
+        self.__regions = {}
+        self.__semaphores = {}
+        self.__region_concurrency = max(1, int(region_concurrency))
+        self.__executor = executor
+        self.__days_to_expiry = days_to_expiry
+        self.__scheduler = scheduler if scheduler else RequestScheduler()
+        self.__client_factory = client_factory if client_factory else \
+            RegionalClientFactory(config, signer, proxy=proxy, client_pool=client_pool)
+
+    ##########################################################################
+    # Runs a blocking SDK call on the executor under the region's limit
+    ##########################################################################
+    async def __run(self, region_key, func, *args, **kwargs):
+        semaphore = self.__semaphores.get(region_key)
+        if semaphore is None:
+            semaphore = self.__semaphores[region_key] = asyncio.Semaphore(self.__region_concurrency)
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.__executor, functools.partial(func, *args, **kwargs))
+
+    ##########################################################################
+    # Runs every page of a list call under the scheduler on the executor
+    ##########################################################################
+    async def __list_all(self, region_key, service, list_call, **kwargs):
+        scheduled_call = self.__scheduler.wrap(list_call, region_key, service)
+        return await self.__run(region_key, lambda: list(list_all_results(scheduled_call, **kwargs)))
+
+    ##########################################################################
+    # Discovers subscribed regions that are READY and creates an isolated
+    # config and clients for each of them
+    ##########################################################################
+    async def create_regional_signers(self):
+        print("Creating regional signers and configs...")
+        home_region = self.__client_factory.get_home_region()
+        try:
+            identity = await self.__run(home_region, self.__client_factory.get_client,
+                                        "identity", oci.identity.IdentityClient, home_region)
+            tenancy = (await self.__run(
+                home_region, self.__scheduler.wrap(identity.get_tenancy, home_region, "identity"),
+                self.__client_factory.get_tenancy_id(), retry_strategy=NO_RETRY)).data
+            regions = (await self.__run(
+                home_region, self.__scheduler.wrap(identity.list_region_subscriptions, home_region, "identity"),
+                tenancy.id, retry_strategy=NO_RETRY)).data
+        except Exception as e:
+            raise RuntimeError("Failed to get identity information." + str(e.args))
+
+        self.__regions = {}
+        for region in regions:
+            record = oci.util.to_dict(region)
+            if record.get('status') and record['status'] != "READY":
+                continue
+            self.__regions[record['region_name']] = record
+
+        await asyncio.gather(*[self.__create_region_clients(region_key, region_values)
+                               for region_key, region_values in self.__regions.items()])
+        return self.__regions
+
+    async def __create_region_clients(self, region_key, region_values):
+        try:
+            search = await self.__run(region_key, self.__client_factory.get_client,
+                                      "resource_search", oci.resource_search.ResourceSearchClient, region_key)
+            certificate_client = await self.__run(region_key, self.__client_factory.get_client, "certificates_management",
+                                                  oci.certificates_management.CertificatesManagementClient, region_key)
+        except Exception as e:
+            self.__errors.append({"id": "__create_regional_signers", "region": region_key, "error": str(e)})
+            raise RuntimeError("Failed to create regional clients for data collection: " + str(e))
+        region_values['search_client'] = search
+        region_values['certificate_client'] = certificate_client
+
+    ##########################################################################
+    # Query All certificates in the tenancy, one task per region and one task
+    # per compartment. Results are merged in region then compartment order
+    ##########################################################################
+    async def read_certificates(self):
+        if not self.__regions:
+            await self.create_regional_signers()
+        region_results = await asyncio.gather(
+            *[self.__read_region(region_key, region_values) for region_key, region_values in self.__regions.items()],
+            return_exceptions=True)
+
+        self.__oci_certificates = []
+        for region_key, result in zip(self.__regions, region_results):
+            if isinstance(result, Exception):
+                print(f"Error in region {region_key}: {result}")
+                self.__errors.append({"id": "read_certificates", "region": region_key, "error": str(result)})
+                continue
+            self.__oci_certificates.extend(result)
+        print(f"Found a total of {len(self.__oci_certificates)} in OCI")
+        return self.__oci_certificates
+
+    async def __read_region(self, region_key, region_values):
+        start = time.perf_counter()
+        certificates_data = await self.__list_all(
+            region_key, "resource_search", region_values['search_client'].search_resources,
+            search_details=oci.resource_search.models.StructuredSearchDetails(query="query certificate resources"))
+        search_seconds = time.perf_counter() - start
+
+        compartments = sorted({certificate.compartment_id for certificate in certificates_data})
+        compartment_results = await asyncio.gather(*[
+            self.__run(region_key, self.__read_compartment_certificates, region_key,
+                       region_values['certificate_client'], compartment)
+            for compartment in compartments])
+
+        certificates = [cert for result in compartment_results for cert in result]
+        self.__region_timings[region_key] = {
+            "search_seconds": round(search_seconds, 3),
+            "compartments": len(compartments),
+            "certificates": len(certificates),
+            "elapsed_seconds": round(time.perf_counter() - start, 3)}
+        return certificates
+
+    ##########################################################################
+    # Runs on the executor, converting each page of SDK models to records
+    ##########################################################################
+    def __read_compartment_certificates(self, region_key, certificate_client, compartment):
+        list_certificates = self.__scheduler.wrap(certificate_client.list_certificates, region_key,
+                                                  "certificates_management")
+        return [CertificateRecord.from_summary(summary) for summary in
+                list_all_results(list_certificates, compartment_id=compartment)]
+
+    ##########################################################################
+    # Filters the collected certificates down to those near expiry
+    ##########################################################################
+    async def find_certificates_near_expiration(self, days_to_expiry=None):
+        days = self.__days_to_expiry if days_to_expiry is None else days_to_expiry
+        max_datetime = datetime.datetime.now().replace(tzinfo=datetime.timezone.utc) + datetime.timedelta(days=days)
+        region_names = {}
+        for region_values in self.__regions.values():
+            region_names[region_values['region_key'].upper()] = region_values['region_name']
+            region_names[region_values['region_name'].upper()] = region_values['region_name']
+
+        self.__oci_certificates_near_expiration = []
+        for cert in ExpiryIndex(self.__oci_certificates).get_expiring_before(max_datetime):
+            region_name = region_names.get(cert.region_key.upper())
+            self.__oci_certificates_near_expiration.append({
+                "id": cert.id,
+                "link": self.__cert_url + cert.id + "?region=" + str(region_name),
+                "expiration_date": cert.get_not_after_datetime().strftime(self.__time_format),
+                "region": region_name,
+                "compartment_id": cert.compartment_id})
+        return self.__oci_certificates_near_expiration
+
+    ##########################################################################
+    # Runs region discovery on the first call, then certificate listing and
+    # expiry filtering. The region semaphores are created again since each
+    # call may run on a new event loop
+    ##########################################################################
+    async def collect(self):
+        self.__semaphores = {}
+        if not self.__regions:
+            await self.create_regional_signers()
+        await self.read_certificates()
+        await self.find_certificates_near_expiration()
+        return self
+
+    def get_oci_certificates(self):
+        return self.__oci_certificates
+
+    def get_oci_certificates_near_expiration(self):
+        return self.__oci_certificates_near_expiration
+
+    def get_region_timings(self):
+        return self.__region_timings
+
+    def get_errors(self):
+        return self.__errors
+
+    def get_regions(self):
+        return list(self.__regions)
+
+    def get_scheduler_stats(self):
+        return self.__scheduler.get_stats()
@@ -1,4 +1,11 @@
 import oci
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from request_scheduler import get_backoff_delay, is_retryable_error
+
+# ONS rejects message bodies over 64KB, keep some room for the envelope
+MAX_MESSAGE_BYTES = 64000
 
 def create_notification_client(config, signer):
     try:
@@ -7,9 +14,10 @@ def create_notification_client(config, signer):
         print("Error creating notification client: " + str(e))
         raise
 
-def publish_message_to_topic(config, signer, topic_id, message):
+def publish_message_to_topic(config, signer, topic_id, message, topic_client=None):
     try:
-        topic_client = create_notification_client(config=config, signer=signer)
+        if topic_client is None:
+            topic_client = create_notification_client(config=config, signer=signer)
         topic_message = oci.ons.models.MessageDetails(
             body=message,
             title="Expired Certificates"
@@ -18,4 +26,168 @@ def publish_message_to_topic(config, signer, topic_id, message):
                                      message_details=topic_message)
         return {"Status" : "Success", "Message" : ""}
     except Exception as e:
-        return {"Status" : "Error", "Message" : str(e)}
\ No newline at end of file
+        return {"Status" : "Error", "Message" : str(e)}
+
+
+##########################################################################
+# Renders alert records into message bodies no larger than
+# max_message_bytes of UTF-8. The header is rendered at the top of the
+# first message and the continuation header with the part number at the
+# top of the others, both with total, the number of certificates near
+# expiration, and count, the number of alerts in the messages. Lines are
+# str.format templates over the alert record keys
+##########################################################################
+class MessageTemplate:
+
+    def __init__(self, header="{total} certificates near expiration.\n",
+                 line="{link} - Expiration date is: {expiration_date} \n",
+                 continuation_header="{total} certificates near expiration, part {part}.\n",
+                 max_message_bytes=MAX_MESSAGE_BYTES):
+        self.__header = header
+        self.__line = line
+        self.__continuation_header = continuation_header
+        self.__max_message_bytes = max_message_bytes
+
+    ##########################################################################
+    # Takes: list of alert records, total defaults to len(records)
+    # Returns: generator of message bodies, each built once its size is
+    # reached. Without records a single header only message is returned
+    ##########################################################################
+    def build_messages(self, records, total=None):
+        count = len(records)
+        if total is None:
+            total = count
+        part = 1
+        parts = [self.__header.format(total=total, count=count, part=part)]
+        size = len(parts[0].encode('utf8'))
+        lines = 0
+        for record in records:
+            line = self.__line.format(**record)
+            line_size = len(line.encode('utf8'))
+            if lines and size + line_size > self.__max_message_bytes:
+                yield "".join(parts)
+                part += 1
+                parts = [self.__continuation_header.format(total=total, count=count, part=part)]
+                size = len(parts[0].encode('utf8'))
+                lines = 0
+            if size + line_size > self.__max_message_bytes:
+                # A single line over the limit is cut at a character boundary
+                line = line.encode('utf8')[:self.__max_message_bytes - size].decode('utf8', errors='ignore')
+                line_size = len(line.encode('utf8'))
+            parts.append(line)
+            size += line_size
+            lines += 1
+        yield "".join(parts)
+
+
+##########################################################################
+# Picks the topic for an alert record, a compartment route wins over a
+# region route and records without a route go to the default topic
+##########################################################################
+class TopicRouter:
+
+    def __init__(self, default_topic_id, region_topics=None, compartment_topics=None):
+        self.__default_topic_id = default_topic_id
+        self.__region_topics = region_topics if region_topics else {}
+        self.__compartment_topics = compartment_topics if compartment_topics else {}
+
+    def route(self, record):
+        return self.__compartment_topics.get(record.get('compartment_id')) or \
+            self.__region_topics.get(record.get('region')) or self.__default_topic_id
+
+    ##########################################################################
+    # Returns a dict of topic id to its records, in record order
+    ##########################################################################
+    def group(self, records):
+        groups = {}
+        for record in records:
+            groups.setdefault(self.route(record), []).append(record)
+        return groups
+
+
+##########################################################################
+# Parses "key=value,key=value" routing configuration into a dict
+##########################################################################
+def parse_topic_routes(value):
+    routes = {}
+    for route in (value or "").split(","):
+        if "=" in route:
+            key, topic_id = route.split("=", 1)
+            routes[key.strip()] = topic_id.strip()
+    return routes
+
+
+##########################################################################
+# Publishes messages on a shared thread pool, retrying throttled and server
+# errors with jittered exponential backoff. The topic client is reused for
+# every message. Calls, retries and bytes are counted in instrumentation
+# when one is passed
+##########################################################################
+class TopicPublisher:
+
+    def __init__(self, topic_client, title="Expired Certificates", max_workers=4, max_retries=3, backoff_seconds=1.0,
+                 instrumentation=None):
+        self.__topic_client = topic_client
+        self.__title = title
+        self.__max_workers = max(1, int(max_workers))
+        self.__max_retries = max_retries
+        self.__backoff_seconds = backoff_seconds
+        self.__instrumentation = instrumentation
+
+    ##########################################################################
+    # Takes: dict of topic id to alert records, a MessageTemplate and the
+    # total number of certificates near expiration for the message headers,
+    # each topic's number of records when None
+    # Returns: list of publish results, one per message, in topic and part order
+    ##########################################################################
+    def publish_alerts(self, records_by_topic, template=None, total=None):
+        template = template if template else MessageTemplate()
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.__max_workers) as executor:
+            for topic_id, records in records_by_topic.items():
+                for part, body in enumerate(template.build_messages(records, total), start=1):
+                    title = self.__title if part == 1 else f"{self.__title} (part {part})"
+                    futures.append(executor.submit(self.publish, topic_id, body, title, part))
+        return [future.result() for future in futures]
+
+    def publish(self, topic_id, body, title=None, part=1):
+        message_details = oci.ons.models.MessageDetails(body=body, title=title if title else self.__title)
+        for attempt in range(self.__max_retries + 1):
+            self.__increment("api_calls", topic_id)
+            try:
+                self.__topic_client.publish_message(topic_id=topic_id, message_details=message_details)
+                self.__increment("message_bytes", topic_id, len(body.encode('utf8')))
+                return {"Status": "Success", "Message": "", "topic_id": topic_id, "part": part, "attempts": attempt + 1}
+            except Exception as e:
+                if attempt < self.__max_retries and is_retryable_error(e):
+                    delay = get_backoff_delay(attempt, self.__backoff_seconds)
+                    print(f"Publishing part {part} to {topic_id} failed, retrying in {delay:.1f}s: {e}")
+                    self.__increment("retries", topic_id)
+                    time.sleep(delay)
+                    continue
+                self.__increment("api_errors", topic_id)
+                return {"Status": "Error", "Message": str(e), "topic_id": topic_id, "part": part, "attempts": attempt + 1}
+
+    def __increment(self, name, topic_id, value=1):
+        if self.__instrumentation:
+            self.__instrumentation.increment(name, value, operation="publish_message", topic=topic_id)
+
+
+##########################################################################
+# Stand in for NotificationDataPlaneClient that keeps published messages
+# in memory. The first fail_first calls raise a 429 to exercise retries
+##########################################################################
+class StubNotificationClient:
+
+    def __init__(self, fail_first=0):
+        self.messages = []
+        self.__fail_first = fail_first
+        self.__calls = 0
+        self.__lock = threading.Lock()
+
+    def publish_message(self, topic_id, message_details, **kwargs):
+        with self.__lock:
+            self.__calls += 1
+            if self.__calls <= self.__fail_first:
+                raise oci.exceptions.ServiceError(429, "TooManyRequests", {}, "Stub throttled the message")
+            self.messages.append({"topic_id": topic_id, "title": message_details.title, "body": message_details.body})
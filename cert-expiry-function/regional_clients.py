@@ -0,0 +1,62 @@
+import threading
+from copy import copy
+
+
+##########################################################################
+# Creates OCI clients for any region from one config and signer without
+# mutating them. Every region gets its own config dict and signer copy so
+# clients for different regions can be created and used from any thread
+##########################################################################
+class RegionalClientFactory:
+
+    def __init__(self, config, signer, proxy="", client_pool=None):
+        self.__config = copy(config)
+        self.__signer = signer
+        self.__proxy = proxy
+        self.__client_pool = client_pool
+        self.__region_signers = {}
+        self.__lock = threading.Lock()
+
+    def get_home_region(self):
+        return self.__config['region']
+
+    def get_tenancy_id(self):
+        return self.__config['tenancy']
+
+    ##########################################################################
+    # Returns a new config dict pointing at the region
+    ##########################################################################
+    def get_region_config(self, region):
+        region_config = copy(self.__config)
+        region_config['region'] = region
+        return region_config
+
+    ##########################################################################
+    # Returns the region's own copy of the signer, created once per region
+    ##########################################################################
+    def get_region_signer(self, region):
+        with self.__lock:
+            region_signer = self.__region_signers.get(region)
+            if region_signer is None:
+                region_signer = copy(self.__signer)
+                region_signer.region_name = region
+                self.__region_signers[region] = region_signer
+            return region_signer
+
+    ##########################################################################
+    # Returns a new client of client_class for the region
+    ##########################################################################
+    def create_client(self, client_class, region):
+        client = client_class(self.get_region_config(region), signer=self.get_region_signer(region))
+        if self.__proxy:
+            client.base_client.session.proxies = {'https': self.__proxy}
+        return client
+
+    ##########################################################################
+    # Returns the pooled client for the name and region when a client pool
+    # is set, otherwise a new client
+    ##########################################################################
+    def get_client(self, name, client_class, region):
+        if self.__client_pool:
+            return self.__client_pool.get_client(name, region, lambda: self.create_client(client_class, region))
+        return self.create_client(client_class, region)
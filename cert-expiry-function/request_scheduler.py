@@ -0,0 +1,204 @@
+import time
+import random
+import threading
+import oci
+
+# Scheduled calls are retried by the scheduler only, the SDK's own retry
+# strategy would hide throttling from it
+NO_RETRY = oci.retry.NoneRetryStrategy()
+
+# Response and service error status codes retried with backoff
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+##########################################################################
+# Returns True for service errors and connection failures worth retrying
+##########################################################################
+def is_retryable_error(error):
+    if isinstance(error, oci.exceptions.ServiceError):
+        return error.status in RETRY_STATUS_CODES
+    return isinstance(error, (oci.exceptions.RequestException, oci.exceptions.ConnectTimeout))
+
+
+##########################################################################
+# Full jitter exponential backoff, a random delay of up to backoff_seconds
+# doubled for every earlier attempt and capped at max_backoff_seconds
+##########################################################################
+def get_backoff_delay(attempt, backoff_seconds, max_backoff_seconds=30.0):
+    return random.uniform(0, min(max_backoff_seconds, backoff_seconds * 2 ** attempt))
+
+
+##########################################################################
+# Token bucket refilled at rate tokens per second up to capacity
+##########################################################################
+class TokenBucket:
+
+    def __init__(self, rate, capacity):
+        self.__rate = rate
+        self.__capacity = capacity
+        self.__tokens = capacity
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(self.__capacity, self.__tokens + (now - self.__updated) * self.__rate)
+                self.__updated = now
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+                wait = (1 - self.__tokens) / self.__rate
+            time.sleep(wait)
+
+
+##########################################################################
+# Concurrency limit adjusted by additive increase, multiplicative decrease.
+# Each full window of successful calls raises the limit by one and a
+# throttled call halves it, at most once per cooldown so a burst of 429s
+# from calls already in flight counts as one
+##########################################################################
+class AdaptiveConcurrencyLimit:
+
+    def __init__(self, initial=4, minimum=1, maximum=16, cooldown_seconds=1.0):
+        self.__limit = initial
+        self.__minimum = minimum
+        self.__maximum = maximum
+        self.__cooldown_seconds = cooldown_seconds
+        self.__in_flight = 0
+        self.__successes = 0
+        self.__decreased = 0.0
+        self.__condition = threading.Condition()
+
+    def acquire(self):
+        with self.__condition:
+            while self.__in_flight >= self.__limit:
+                self.__condition.wait()
+            self.__in_flight += 1
+
+    def release(self, throttled=False):
+        with self.__condition:
+            self.__in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self.__successes = 0
+                if now - self.__decreased >= self.__cooldown_seconds:
+                    self.__limit = max(self.__minimum, self.__limit // 2)
+                    self.__decreased = now
+            else:
+                self.__successes += 1
+                if self.__successes >= self.__limit:
+                    self.__limit = min(self.__maximum, self.__limit + 1)
+                    self.__successes = 0
+            self.__condition.notify_all()
+
+    def get_limit(self):
+        return self.__limit
+
+
+##########################################################################
+# Shared scheduler for SDK calls. Every (region, service) pair gets its
+# own token bucket and adaptive concurrency limit so a throttled region or
+# service slows down alone. Throttling, server and connection errors are
+# retried with full jitter exponential backoff, other errors are raised
+##########################################################################
+class RequestScheduler:
+
+    ##########################################################################
+    # service_rates maps a service name to its own requests per second
+    ##########################################################################
+    def __init__(self, rate_per_second=10.0, burst=10, initial_concurrency=4, max_concurrency=16, max_retries=6,
+                 backoff_seconds=0.5, max_backoff_seconds=30.0, service_rates=None):
+        self.__rate_per_second = rate_per_second
+        self.__burst = burst
+        self.__initial_concurrency = initial_concurrency
+        self.__max_concurrency = max_concurrency
+        self.__max_retries = max_retries
+        self.__backoff_seconds = backoff_seconds
+        self.__max_backoff_seconds = max_backoff_seconds
+        self.__service_rates = service_rates if service_rates else {}
+        self.__lanes = {}
+        self.__lock = threading.Lock()
+
+    def __get_lane(self, region, service):
+        key = (region, service)
+        with self.__lock:
+            lane = self.__lanes.get(key)
+            if lane is None:
+                rate = self.__service_rates.get(service, self.__rate_per_second)
+                lane = self.__lanes[key] = {
+                    "bucket": TokenBucket(rate, max(1, self.__burst)),
+                    "limit": AdaptiveConcurrencyLimit(self.__initial_concurrency, maximum=self.__max_concurrency),
+                    "lock": threading.Lock(), "calls": 0, "throttled": 0, "retries": 0, "failures": 0}
+            return lane
+
+    def __count(self, lane, counter):
+        with lane['lock']:
+            lane[counter] += 1
+
+    ##########################################################################
+    # Calls func under the region and service limits, on_retry is called
+    # with the error before each retry. Calls that are not idempotent, such
+    # as creates, are only retried when throttled since the request was
+    # then rejected before it was applied
+    ##########################################################################
+    def call(self, region, service, func, *args, on_retry=None, idempotent=True, **kwargs):
+        lane = self.__get_lane(region, service)
+        for attempt in range(self.__max_retries + 1):
+            lane['bucket'].acquire()
+            lane['limit'].acquire()
+            throttled = False
+            try:
+                self.__count(lane, 'calls')
+                return func(*args, **kwargs)
+            except Exception as e:
+                throttled = isinstance(e, oci.exceptions.ServiceError) and e.status == 429
+                if throttled:
+                    self.__count(lane, 'throttled')
+                if attempt >= self.__max_retries or not (throttled or (idempotent and is_retryable_error(e))):
+                    self.__count(lane, 'failures')
+                    raise
+                self.__count(lane, 'retries')
+                if on_retry:
+                    on_retry(e)
+            finally:
+                lane['limit'].release(throttled)
+            time.sleep(get_backoff_delay(attempt, self.__backoff_seconds, self.__max_backoff_seconds))
+
+    def wrap(self, func, region, service, on_retry=None, idempotent=True):
+        def call(*args, **kwargs):
+            return self.call(region, service, func, *args, on_retry=on_retry, idempotent=idempotent, **kwargs)
+        return call
+
+    ##########################################################################
+    # Returns the calls, throttles, retries, failures and current
+    # concurrency limit of every region and service
+    ##########################################################################
+    def get_stats(self):
+        with self.__lock:
+            lanes = dict(self.__lanes)
+        stats = {}
+        for (region, service), lane in lanes.items():
+            with lane['lock']:
+                stats[f"{region}/{service}"] = {"calls": lane['calls'], "throttled": lane['throttled'],
+                                                "retries": lane['retries'], "failures": lane['failures'],
+                                                "concurrency_limit": lane['limit'].get_limit()}
+        return stats
+
+
+##########################################################################
+# Yields every item of a paginated list call, following opc-next-page.
+# Used instead of oci.pagination, which retries each page with the SDK's
+# default strategy on top of the scheduler
+##########################################################################
+def list_all_results(list_call, **kwargs):
+    page = None
+    while True:
+        if page:
+            kwargs['page'] = page
+        response = list_call(retry_strategy=NO_RETRY, **kwargs)
+        yield from (response.data if isinstance(response.data, list) else response.data.items)
+        if not response.has_next_page:
+            return
+        page = response.next_page
@@ -0,0 +1,243 @@
+import re
+import time
+from array import array
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import rsa, ec, dsa
+
+# NumPy is optional, without it the queries loop over the arrays
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+PEM_CERTIFICATE = re.compile(rb'-----BEGIN CERTIFICATE-----\s.*?-----END CERTIFICATE-----', re.DOTALL)
+
+
+##########################################################################
+# Certificate metadata stored column by column, one row per distinct
+# certificate. Numeric columns are arrays of machine integers so expiry
+# queries run over contiguous memory, with NumPy when it is installed.
+# Names are indexed lower case and the wildcard SANs by their parent domain
+##########################################################################
+class CertificateTable:
+
+    def __init__(self):
+        self.__fingerprints = []
+        self.__rows_by_fingerprint = {}
+        self.__serial_numbers = []
+        self.__common_names = []
+        self.__issuers = []
+        self.__sans = []
+        self.__key_types = []
+        self.__sources = []
+        self.__key_sizes = array('i')
+        self.__not_before = array('q')
+        self.__not_after = array('q')
+        self.__rows_by_name = {}
+        self.__rows_by_wildcard = {}
+        self.__unreadable = []
+
+    ##########################################################################
+    # Takes: iterable of PEM text or bytes, each may hold many certificates,
+    # and an optional matching iterable of source labels such as file paths
+    # Returns: number of certificates added, certificates that fail to load
+    # are recorded with their source and skipped
+    ##########################################################################
+    def add_pem(self, pems, sources=None):
+        added = 0
+        sources = iter(sources) if sources is not None else None
+        for pem in pems:
+            source = next(sources) if sources is not None else None
+            if isinstance(pem, str):
+                pem = pem.encode()
+            for match in PEM_CERTIFICATE.finditer(pem):
+                try:
+                    cert = x509.load_pem_x509_certificate(match.group(0))
+                except ValueError as e:
+                    self.__add_unreadable(source, e)
+                    continue
+                added += self.__add_certificate(cert, source)
+        return added
+
+    def add_der(self, ders, sources=None):
+        added = 0
+        sources = iter(sources) if sources is not None else None
+        for der in ders:
+            source = next(sources) if sources is not None else None
+            try:
+                cert = x509.load_der_x509_certificate(der)
+            except ValueError as e:
+                self.__add_unreadable(source, e)
+                continue
+            added += self.__add_certificate(cert, source)
+        return added
+
+    ##########################################################################
+    # Takes: iterable of file paths, .der and .cer files that are not PEM are
+    # read as DER, other files without a PEM certificate are skipped and
+    # files that cannot be opened are recorded as unreadable
+    ##########################################################################
+    def add_files(self, paths):
+        added = 0
+        for path in paths:
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError as e:
+                self.__add_unreadable(path, e)
+                continue
+            if b'-----BEGIN' in data:
+                added += self.add_pem([data], [path])
+            elif path.lower().endswith(('.der', '.cer')):
+                added += self.add_der([data], [path])
+        return added
+
+    ##########################################################################
+    # Takes: bundles from Certificate_Files or Certificate_Bundle_Scanner,
+    # the leaf and the chain certificates are all added
+    ##########################################################################
+    def add_bundles(self, bundles):
+        added = 0
+        for bundle in bundles:
+            source = bundle.get('directory')
+            added += self.add_pem([bundle['certificate_pem'], bundle.get('cert_chain') or ""], [source, source])
+        return added
+
+    def __add_unreadable(self, source, error):
+        print(f"Skipping unreadable certificate from {source}: {error}")
+        self.__unreadable.append({"source": source, "error": str(error)})
+
+    ##########################################################################
+    # Returns: list of dicts with the source and the load error of every
+    # certificate that could not be read
+    ##########################################################################
+    def get_unreadable(self):
+        return list(self.__unreadable)
+
+    def __add_certificate(self, cert, source):
+        fingerprint = cert.fingerprint(hashes.SHA256()).hex()
+        if fingerprint in self.__rows_by_fingerprint:
+            return 0
+        row = len(self.__fingerprints)
+        self.__rows_by_fingerprint[fingerprint] = row
+        self.__fingerprints.append(fingerprint)
+        self.__serial_numbers.append(format(cert.serial_number, 'x'))
+        common_names = cert.subject.get_attributes_for_oid(x509.NameOID.COMMON_NAME)
+        common_name = common_names[0].value if common_names else None
+        self.__common_names.append(common_name)
+        self.__issuers.append(cert.issuer.rfc4514_string())
+        sans = get_dns_names(cert)
+        self.__sans.append(sans)
+        key_type, key_size = get_key_details(cert.public_key())
+        self.__key_types.append(key_type)
+        self.__key_sizes.append(key_size)
+        self.__not_before.append(int(cert.not_valid_before_utc.timestamp()))
+        self.__not_after.append(int(cert.not_valid_after_utc.timestamp()))
+        self.__sources.append(source)
+
+        for name in {name.lower() for name in ([common_name] if common_name else []) + list(sans)}:
+            if name.startswith("*."):
+                self.__rows_by_wildcard.setdefault(name[2:], []).append(row)
+            else:
+                self.__rows_by_name.setdefault(name, []).append(row)
+        return 1
+
+    ##########################################################################
+    # Returns: row numbers of certificates expiring in [start, end), epoch
+    # seconds, either bound may be None
+    ##########################################################################
+    def get_rows_expiring_between(self, start=None, end=None):
+        if numpy is not None:
+            not_after = numpy.frombuffer(self.__not_after, dtype=numpy.int64)
+            mask = numpy.ones(len(not_after), dtype=bool)
+            if start is not None:
+                mask &= not_after >= start
+            if end is not None:
+                mask &= not_after < end
+            return numpy.flatnonzero(mask).tolist()
+        return [row for row, not_after in enumerate(self.__not_after)
+                if (start is None or not_after >= start) and (end is None or not_after < end)]
+
+    def get_rows_expiring_within(self, days, now=None):
+        now = time.time() if now is None else now
+        return self.get_rows_expiring_between(end=now + days * 86400)
+
+    ##########################################################################
+    # Returns: row numbers of certificates valid for the host name, through
+    # their common name, a SAN or a wildcard SAN one label above it
+    ##########################################################################
+    def get_rows_for_name(self, name):
+        name = name.lower()
+        rows = list(self.__rows_by_name.get(name, []))
+        if "." in name:
+            exact = set(rows)
+            rows.extend(row for row in self.__rows_by_wildcard.get(name.split(".", 1)[1], []) if row not in exact)
+        return rows
+
+    ##########################################################################
+    # Takes: minimum days of validity and minimum RSA and EC key sizes
+    # Returns: dict of row number to the list of problems for every
+    # certificate that should not be uploaded
+    ##########################################################################
+    def get_upload_problems(self, days_to_expiry=30, min_rsa_key_size=2048, min_ec_key_size=256, now=None):
+        now = time.time() if now is None else now
+        problems = {}
+        for row in self.get_rows_expiring_within(days_to_expiry, now):
+            if self.__not_after[row] < now:
+                problems.setdefault(row, []).append("expired")
+            else:
+                problems.setdefault(row, []).append(f"expires within {days_to_expiry} days")
+        minimum_sizes = {"RSA": min_rsa_key_size, "DSA": min_rsa_key_size, "EC": min_ec_key_size}
+        for row, key_type in enumerate(self.__key_types):
+            if self.__key_sizes[row] < minimum_sizes.get(key_type, 0):
+                problems.setdefault(row, []).append(f"{key_type} key size {self.__key_sizes[row]}")
+        return problems
+
+    def get_row(self, row):
+        return {
+            "fingerprint": self.__fingerprints[row],
+            "serial_number": self.__serial_numbers[row],
+            "common_name": self.__common_names[row],
+            "issuer": self.__issuers[row],
+            "subject_alternative_names": list(self.__sans[row]),
+            "key_type": self.__key_types[row],
+            "key_size": self.__key_sizes[row],
+            "not_before": self.__not_before[row],
+            "not_after": self.__not_after[row],
+            "source": self.__sources[row]}
+
+    def get_rows(self, rows):
+        return [self.get_row(row) for row in rows]
+
+    def get_row_by_fingerprint(self, fingerprint):
+        row = self.__rows_by_fingerprint.get(fingerprint.lower().replace(":", ""))
+        return self.get_row(row) if row is not None else None
+
+    def __len__(self):
+        return len(self.__fingerprints)
+
+
+##########################################################################
+# Returns the DNS names of the certificate's SAN extension as a tuple
+##########################################################################
+def get_dns_names(cert):
+    try:
+        extension = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName)
+    except x509.ExtensionNotFound:
+        return ()
+    return tuple(extension.value.get_values_for_type(x509.DNSName))
+
+
+##########################################################################
+# Returns (key type, key size in bits), the size is 0 for key types
+# without a configurable size such as Ed25519
+##########################################################################
+def get_key_details(public_key):
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return "RSA", public_key.key_size
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        return "EC", public_key.curve.key_size
+    if isinstance(public_key, dsa.DSAPublicKey):
+        return "DSA", public_key.key_size
+    return type(public_key).__name__.replace("PublicKey", "").lstrip("_"), 0
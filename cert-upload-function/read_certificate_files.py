@@ -1,7 +1,24 @@
 import os
+import re
+import base64
+import hashlib
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import json
 
+# cryptography is optional, without it keys and certificates are grouped
+# per directory instead of by public key
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import serialization
+except ImportError:
+    x509 = None
+
+PEM_BLOCK = re.compile(r'-----BEGIN ([A-Z0-9 ]+)-----\s.*?-----END \1-----', re.DOTALL)
+PEM_EXTENSIONS = ('.pem', '.crt', '.cer', '.key')
+
 class Certificate_Files:
 
     def __init__(self):
@@ -43,4 +60,314 @@ class Certificate_Files:
             "private_key_pem" : self.__privkey}
         
         return cert_dict
-    
+
+
+####################################################################################
+# Input: path of a PEM file
+# Actions: parses every certificate and private key block in the file, runs in the
+# scanner's worker processes so it has to stay a module level function
+# returns: list of block dicts with the block type, PEM text and the SHA-256
+# fingerprints of the DER and, when cryptography is installed, of the public key
+####################################################################################
+def parse_pem_file(path):
+    try:
+        text = Path(path).read_text(errors='ignore')
+    except OSError as e:
+        print(f"Unable to read {path}: {e}")
+        return []
+
+    blocks = []
+    for match in PEM_BLOCK.finditer(text):
+        label = match.group(1)
+        if label == 'CERTIFICATE':
+            block_type = 'certificate'
+        elif label.endswith('PRIVATE KEY') and 'ENCRYPTED' not in label:
+            block_type = 'private_key'
+        else:
+            continue
+        pem = match.group(0) + "\n"
+        body = pem.split('-----')[2]
+        block = {"type": block_type, "pem": pem,
+                 "fingerprint": hashlib.sha256(base64.b64decode("".join(body.split()))).hexdigest()}
+        if x509:
+            try:
+                block.update(parse_pem_block(block_type, pem.encode()))
+            except (ValueError, TypeError) as e:
+                print(f"Unable to parse {label} in {path}: {e}")
+                continue
+        blocks.append(block)
+    return blocks
+
+
+####################################################################################
+# Input: path of a PEM file and the DER fingerprint of a private key in it
+# returns: the private key's PEM, None when the file no longer holds it. Keys are
+# never written to the scan cache so they are read again when a bundle is built
+####################################################################################
+def read_private_key_pem(path, fingerprint):
+    for block in parse_pem_file(path):
+        if block['type'] == 'private_key' and block['fingerprint'] == fingerprint:
+            return block['pem']
+    return None
+
+
+def parse_pem_block(block_type, pem):
+    if block_type == 'private_key':
+        public_key = serialization.load_pem_private_key(pem, password=None).public_key()
+        return {"spki": spki_fingerprint(public_key)}
+    cert = x509.load_pem_x509_certificate(pem)
+    common_names = cert.subject.get_attributes_for_oid(x509.NameOID.COMMON_NAME)
+    return {"spki": spki_fingerprint(cert.public_key()),
+            "subject": cert.subject.public_bytes().hex(),
+            "issuer": cert.issuer.public_bytes().hex(),
+            "common_name": common_names[0].value if common_names else None,
+            "not_after": cert.not_valid_after_utc.isoformat()}
+
+
+def spki_fingerprint(public_key):
+    spki = public_key.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return hashlib.sha256(spki).hexdigest()
+
+
+####################################################################################
+# Walks a directory tree and lazily yields certificate bundles in the format of
+# Certificate_Files.get_certificates. Files are parsed in a process pool and the
+# parsed blocks are cached by path, mtime and size, in cache_file when one is given,
+# so unchanged files are not read again on the next scan. The cache file is only
+# readable by its owner and holds no private keys, a key file is read again when
+# its bundle is built.
+# With cryptography a private key is paired with the certificate holding its public
+# key wherever the two files are, and the chain is followed through the issuers seen
+# in the tree. A bundle is yielded once its chain reaches a self signed certificate,
+# the rest at the end of the scan with the chain that was found. When a newer
+# certificate for an already yielded key turns up, its bundle is yielded again with
+# the same spki and replaces the earlier one. Without it every directory holding a single private key is a bundle
+# of that key, the first certificate stored alone in a file and the other certificates
+####################################################################################
+class Certificate_Bundle_Scanner:
+
+    def __init__(self, max_workers=None, cache_file=None, extensions=PEM_EXTENSIONS):
+        self.__max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self.__cache_file = cache_file
+        self.__extensions = extensions
+        self.__cache = {}
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file) as f:
+                self.__cache = json.load(f)
+
+    ####################################################################################
+    # Input: directory
+    # returns: generator of bundle dicts with cert_chain, certificate_pem,
+    # private_key_pem, directory and, with cryptography, spki, common_name and not_after
+    ####################################################################################
+    def scan(self, directory):
+        self.__keys = {}
+        self.__leaves = {}
+        self.__issuers = {}
+        self.__waiting_for_issuer = {}
+        self.__yielded = set()
+        seen_paths = set()
+        current_directory = None
+        directory_blocks = []
+        try:
+            for path, blocks in self.__parse_files(self.__walk(directory, seen_paths)):
+                if x509:
+                    yield from self.__add_blocks(path, blocks)
+                    continue
+                if os.path.dirname(path) != current_directory:
+                    yield from self.__group_directory(current_directory, directory_blocks)
+                    current_directory = os.path.dirname(path)
+                    directory_blocks = []
+                directory_blocks.append((path, blocks))
+            if x509:
+                # Bundles whose issuer never turned up, with the chain that was found
+                for spki in set(itertools.chain(*self.__waiting_for_issuer.values())):
+                    if self.__leaves[spki]['fingerprint'] not in self.__yielded:
+                        yield self.__create_bundle(spki)
+            else:
+                yield from self.__group_directory(current_directory, directory_blocks)
+        finally:
+            self.__save_cache(directory, seen_paths)
+
+    ####################################################################################
+    # Yields (path, stat) for every PEM file in the tree, sorted so directories are
+    # visited in a stable order
+    ####################################################################################
+    def __walk(self, directory, seen_paths):
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for file in sorted(files):
+                if not file.endswith(self.__extensions):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                seen_paths.add(path)
+                yield path, stat
+
+    ####################################################################################
+    # Yields (path, blocks) in walk order. Cached files are returned directly, the
+    # rest are parsed in the process pool with a bounded window of files in flight
+    ####################################################################################
+    def __parse_files(self, files):
+        if self.__max_workers <= 1:
+            for path, stat in files:
+                yield path, self.__get_cached(path, stat) or self.__set_cached(path, stat, parse_pem_file(path))
+            return
+
+        with ProcessPoolExecutor(max_workers=self.__max_workers) as executor:
+            pending = deque()
+            for path, stat in files:
+                blocks = self.__get_cached(path, stat)
+                pending.append((path, stat, blocks if blocks is not None else executor.submit(parse_pem_file, path)))
+                while len(pending) > self.__max_workers * 4:
+                    yield self.__collect(*pending.popleft())
+            while pending:
+                yield self.__collect(*pending.popleft())
+
+    def __collect(self, path, stat, blocks):
+        if isinstance(blocks, list):
+            return path, blocks
+        return path, self.__set_cached(path, stat, blocks.result())
+
+    def __get_cached(self, path, stat):
+        entry = self.__cache.get(path)
+        if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return entry['blocks']
+        return None
+
+    def __set_cached(self, path, stat, blocks):
+        self.__cache[path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "blocks": blocks}
+        return blocks
+
+    ####################################################################################
+    # Drops entries for files under the scanned directory that are gone and writes
+    # the cache file
+    ####################################################################################
+    def __save_cache(self, directory, seen_paths):
+        prefix = os.path.join(directory, "")
+        for path in [path for path in self.__cache if path.startswith(prefix) and path not in seen_paths]:
+            del self.__cache[path]
+        if not self.__cache_file:
+            return
+        cache = {path: dict(entry, blocks=[{field: value for field, value in block.items()
+                                            if block['type'] != 'private_key' or field != 'pem'}
+                                           for block in entry['blocks']])
+                 for path, entry in self.__cache.items()}
+        temporary_file = self.__cache_file + ".tmp"
+        with os.fdopen(os.open(temporary_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+            os.chmod(temporary_file, 0o600)
+            json.dump(cache, f)
+        os.replace(temporary_file, self.__cache_file)
+
+    ####################################################################################
+    # Indexes the blocks of one file and yields the bundles they complete
+    ####################################################################################
+    def __add_blocks(self, path, blocks):
+        ready = []
+        for block in blocks:
+            if block['type'] == 'private_key':
+                self.__keys.setdefault(block['spki'], dict(block, path=path))
+                if block['spki'] in self.__leaves:
+                    ready.append(block['spki'])
+                continue
+
+            block = dict(block, directory=os.path.dirname(path))
+            self.__issuers.setdefault(block['subject'], block)
+            # The newest certificate for a key is the leaf
+            leaf = self.__leaves.get(block['spki'])
+            if leaf is None or block['not_after'] > leaf['not_after']:
+                self.__leaves[block['spki']] = block
+                if block['spki'] in self.__keys:
+                    ready.append(block['spki'])
+            ready.extend(self.__waiting_for_issuer.pop(block['subject'], []))
+
+        for spki in dict.fromkeys(ready):
+            leaf = self.__leaves[spki]
+            if leaf['fingerprint'] in self.__yielded:
+                continue
+            missing_issuer = self.__get_missing_issuer(leaf)
+            if missing_issuer is None:
+                yield self.__create_bundle(spki)
+            else:
+                self.__waiting_for_issuer.setdefault(missing_issuer, []).append(spki)
+
+    ####################################################################################
+    # Follows the issuers from the certificate up to a self signed one
+    # returns: the subject of the first issuer not seen yet, None when the chain is
+    # complete or loops
+    ####################################################################################
+    def __get_missing_issuer(self, cert):
+        seen = set()
+        while cert['issuer'] != cert['subject'] and cert['fingerprint'] not in seen:
+            seen.add(cert['fingerprint'])
+            issuer = self.__issuers.get(cert['issuer'])
+            if issuer is None:
+                return cert['issuer']
+            cert = issuer
+        return None
+
+    ####################################################################################
+    # Returns the PEM of a private key block, read from its file when the block came
+    # from the cache
+    ####################################################################################
+    def __get_private_key_pem(self, block):
+        if 'pem' in block:
+            return block['pem']
+        pem = read_private_key_pem(block['path'], block['fingerprint'])
+        if pem is None:
+            print(f"Private key {block['fingerprint']} is no longer in {block['path']}")
+        return pem
+
+    ####################################################################################
+    # Follows the issuers from the leaf up to a self signed or unknown certificate,
+    # the self signed root is left out of the chain
+    ####################################################################################
+    def __create_bundle(self, spki):
+        leaf = self.__leaves[spki]
+        self.__yielded.add(leaf['fingerprint'])
+        chain = []
+        cert = leaf
+        seen = {leaf['fingerprint']}
+        while cert['issuer'] != cert['subject']:
+            issuer = self.__issuers.get(cert['issuer'])
+            if issuer is None or issuer['fingerprint'] in seen or issuer['issuer'] == issuer['subject']:
+                break
+            seen.add(issuer['fingerprint'])
+            chain.append(issuer['pem'])
+            cert = issuer
+        return {
+            "cert_chain": "".join(chain),
+            "certificate_pem": leaf['pem'],
+            "private_key_pem": self.__get_private_key_pem(self.__keys[leaf['spki']]),
+            "directory": leaf['directory'],
+            "spki": leaf['spki'],
+            "common_name": leaf['common_name'],
+            "not_after": leaf['not_after']}
+
+    ####################################################################################
+    # Without cryptography: one bundle per directory holding a single private key
+    ####################################################################################
+    def __group_directory(self, directory, directory_blocks):
+        keys = {block['fingerprint']: dict(block, path=path) for path, blocks in directory_blocks for block in blocks
+                if block['type'] == 'private_key'}
+        if len(keys) != 1:
+            return
+        certificates = {}
+        leaf = None
+        for path, blocks in directory_blocks:
+            file_certificates = [block for block in blocks if block['type'] == 'certificate']
+            for block in file_certificates:
+                certificates.setdefault(block['fingerprint'], block)
+            if leaf is None and len(file_certificates) == 1:
+                leaf = file_certificates[0]
+        if leaf is None:
+            return
+        yield {
+            "cert_chain": "".join(block['pem'] for fingerprint, block in certificates.items()
+                                  if fingerprint != leaf['fingerprint']),
+            "certificate_pem": leaf['pem'],
+            "private_key_pem": self.__get_private_key_pem(next(iter(keys.values()))),
+            "directory": directory}
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The functions are deployed as flat directories of modules, the
+# benchmarks hold the simulated tenancy
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for function_directory in ("cert-expiry-function", "cert-upload-function", "benchmarks"):
+    sys.path.insert(0, os.path.join(ROOT, function_directory))
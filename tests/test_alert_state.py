@@ -0,0 +1,59 @@
+import time
+import pytest
+from alert_state import AlertTracker, JsonAlertStateStore, SqliteAlertStateStore
+from certificate_cache import LocalFileCacheBackend
+
+
+def record(certificate_id, expiration_date="2026-11-01 00:00:00"):
+    return {"id": certificate_id, "expiration_date": expiration_date, "region": "us-phoenix-1"}
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store_factory(request, tmp_path):
+    if request.param == "json":
+        backend = LocalFileCacheBackend(str(tmp_path / "cache"))
+        return lambda: JsonAlertStateStore(backend)
+    return lambda: SqliteAlertStateStore(str(tmp_path / "alert-state.db"))
+
+
+def run(store_factory, records, thresholds_by_id, collected_ids, **kwargs):
+    tracker = AlertTracker(store_factory(), **kwargs)
+    alerts = tracker.select(records, thresholds_by_id, collected_ids)
+    tracker.commit(alerts)
+    return [alert['id'] for alert in alerts]
+
+
+def test_alerts_only_new_or_escalated_certificates(store_factory):
+    records = [record("a"), record("b")]
+    assert run(store_factory, records, {"a": 30, "b": 30}, {"a", "b"}) == ["a", "b"]
+    assert run(store_factory, records, {"a": 30, "b": 30}, {"a", "b"}) == []
+    assert run(store_factory, records, {"a": 7, "b": 30}, {"a", "b"}) == ["a"]
+    # A renewal that is still near expiry alerts with its new date
+    assert run(store_factory, [record("a"), record("b", "2026-11-15 00:00:00")], {"a": 7, "b": 30},
+               {"a", "b"}) == ["b"]
+
+
+def test_collected_certificate_no_longer_near_expiry_is_resolved(store_factory):
+    run(store_factory, [record("a"), record("b")], {"a": 30, "b": 30}, {"a", "b"})
+    assert run(store_factory, [record("a")], {"a": 30}, {"a", "b"}) == []
+    assert store_factory().load().keys() == {"a"}
+    assert run(store_factory, [record("a"), record("b")], {"a": 30, "b": 30}, {"a", "b"}) == ["b"]
+
+
+def test_partial_failure_keeps_the_state_of_missing_certificates(store_factory):
+    run(store_factory, [record("a"), record("b")], {"a": 30, "b": 30}, {"a", "b"})
+    # b's region failed so it is neither near expiry nor collected
+    assert run(store_factory, [record("a")], {"a": 30}, {"a"}) == []
+    assert store_factory().load().keys() == {"a", "b"}
+    # The region recovers and b is not alerted again
+    assert run(store_factory, [record("a"), record("b")], {"a": 30, "b": 30}, {"a", "b"}) == []
+
+
+def test_missing_certificates_are_dropped_after_the_retention(store_factory):
+    run(store_factory, [record("a")], {"a": 30}, {"a"})
+    assert run(store_factory, [], {}, set(), missing_retention_seconds=3600) == []
+    assert store_factory().load().keys() == {"a"}
+    store = store_factory()
+    store.save({"a": dict(store.load()["a"], notified_at=time.time() - 7200)}, [])
+    run(store_factory, [], {}, set(), missing_retention_seconds=3600)
+    assert store_factory().load() == {}
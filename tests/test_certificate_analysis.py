@@ -0,0 +1,83 @@
+import datetime
+import pytest
+
+x509 = pytest.importorskip("cryptography.x509")
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+import certificate_analysis
+
+NOW = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_certificate(common_name, days, sans=(), key=None):
+    key = key or ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, common_name)])
+    builder = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key()) \
+        .serial_number(x509.random_serial_number()).not_valid_before(NOW - datetime.timedelta(days=365)) \
+        .not_valid_after(NOW + datetime.timedelta(days=days))
+    if sans:
+        builder = builder.add_extension(x509.SubjectAlternativeName([x509.DNSName(san) for san in sans]),
+                                        critical=False)
+    return builder.sign(key, hashes.SHA256())
+
+
+def to_pem(cert):
+    return cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+@pytest.fixture
+def table():
+    table = certificate_analysis.CertificateTable()
+    table.add_pem([to_pem(make_certificate("expired.example.com", -1)),
+                   to_pem(make_certificate("soon.example.com", 10)),
+                   to_pem(make_certificate("later.example.com", 200, sans=("*.example.com", "example.com")))],
+                  ["a.pem", "b.pem", "c.pem"])
+    return table
+
+
+def get_names(table, rows):
+    return sorted(row["common_name"] for row in table.get_rows(rows))
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_expiry_queries(table, monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(certificate_analysis, "numpy", None)
+    now = NOW.timestamp()
+    assert get_names(table, table.get_rows_expiring_within(30, now)) == ["expired.example.com", "soon.example.com"]
+    assert get_names(table, table.get_rows_expiring_between(start=now)) == ["later.example.com", "soon.example.com"]
+    assert get_names(table, table.get_rows_expiring_between(start=now, end=now + 10 * 86400)) == []
+    assert get_names(table, table.get_rows_expiring_between()) == \
+        ["expired.example.com", "later.example.com", "soon.example.com"]
+
+
+def test_name_lookup_matches_wildcards_one_label_up(table):
+    assert get_names(table, table.get_rows_for_name("SOON.example.com")) == ["later.example.com", "soon.example.com"]
+    assert get_names(table, table.get_rows_for_name("example.com")) == ["later.example.com"]
+    assert get_names(table, table.get_rows_for_name("a.b.example.com")) == []
+    assert len(table.get_rows_for_name("later.example.com")) == 1
+
+
+def test_upload_problems(table):
+    weak_key = rsa.generate_private_key(public_exponent=65537, key_size=1024)
+    table.add_pem([to_pem(make_certificate("weak.example.com", 200, key=weak_key))])
+    problems = {table.get_row(row)["common_name"]: found
+                for row, found in table.get_upload_problems(now=NOW.timestamp()).items()}
+    assert problems == {"expired.example.com": ["expired"],
+                        "soon.example.com": ["expires within 30 days"],
+                        "weak.example.com": ["RSA key size 1024"]}
+
+
+def test_unreadable_certificates_are_skipped(tmp_path):
+    good = make_certificate("good.example.com", 100)
+    bad_pem = "-----BEGIN CERTIFICATE-----\nbm90IGEgY2VydGlmaWNhdGU=\n-----END CERTIFICATE-----\n"
+    (tmp_path / "mixed.pem").write_text(bad_pem + to_pem(good))
+    (tmp_path / "broken.der").write_bytes(b"not a certificate")
+    table = certificate_analysis.CertificateTable()
+    paths = [str(tmp_path / "mixed.pem"), str(tmp_path / "broken.der"), str(tmp_path / "missing.pem")]
+    assert table.add_files(paths) == 1
+    assert len(table) == 1
+    assert [entry["source"] for entry in table.get_unreadable()] == paths
+    assert table.get_row_by_fingerprint(good.fingerprint(hashes.SHA256()).hex())["source"] == paths[0]
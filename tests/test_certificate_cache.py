@@ -0,0 +1,61 @@
+import os
+import time
+import pytest
+from certificate_cache import CertificateInventoryCache, LocalFileCacheBackend
+
+TENANCY_ID = "ocid1.tenancy.oc1..a"
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return LocalFileCacheBackend(str(tmp_path / "cache"))
+
+
+def test_backend_round_trip(backend):
+    assert backend.read("missing") is None
+    backend.write("entry", b"data")
+    backend.write("entry", b"newer")
+    assert backend.read("entry") == b"newer"
+    assert backend.list_keys() == ["entry"]
+    backend.delete("entry")
+    backend.delete("entry")
+    assert backend.read("entry") is None
+
+
+def test_partial_writes_are_not_listed(backend, tmp_path):
+    open(os.path.join(str(tmp_path / "cache"), ".tmp-partial"), 'wb').close()
+    backend.write("entry", b"data")
+    assert backend.list_keys() == ["entry"]
+
+
+def test_entry_is_fresh_within_its_region_ttl(backend):
+    cache = CertificateInventoryCache(backend, ttl_seconds=60, region_ttls={"us-ashburn-1": 600})
+    cache.save_region(TENANCY_ID, "us-phoenix-1", time.time() - 120, [])
+    cache.save_region(TENANCY_ID, "us-ashburn-1", time.time() - 120, [{"id": "a"}])
+    phoenix = cache.load_region(TENANCY_ID, "us-phoenix-1")
+    ashburn = cache.load_region(TENANCY_ID, "us-ashburn-1")
+    assert not cache.is_fresh(phoenix)
+    assert cache.is_fresh(ashburn)
+    assert ashburn['certificates'] == [{"id": "a"}]
+
+
+def test_entries_past_max_age_are_evicted(backend):
+    cache = CertificateInventoryCache(backend, ttl_seconds=60, max_age_seconds=3600)
+    cache.save_region(TENANCY_ID, "us-phoenix-1", time.time() - 7200, [])
+    assert cache.load_region(TENANCY_ID, "us-phoenix-1") is None
+    assert backend.list_keys() == []
+
+
+def test_corrupt_entries_are_evicted(backend):
+    backend.write(f"{TENANCY_ID}.us-phoenix-1.json", b"{not json")
+    assert CertificateInventoryCache(backend).load_region(TENANCY_ID, "us-phoenix-1") is None
+    assert backend.list_keys() == []
+
+
+def test_unsubscribed_regions_are_evicted(backend):
+    cache = CertificateInventoryCache(backend)
+    for region in ("us-phoenix-1", "us-ashburn-1"):
+        cache.save_region(TENANCY_ID, region, time.time(), [])
+    cache.save_region("ocid1.tenancy.oc1..b", "us-ashburn-1", time.time(), [])
+    cache.evict_regions(TENANCY_ID, ["us-phoenix-1"])
+    assert sorted(backend.list_keys()) == [f"{TENANCY_ID}.us-phoenix-1.json", "ocid1.tenancy.oc1..b.us-ashburn-1.json"]
@@ -0,0 +1,137 @@
+import io
+import json
+import pytest
+from certificate_events import CertificateEventProcessor, read_events, read_events_from_file
+from certificate_index import CertificateIndex
+from certificate_record import CertificateRecord
+
+PREFIX = "com.oraclecloud.certificatesmanagement."
+REGIONS = {"phx": "us-phoenix-1", "iad": "us-ashburn-1"}
+
+EVENTS = [{"eventType": "com.oraclecloud.certificatesmanagement.updatecertificate",
+           "data": {"resourceId": "ocid1.certificate.oc1.phx.a", "resourceName": "brackets }] and \" in a string"}},
+          {"eventType": "com.oraclecloud.certificatesmanagement.deletecertificate",
+           "data": {"resourceId": "ocid1.certificate.oc1.phx.b"}}]
+
+
+def test_read_events_one_per_line():
+    assert list(read_events(io.StringIO("\n".join(json.dumps(event) for event in EVENTS)))) == EVENTS
+
+
+def test_read_events_pretty_printed():
+    text = "\n".join(json.dumps(event, indent=2) for event in EVENTS)
+    assert list(read_events(io.StringIO(text))) == EVENTS
+
+
+def test_read_events_array_and_malformed_line():
+    text = json.dumps(EVENTS, indent=2) + "\nnot json\n" + json.dumps(EVENTS[1])
+    assert list(read_events(io.StringIO(text))) == EVENTS + [EVENTS[1]]
+
+
+def test_read_events_from_array_file(tmp_path):
+    path = tmp_path / "events.json"
+    path.write_text("\n  " + json.dumps(EVENTS, indent=2))
+    assert list(read_events_from_file(str(path))) == EVENTS
+
+
+def record(certificate_id, common_name, lifecycle_state="ACTIVE"):
+    return CertificateRecord(id=certificate_id, name=common_name, compartment_id="ocid1.compartment.oc1..a",
+                             region_key=certificate_id.split(".")[3], common_name=common_name,
+                             not_after=1900000000, lifecycle_state=lifecycle_state)
+
+
+def event(event_type, certificate_id):
+    return {"eventType": PREFIX + event_type, "eventID": event_type, "eventTime": "2026-10-18T00:00:00Z",
+            "data": {"resourceId": certificate_id}}
+
+
+##########################################################################
+# Inventory with the OCICertificates event methods over a CertificateIndex,
+# certificates in remote stand in for what OCI returns
+##########################################################################
+class InMemoryInventory:
+
+    def __init__(self, certificates):
+        self.remote = {cert.id: cert for cert in certificates}
+        self.index = CertificateIndex(certificates, self.get_region_name)
+
+    def get_region_name(self, region_key):
+        return REGIONS.get(region_key)
+
+    def fetch_certificate_record(self, certificate_id):
+        cert = self.remote.get(certificate_id)
+        if isinstance(cert, Exception):
+            raise cert
+        return cert
+
+    def upsert_certificate(self, cert):
+        if self.get_region_name(cert.region_key) is None:
+            return False
+        self.remove_certificate(cert.id)
+        self.index.add(cert)
+        return True
+
+    def remove_certificate(self, certificate_id):
+        cert = self.index.get_by_id(certificate_id)
+        if cert is None:
+            return False
+        self.index.remove(cert)
+        return True
+
+
+@pytest.fixture
+def inventory():
+    return InMemoryInventory([record("ocid1.certificate.oc1.phx.a", "a.example.com"),
+                              record("ocid1.certificate.oc1.iad.b", "b.example.com")])
+
+
+def test_create_and_update_read_the_certificate(inventory):
+    processor = CertificateEventProcessor(inventory)
+    inventory.remote["ocid1.certificate.oc1.phx.c"] = record("ocid1.certificate.oc1.phx.c", "c.example.com")
+    inventory.remote["ocid1.certificate.oc1.iad.b"] = record("ocid1.certificate.oc1.iad.b", "new.example.com")
+    results = list(processor.apply_events([event("createcertificate.end", "ocid1.certificate.oc1.phx.c"),
+                                           event("updatecertificate", "ocid1.certificate.oc1.iad.b")]))
+    assert [result['status'] for result in results] == ["upserted", "upserted"]
+    assert [cert.id for cert in inventory.index.get_by_common_name("c.example.com")] == ["ocid1.certificate.oc1.phx.c"]
+    assert not inventory.index.get_by_common_name("b.example.com")
+    assert processor.get_changed_regions() == {"us-phoenix-1", "us-ashburn-1"}
+
+
+def test_schedule_deletion_keeps_the_certificate_pending_deletion(inventory):
+    processor = CertificateEventProcessor(inventory)
+    inventory.remote["ocid1.certificate.oc1.phx.a"] = record("ocid1.certificate.oc1.phx.a", "a.example.com",
+                                                             "PENDING_DELETION")
+    result = processor.apply(event("schedulecertificatedeletion", "ocid1.certificate.oc1.phx.a"))
+    assert result['status'] == "upserted"
+    assert inventory.index.get_by_id("ocid1.certificate.oc1.phx.a").lifecycle_state == "PENDING_DELETION"
+
+
+def test_delete_and_missing_certificates_are_removed(inventory):
+    processor = CertificateEventProcessor(inventory)
+    del inventory.remote["ocid1.certificate.oc1.iad.b"]
+    results = list(processor.apply_events([event("deletecertificate", "ocid1.certificate.oc1.phx.a"),
+                                           event("updatecertificate", "ocid1.certificate.oc1.iad.b"),
+                                           event("deletecertificate", "ocid1.certificate.oc1.phx.a")]))
+    assert [result['status'] for result in results] == ["removed", "removed", "unchanged"]
+    assert len(inventory.index) == 0
+
+
+def test_other_events_are_ignored(inventory):
+    processor = CertificateEventProcessor(inventory)
+    results = list(processor.apply_events([event("createcertificate.begin", "ocid1.certificate.oc1.phx.c"),
+                                           {"eventType": "com.oraclecloud.objectstorage.createobject"},
+                                           event("updatecertificate", "ocid1.bucket.oc1.phx.x"),
+                                           "not an event"]))
+    assert [result['status'] for result in results] == ["ignored"] * 4
+    assert len(inventory.index) == 2
+
+
+def test_failed_event_does_not_stop_the_rest(inventory):
+    processor = CertificateEventProcessor(inventory)
+    inventory.remote["ocid1.certificate.oc1.phx.a"] = RuntimeError("throttled")
+    results = list(processor.apply_events([event("updatecertificate", "ocid1.certificate.oc1.phx.a"),
+                                           event("deletecertificate", "ocid1.certificate.oc1.iad.b")]))
+    assert [result['status'] for result in results] == ["failed", "removed"]
+    assert results[0]['error'] == "throttled"
+    assert processor.get_stats() == {"events": 2, "ignored": 0, "upserted": 0, "removed": 1, "unchanged": 0,
+                                     "failed": 1}
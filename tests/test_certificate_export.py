@@ -0,0 +1,99 @@
+import json
+import os
+import pytest
+import certificate_export
+from certificate_export import CertificateExporter
+from certificate_index import CertificateIndex
+from certificate_record import CertificateRecord
+
+REGIONS = {"phx": "us-phoenix-1", "iad": "us-ashburn-1"}
+
+
+class FakeOCICertificates:
+
+    def __init__(self, records, near_expiry):
+        self.index = CertificateIndex(records, REGIONS.get)
+        self.near_expiry = near_expiry
+
+    def get_certificate_index(self):
+        return self.index
+
+    def get_oci_certificates_near_expiration(self):
+        return self.near_expiry
+
+    def get_regions(self):
+        return sorted(REGIONS.values())
+
+    def get_region_name(self, region):
+        return REGIONS.get(region, region if region in REGIONS.values() else None)
+
+
+def make_record(id, region_key):
+    return CertificateRecord(id=id, name=id, compartment_id="c", region_key=region_key, common_name=f"{id}.example.com",
+                             not_after=1767225600, lifecycle_state="ACTIVE", sans=("alt.example.com",))
+
+
+@pytest.fixture
+def oci_certs():
+    return FakeOCICertificates(
+        [make_record("a", "phx"), make_record("b", "phx"), make_record("c", "iad")],
+        [{"id": "a", "link": "https://a", "expiration_date": "2026-01-01", "region": "us-phoenix-1",
+          "compartment_id": "c"}])
+
+
+def read_partition(directory, dataset, region):
+    partition = os.path.join(directory, dataset, f"region={region}")
+    rows = []
+    for name in sorted(os.listdir(partition)):
+        with open(os.path.join(partition, name)) as part:
+            rows.append([json.loads(line) for line in part])
+    return rows
+
+
+def test_ndjson_partition_layout(tmp_path, oci_certs):
+    counts = CertificateExporter(str(tmp_path)).export(oci_certs)
+    assert counts == {"us-ashburn-1": 1, "us-phoenix-1": 2}
+    assert sorted(os.listdir(tmp_path)) == ["certificates", "near_expiry"]
+    assert sorted(os.listdir(tmp_path / "certificates")) == ["region=us-ashburn-1", "region=us-phoenix-1"]
+
+    [rows] = read_partition(str(tmp_path), "certificates", "us-phoenix-1")
+    assert [row["id"] for row in rows] == ["a", "b"]
+    assert list(rows[0]) == list(certificate_export.CERTIFICATE_COLUMNS)
+    assert rows[0]["sans"] == ["alt.example.com"] and rows[0]["region"] == "us-phoenix-1"
+    [near_expiry] = read_partition(str(tmp_path), "near_expiry", "us-phoenix-1")
+    assert [row["id"] for row in near_expiry] == ["a"]
+    assert read_partition(str(tmp_path), "near_expiry", "us-ashburn-1") == [[]]
+
+
+def test_replace_and_append_within_the_same_second(tmp_path, oci_certs, monkeypatch):
+    monkeypatch.setattr(certificate_export.time, "time", lambda: 1767225600)
+    exporter = CertificateExporter(str(tmp_path))
+    exporter.export(oci_certs, ["phx"])
+    exporter.export(oci_certs, ["phx"])
+    assert len(read_partition(str(tmp_path), "certificates", "us-phoenix-1")) == 1
+    assert not (tmp_path / "certificates" / "region=us-ashburn-1").exists()
+
+    appender = CertificateExporter(str(tmp_path), append=True)
+    appender.export(oci_certs, ["phx"])
+    appender.export(oci_certs, ["phx"])
+    parts = read_partition(str(tmp_path), "certificates", "us-phoenix-1")
+    assert len(parts) == 3
+    assert all([row["id"] for row in part] == ["a", "b"] for part in parts)
+    names = os.listdir(tmp_path / "certificates" / "region=us-phoenix-1")
+    assert all(name.startswith("part-1767225600-") and name.endswith(".ndjson") for name in names)
+
+
+def test_failed_write_leaves_no_part(tmp_path):
+    def rows():
+        yield {"id": "a"}
+        raise RuntimeError("collection failed")
+
+    exporter = CertificateExporter(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        exporter.write_region("certificates", "us-phoenix-1", rows())
+    assert os.listdir(tmp_path / "certificates" / "region=us-phoenix-1") == []
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        CertificateExporter("exports", format="csv")
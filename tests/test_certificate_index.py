@@ -0,0 +1,123 @@
+import datetime
+from certificate_index import CertificateIndex, ExpiryIndex
+from certificate_record import CertificateRecord
+
+REGIONS = {"phx": "us-phoenix-1", "iad": "us-ashburn-1", "us-phoenix-1": "us-phoenix-1",
+           "us-ashburn-1": "us-ashburn-1"}
+
+
+def make_record(id, common_name=None, sans=(), compartment_id="c1", region_key="phx", not_after=None):
+    return CertificateRecord(id=id, name=id, compartment_id=compartment_id, region_key=region_key,
+                             common_name=common_name, not_after=not_after, lifecycle_state="ACTIVE", sans=sans)
+
+
+def get_ids(certs):
+    return [cert.id for cert in certs]
+
+
+def create_index():
+    return CertificateIndex([make_record("a", "www.example.com", ("www.example.com", "example.com")),
+                             make_record("b", "api.example.com", ("WWW.example.com",), compartment_id="c2"),
+                             make_record("c", None, ("mail.example.com",), region_key="iad"),
+                             make_record("d", "WWW.Example.com", region_key="us-ashburn-1")], REGIONS.get)
+
+
+def test_name_lookups_are_case_insensitive():
+    index = create_index()
+    assert get_ids(index.get_by_common_name("www.EXAMPLE.com")) == ["a", "d"]
+    assert get_ids(index.get_by_san("www.example.com")) == ["a", "b"]
+    # A certificate matching on both its common name and a SAN is returned once
+    assert get_ids(index.get_by_name("WWW.example.com")) == ["a", "d", "b"]
+    assert get_ids(index.get_by_name("mail.example.com")) == ["c"]
+    assert index.get_by_name("missing.example.com") == []
+    assert {name: get_ids(certs) for name, certs in index.get_by_names(["example.com", "nope"]).items()} == \
+        {"example.com": ["a"], "nope": []}
+    assert {name: get_ids(certs) for name, certs in index.get_by_common_names(["api.example.com"]).items()} == \
+        {"api.example.com": ["b"]}
+
+
+def test_group_lookups():
+    index = create_index()
+    assert len(index) == 4
+    assert get_ids(index.get_all()) == ["a", "b", "c", "d"]
+    assert index.get_by_id("c").sans == ("mail.example.com",)
+    assert index.get_by_id("missing") is None
+    assert get_ids(index.get_by_compartment("c1")) == ["a", "c", "d"]
+    # Region keys and names resolve to the same region
+    assert get_ids(index.get_by_region("us-ashburn-1")) == ["c", "d"]
+    assert get_ids(index.get_by_region("us-phoenix-1")) == ["a", "b"]
+
+
+def test_add_and_remove():
+    index = create_index()
+    index.remove(index.get_by_id("a"))
+    assert index.get_by_id("a") is None
+    assert get_ids(index.get_by_common_name("www.example.com")) == ["d"]
+    assert index.get_by_san("example.com") == []
+    assert get_ids(index.get_by_compartment("c1")) == ["c", "d"]
+
+    index.remove(index.get_by_id("b"))
+    assert index.get_by_compartment("c2") == []
+    assert index.get_by_region("us-phoenix-1") == []
+
+    # An updated record replaces the old one in every table
+    index.remove(index.get_by_id("d"))
+    index.add(make_record("d", "moved.example.com", compartment_id="c2", region_key="phx"))
+    assert index.get_by_common_name("www.example.com") == []
+    assert get_ids(index.get_by_name("moved.example.com")) == ["d"]
+    assert get_ids(index.get_by_compartment("c2")) == ["d"]
+    assert get_ids(index.get_by_region("us-phoenix-1")) == ["d"]
+    assert len(index) == 2
+
+
+NOW = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def days_from_now(days):
+    return int((NOW + datetime.timedelta(days=days)).timestamp())
+
+
+def create_expiry_index():
+    return ExpiryIndex([make_record("expired", not_after=days_from_now(-3)),
+                        make_record("now", not_after=days_from_now(0)),
+                        make_record("day-7", not_after=days_from_now(7)),
+                        make_record("after-7", not_after=days_from_now(7) + 1),
+                        make_record("day-30", not_after=days_from_now(30)),
+                        make_record("day-90", not_after=days_from_now(90)),
+                        make_record("no-validity")])
+
+
+def test_buckets_at_the_boundaries():
+    buckets = create_expiry_index().get_buckets([30, 7], NOW)
+    assert list(buckets) == [0, 7, 30]
+    # Expiring exactly at now or at a threshold lands in that bucket
+    assert {days: get_ids(certs) for days, certs in buckets.items()} == \
+        {0: ["expired", "now"], 7: ["day-7"], 30: ["after-7", "day-30"]}
+    assert {days: get_ids(certs) for days, certs in create_expiry_index().get_buckets([], NOW).items()} == \
+        {0: ["expired", "now"]}
+    assert get_ids(ExpiryIndex([]).get_buckets([7], NOW)[7]) == []
+
+
+def test_expiry_windows():
+    index = create_expiry_index()
+    assert len(index) == 6
+    assert get_ids(index.get_expiring_before(NOW + datetime.timedelta(days=7))) == ["expired", "now", "day-7"]
+    assert get_ids(index.get_expiring_between(NOW, NOW + datetime.timedelta(days=30))) == \
+        ["day-7", "after-7", "day-30"]
+    assert get_ids(index.get_expiring_between(NOW + datetime.timedelta(days=30))) == ["day-90"]
+
+
+def test_incremental_insert_and_remove():
+    index = create_expiry_index()
+    index.add(make_record("also-day-7", not_after=days_from_now(7)))
+    index.add(make_record("ignored"))
+    assert get_ids(index.get_buckets([7], NOW)[7]) == ["day-7", "also-day-7"]
+
+    # Removal finds the record among others with the same not_after
+    index.remove(make_record("day-7", not_after=days_from_now(7)))
+    index.remove(make_record("missing", not_after=days_from_now(7)))
+    index.remove(make_record("no-validity"))
+    assert get_ids(index.get_buckets([7], NOW)[7]) == ["also-day-7"]
+    index.remove(make_record("expired", not_after=days_from_now(-3)))
+    assert get_ids(index.get_buckets([7], NOW)[0]) == ["now"]
+    assert len(index) == 5
@@ -0,0 +1,84 @@
+import base64
+import hashlib
+import datetime
+from certificate_record import CertificateRecord
+from certificate_reconcile import reconcile_certificates, summarize_reconciliation, create_oci_pem_fingerprint, \
+    normalize_hex
+
+JANUARY = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+JUNE = datetime.datetime(2026, 6, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_record(id, common_name, serial_number=None, not_after=JANUARY):
+    return CertificateRecord(id=id, name=id, compartment_id="c", region_key="phx", common_name=common_name,
+                             not_after=int(not_after.timestamp()), lifecycle_state="ACTIVE",
+                             serial_number=serial_number)
+
+
+def make_tlm(common_name, serial_number, valid_to, thumbprint=None):
+    return {"common_name": common_name, "serial_number": serial_number, "valid_to": valid_to,
+            "thumbprint": thumbprint}
+
+
+def get_pairs(results):
+    return {category: [(entry["oci"].id if entry["oci"] else None,
+                        entry["tlm"]["serial_number"] if entry["tlm"] else None) for entry in entries]
+            for category, entries in results.items()}
+
+
+def test_categories():
+    tlm = [make_tlm("a.example.com", "0A", "2026-01-01T00:00:00Z"),
+           make_tlm("b.example.com", "0B", "2026-01-01T00:00:00Z"),
+           make_tlm("b.example.com", "1B", "2026-06-01T00:00:00Z"),
+           make_tlm("c.example.com", "0C", "2026-06-01T00:00:00Z"),
+           make_tlm("d.example.com", "0D", "2026-06-01T00:00:00Z")]
+    oci = [make_record("a", "A.example.com", "0a"),
+           # Holds the older TLM issuance of its common name
+           make_record("b", "b.example.com", "0b"),
+           # Unknown serial but expires before the latest TLM issuance
+           make_record("c", "c.example.com", "ff", JANUARY),
+           make_record("e", "e.example.com", "0e")]
+    results = reconcile_certificates(tlm, oci)
+    assert get_pairs(results) == {"matched": [("a", "0A")],
+                                  "stale_in_oci": [("b", "1B"), ("c", "0C")],
+                                  "missing_in_oci": [(None, "0D")],
+                                  "orphaned": [("e", None)]}
+    assert summarize_reconciliation(results) == {"matched": 1, "stale_in_oci": 2, "missing_in_oci": 1, "orphaned": 1}
+
+
+class FakeOCICertificates:
+
+    def __init__(self, pems):
+        self.pems = pems
+        self.requested = []
+
+    def get_oci_certificate_pem(self, certificate_id, region):
+        self.requested.append((certificate_id, region))
+        if certificate_id not in self.pems:
+            raise RuntimeError("not found")
+        return self.pems[certificate_id]
+
+
+def test_fingerprint_matches_certificates_without_a_known_serial():
+    der = b"certificate"
+    pem = "-----BEGIN CERTIFICATE-----\n" + base64.b64encode(der).decode() + "\n-----END CERTIFICATE-----\n"
+    thumbprint = ":".join(f"{byte:02X}" for byte in hashlib.sha1(der).digest())
+    tlm = [make_tlm("a.example.com", "0A", "2026-06-01T00:00:00Z", thumbprint)]
+    oci_certs = FakeOCICertificates({"a": pem})
+    oci = [make_record("a", "a.example.com", None, JUNE), make_record("b", "b.example.com", None)]
+
+    results = reconcile_certificates(tlm, oci, oci_fingerprint=create_oci_pem_fingerprint(oci_certs))
+    assert get_pairs(results)["matched"] == [("a", "0A")]
+    assert get_pairs(results)["orphaned"] == [("b", None)]
+    assert oci_certs.requested == [("a", "phx"), ("b", "phx")]
+
+    # Without the fingerprint the certificate only matches by common name
+    results = reconcile_certificates(tlm, oci)
+    assert get_pairs(results)["matched"] == []
+    assert get_pairs(results)["missing_in_oci"] == [(None, "0A")]
+
+
+def test_normalize_hex():
+    assert normalize_hex("00:0A:ff") == normalize_hex("aff") == "aff"
+    assert normalize_hex("00") == "0"
+    assert normalize_hex(None) is None
@@ -0,0 +1,61 @@
+import datetime
+import json
+import pytest
+from oci.certificates_management.models import Certificate, CertificateSubject, \
+    CertificateSubjectAlternativeName, CertificateSummary, CertificateVersionSummary, Validity
+from certificate_record import CertificateRecord
+
+NOT_AFTER = datetime.datetime(2026, 11, 1, tzinfo=datetime.timezone.utc)
+
+
+def create_version():
+    return CertificateVersionSummary(
+        serial_number="0a", validity=Validity(time_of_validity_not_after=NOT_AFTER),
+        subject_alternative_names=[CertificateSubjectAlternativeName(type="DNS", value="alt.example.com"),
+                                   CertificateSubjectAlternativeName(type="DNS", value=None)])
+
+
+def test_from_summary():
+    record = CertificateRecord.from_summary(CertificateSummary(
+        id="ocid1.certificate.oc1.phx.a", name="a", compartment_id="ocid1.compartment.oc1..a",
+        lifecycle_state="ACTIVE", subject=CertificateSubject(common_name="a.example.com"),
+        current_version_summary=create_version()))
+    assert record.region_key == "phx"
+    assert record.common_name == "a.example.com"
+    assert record.not_after == int(NOT_AFTER.timestamp())
+    assert record.get_not_after_datetime() == NOT_AFTER
+    assert record.sans == ("alt.example.com",)
+    assert record.serial_number == "0a"
+
+
+def test_from_full_certificate_and_without_version():
+    record = CertificateRecord.from_summary(Certificate(
+        id="ocid1.certificate.oc1.iad.b", name="b", compartment_id="c", lifecycle_state="ACTIVE",
+        current_version=create_version()))
+    assert record.not_after == int(NOT_AFTER.timestamp())
+    assert record.common_name is None
+    record = CertificateRecord.from_summary(CertificateSummary(
+        id="ocid1.certificate.oc1.iad.c", name="c", compartment_id="c", lifecycle_state="PENDING_DELETION"))
+    assert record.not_after is None and record.get_not_after_datetime() is None
+    assert record.sans == ()
+
+
+def test_dict_round_trip():
+    record = CertificateRecord("ocid1.certificate.oc1.phx.a", "a", "c", "phx", "a.example.com", 1900000000,
+                               "ACTIVE", ("alt.example.com",), "0a")
+    data = json.loads(json.dumps(record.to_dict()))
+    assert data['sans'] == ["alt.example.com"]
+    restored = CertificateRecord.from_dict(data)
+    assert restored.to_dict() == record.to_dict()
+
+
+def test_view_reads_the_record():
+    record = CertificateRecord("ocid1.certificate.oc1.phx.a", "a", "c", "phx", "a.example.com", 1900000000, "ACTIVE")
+    view = record.as_dict()
+    assert list(view) == list(CertificateRecord.__slots__)
+    assert len(view) == len(CertificateRecord.__slots__)
+    record.lifecycle_state = "PENDING_DELETION"
+    assert view['lifecycle_state'] == "PENDING_DELETION"
+    assert dict(view)['common_name'] == "a.example.com"
+    with pytest.raises(KeyError):
+        view['subject']
@@ -0,0 +1,102 @@
+import base64
+import threading
+from certificate_record import CertificateRecord
+from certificate_upload_pipeline import CertificateUploadPipeline, pem_fingerprint
+
+REGIONS = {"phx": "us-phoenix-1", "us-phoenix-1": "us-phoenix-1"}
+
+
+def make_pem(content):
+    body = base64.b64encode(content.encode()).decode()
+    return f"-----BEGIN CERTIFICATE-----\n{body}\n-----END CERTIFICATE-----\n"
+
+
+class FakeCreated:
+
+    def __init__(self, id):
+        self.id = id
+
+
+class FakeOCICertificates:
+
+    def __init__(self, records, pems):
+        self.records = records
+        self.pems = pems
+        self.lock = threading.Lock()
+        self.created = []
+        self.updated = []
+
+    def get_oci_certificates(self):
+        return self.records
+
+    def get_region_name(self, region_key):
+        return REGIONS.get(region_key)
+
+    def get_oci_certificate_pem(self, certificate_id, region):
+        return self.pems[certificate_id]
+
+    def update_oci_imported_certificate(self, certificate_id, region, cert_chain, certificate_pem, private_key_pem):
+        with self.lock:
+            self.updated.append(certificate_id)
+
+    def add_new_oci_imported_certificate(self, name, compartment_id, region, cert_chain, certificate_pem,
+                                         private_key_pem):
+        with self.lock:
+            self.created.append(name)
+            return FakeCreated(f"ocid1.certificate.oc1.phx.new-{name}")
+
+
+def make_record(id, name, lifecycle_state="ACTIVE"):
+    return CertificateRecord(id=id, name=name, compartment_id="c", region_key="phx", common_name=name,
+                             not_after=None, lifecycle_state=lifecycle_state)
+
+
+def make_bundle(name, content, **fields):
+    return dict({"name": name, "compartment_id": "c", "region": "phx", "cert_chain": "",
+                 "certificate_pem": make_pem(content), "private_key_pem": "key"}, **fields)
+
+
+def create_oci():
+    records = [make_record("ocid1.certificate.oc1.phx.same", "same"),
+               make_record("ocid1.certificate.oc1.phx.old", "changed"),
+               make_record("ocid1.certificate.oc1.phx.deleted", "deleted", "PENDING_DELETION")]
+    pems = {"ocid1.certificate.oc1.phx.same": make_pem("same"),
+            "ocid1.certificate.oc1.phx.old": make_pem("old"),
+            "ocid1.certificate.oc1.phx.deleted": make_pem("deleted")}
+    return FakeOCICertificates(records, pems)
+
+
+def test_pem_fingerprint():
+    assert pem_fingerprint(make_pem("a")) == pem_fingerprint("chain\n" + make_pem("a") + make_pem("b"))
+    assert pem_fingerprint(make_pem("a")) != pem_fingerprint(make_pem("b"))
+    assert pem_fingerprint(None) is None
+
+
+def test_run_creates_updates_and_skips_unchanged():
+    oci = create_oci()
+    bundles = [make_bundle("same", "same"), make_bundle("changed", "new"), make_bundle("deleted", "deleted"),
+               make_bundle("fresh", "fresh"), make_bundle("elsewhere", "x", region="mars")]
+    report = CertificateUploadPipeline(oci, max_workers=4).run(bundles)
+    assert [result['status'] for result in report] == ["unchanged", "updated", "created", "created", "failed"]
+    assert oci.updated == ["ocid1.certificate.oc1.phx.old"]
+    # A certificate pending deletion is not updated, a new one is created
+    assert sorted(oci.created) == ["deleted", "fresh"]
+    assert report[2]['certificate_id'] == "ocid1.certificate.oc1.phx.new-deleted"
+    assert "not subscribed" in report[4]['error']
+
+
+def test_journal_resumes_completed_bundles(tmp_path):
+    journal_path = str(tmp_path / "journal.jsonl")
+    bundles = [make_bundle("changed", "new"), make_bundle("fresh", "fresh")]
+    CertificateUploadPipeline(create_oci(), journal_path=journal_path).run(bundles)
+
+    oci = create_oci()
+    bundles.append(make_bundle("other", "other"))
+    report = CertificateUploadPipeline(oci, journal_path=journal_path).run(bundles)
+    assert [result['status'] for result in report] == ["resumed", "resumed", "created"]
+    assert report[1]['certificate_id'] == "ocid1.certificate.oc1.phx.new-fresh"
+    assert oci.updated == [] and oci.created == ["other"]
+
+    # A changed certificate is uploaded again
+    report = CertificateUploadPipeline(oci, journal_path=journal_path).run([make_bundle("changed", "newer")])
+    assert [result['status'] for result in report] == ["updated"]
@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import pytest
+from collection import CERTIFICATE_ID, SimulatedClientFactory, SimulatedTenancy
+from certificate_events import CertificateEventProcessor
+from certificate_watch import CertificateWatcher, create_http_server
+from oci_certificates import OCICertificates
+from request_scheduler import RequestScheduler
+
+
+##########################################################################
+# Inventory recording the refreshes asked for, refreshes of the failing
+# regions report them as not collected
+##########################################################################
+class FakeInventory:
+
+    def __init__(self, fetched_at, failing_regions=()):
+        self.fetched_at = fetched_at
+        self.failing_regions = set(failing_regions)
+        self.refreshes = []
+
+    def get_regions(self):
+        return list(self.fetched_at)
+
+    def get_region_name(self, region):
+        return region if region in self.fetched_at else None
+
+    def get_region_fetched_at(self):
+        return self.fetched_at
+
+    def refresh(self, regions, full=False):
+        self.refreshes.append((regions, full))
+        return {region: region not in self.failing_regions for region in regions}
+
+    def get_oci_certificates(self):
+        return []
+
+    def get_oci_certificates_near_expiration(self):
+        return []
+
+    def get_errors(self):
+        return []
+
+
+def test_run_once_refreshes_due_regions_and_full_sweeps():
+    start = time.time()
+    inventory = FakeInventory({"r1": start, "r2": start}, failing_regions={"r1"})
+    refreshed = []
+    watcher = CertificateWatcher(inventory, interval_seconds=100, full_sweep_seconds=1000,
+                                 region_intervals={"r2": 50, "unknown": 5}, on_refresh=refreshed.append)
+
+    assert watcher.run_once(now=start) == {}
+    assert watcher.run_once(now=start + 60) == {"r2": True}
+    assert watcher.run_once(now=start + 2000) == {"r1": False, "r2": True}
+    assert inventory.refreshes == [(["r2"], False), (["r1", "r2"], True)]
+    # Only regions that were collected are passed on
+    assert refreshed == [["r2"], ["r2"]]
+
+    status = watcher.get_status()
+    assert (status['refreshes'], status['full_sweeps'], status['failed_region_refreshes']) == (2, 1, 1)
+    assert status['last_refresh']['full'] is True
+    assert {region: values['interval_seconds'] for region, values in status['regions'].items()} == \
+        {"r1": 100, "r2": 50}
+    # The full sweep pushed every region's next refresh out
+    assert watcher.run_once(now=time.time() + 40) == {}
+
+
+def test_start_and_stop():
+    watcher = CertificateWatcher(FakeInventory({"r1": time.time()}), interval_seconds=3600)
+    watcher.start()
+    watcher.stop(timeout=5)
+    assert watcher.get_status()['refreshes'] == 0
+
+
+@pytest.fixture
+def server():
+    tenancy = SimulatedTenancy(regions=2, compartments=2, certificates=40, page_size=7)
+    oci_certs = OCICertificates(config={}, signer=None, client_factory=SimulatedClientFactory(tenancy), max_workers=2,
+                                scheduler=RequestScheduler(rate_per_second=1e9, burst=10 ** 9, backoff_seconds=0))
+    watcher = CertificateWatcher(oci_certs)
+    server = create_http_server(watcher, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield oci_certs, server
+    server.shutdown()
+    server.server_close()
+
+
+def get_json(server, path):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}{path}", timeout=5) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_http_endpoints_follow_applied_events(server):
+    oci_certs, server = server
+    status, data = get_json(server, "/status")
+    assert status == 200 and data['certificates'] == 40 and data['errors'] == []
+    status, data = get_json(server, "/cname?name=host0.example.com&name=alt1.example.com&sans=true")
+    assert status == 200
+    assert [cert['id'] for cert in data['host0.example.com']] == [CERTIFICATE_ID.format("r00", 0)]
+    assert [cert['id'] for cert in data['alt1.example.com']] == [CERTIFICATE_ID.format("r01", 1)]
+    status, data = get_json(server, "/near-expiry")
+    assert status == 200 and len(data) == len(oci_certs.get_oci_certificates_near_expiration())
+    status, data = get_json(server, "/expiry-buckets")
+    assert status == 200 and "0" in data
+    assert get_json(server, "/cname")[0] == 400
+    assert get_json(server, "/unknown")[0] == 404
+
+    # A deleted certificate is gone from the served inventory right away
+    event = {"eventType": "com.oraclecloud.certificatesmanagement.deletecertificate",
+             "data": {"resourceId": CERTIFICATE_ID.format("r00", 0)}}
+    list(CertificateEventProcessor(oci_certs).apply_events([event]))
+    assert get_json(server, "/cname?name=host0.example.com")[1] == {"host0.example.com": []}
+    assert get_json(server, "/status")[1]['certificates'] == 39
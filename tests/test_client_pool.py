@@ -0,0 +1,103 @@
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+from client_pool import ClientPool
+from regional_clients import RegionalClientFactory
+
+
+def test_clients_and_credentials_are_reused():
+    pool = ClientPool()
+    assert pool.get_credentials(lambda: ("config", "signer")) == ("config", "signer")
+    assert pool.get_credentials(lambda: ("other", "signer")) == ("config", "signer")
+    client = pool.get_client("identity", "us-phoenix-1", object)
+    assert pool.get_client("identity", "us-phoenix-1", object) is client
+    assert pool.get_client("identity", "us-ashburn-1", object) is not client
+    stats = pool.get_stats()
+    assert (stats['credential_hits'], stats['credential_misses']) == (1, 1)
+    assert (stats['client_hits'], stats['client_misses'], stats['clients']) == (1, 2, 2)
+    assert stats['client_reuse_rate'] == 0.333
+
+
+def test_refresh_and_invalidate_drop_the_clients():
+    pool = ClientPool()
+    pool.get_credentials(lambda: ("config", 1))
+    client = pool.get_client("identity", "us-phoenix-1", object)
+    assert pool.get_credentials(lambda: ("config", 2), max_age_seconds=0) == ("config", 2)
+    assert pool.get_stats()['credential_refreshes'] == 1
+    refreshed = pool.get_client("identity", "us-phoenix-1", object)
+    assert refreshed is not client
+
+    pool.invalidate()
+    assert pool.get_stats()['clients'] == 0
+    assert pool.get_credentials(lambda: ("config", 3)) == ("config", 3)
+    assert pool.get_client("identity", "us-phoenix-1", object) is not refreshed
+
+
+def test_clients_are_built_outside_the_pool_lock():
+    pool = ClientPool()
+    building = threading.Event()
+    release = threading.Event()
+    builds = []
+
+    def slow_factory():
+        builds.append("slow")
+        building.set()
+        assert release.wait(5)
+        return "slow client"
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        slow = executor.submit(pool.get_client, "certificates", "us-phoenix-1", slow_factory)
+        assert building.wait(5)
+        waiting = executor.submit(pool.get_client, "certificates", "us-phoenix-1", lambda: builds.append("again"))
+        # Other clients are built and the pool stays usable while one builds
+        assert pool.get_client("identity", "us-phoenix-1", lambda: "fast client") == "fast client"
+        assert pool.get_stats()['clients'] == 1
+        release.set()
+        assert slow.result(5) == waiting.result(5) == "slow client"
+    assert builds == ["slow"]
+
+
+def test_client_built_across_an_invalidation_is_not_pooled():
+    pool = ClientPool()
+
+    def factory():
+        pool.invalidate()
+        return object()
+
+    stale = pool.get_client("identity", "us-phoenix-1", factory)
+    assert pool.get_stats()['clients'] == 0
+    assert pool.get_client("identity", "us-phoenix-1", object) is not stale
+
+
+class FakeClient:
+
+    def __init__(self, config, signer):
+        self.config = config
+        self.signer = signer
+        self.base_client = types.SimpleNamespace(session=types.SimpleNamespace(proxies={}))
+
+
+def test_regions_get_their_own_config_and_signer_copies():
+    config = {"region": "us-phoenix-1", "tenancy": "ocid1.tenancy.oc1..a"}
+    signer = types.SimpleNamespace(region_name="us-phoenix-1")
+    factory = RegionalClientFactory(config, signer, proxy="http://proxy:80")
+    ashburn = factory.create_client(FakeClient, "us-ashburn-1")
+    frankfurt = factory.create_client(FakeClient, "eu-frankfurt-1")
+
+    assert (ashburn.config['region'], ashburn.signer.region_name) == ("us-ashburn-1", "us-ashburn-1")
+    assert (frankfurt.config['region'], frankfurt.signer.region_name) == ("eu-frankfurt-1", "eu-frankfurt-1")
+    assert ashburn.base_client.session.proxies == {'https': "http://proxy:80"}
+    # The caller's config and signer are left alone and a region reuses its signer copy
+    assert config['region'] == signer.region_name == "us-phoenix-1"
+    assert factory.get_region_signer("us-ashburn-1") is ashburn.signer
+    assert factory.get_home_region() == "us-phoenix-1"
+    assert factory.get_tenancy_id() == "ocid1.tenancy.oc1..a"
+
+
+def test_pooled_regional_clients():
+    pool = ClientPool()
+    factory = RegionalClientFactory({"region": "us-phoenix-1"}, types.SimpleNamespace(), client_pool=pool)
+    client = factory.get_client("identity", FakeClient, "us-ashburn-1")
+    assert factory.get_client("identity", FakeClient, "us-ashburn-1") is client
+    assert RegionalClientFactory({"region": "us-phoenix-1"}, types.SimpleNamespace()) \
+        .get_client("identity", FakeClient, "us-ashburn-1") is not client
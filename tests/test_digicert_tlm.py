@@ -0,0 +1,91 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pytest
+import requests
+from digicert_tlm import DigiCertTLM
+
+TOTAL = 250
+PAGE_CAP = 50
+
+
+##########################################################################
+# Certificate search serving TOTAL certificates, never more than PAGE_CAP
+# per page whatever limit is asked for
+##########################################################################
+class CappedSearchHandler(BaseHTTPRequestHandler):
+    include_total = True
+
+    def do_GET(self):
+        if self.headers.get('x-api-key') != "test":
+            self.send_response(401)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        query = parse_qs(urlparse(self.path).query)
+        offset = int(query['offset'][0])
+        limit = min(int(query['limit'][0]), PAGE_CAP)
+        page = {"items": [{"id": str(i)} for i in range(offset, min(offset + limit, TOTAL))]}
+        if self.include_total:
+            page['total'] = TOTAL
+        body = json.dumps(page).encode('utf8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(params=[True, False], ids=["total", "no-total"])
+def tlm_server(request):
+    handler_class = type("Handler", (CappedSearchHandler,), {"include_total": request.param})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_iter_certificates_follows_capped_pages(tlm_server, max_workers):
+    tlm = DigiCertTLM(server=tlm_server, api_key="test", page_size=100, max_workers=max_workers, timeout=5)
+    ids = [cert['id'] for cert in tlm.iter_certificates()]
+    assert ids == [str(i) for i in range(TOTAL)]
+
+
+def test_injected_session_gets_the_api_key(tlm_server):
+    tlm = DigiCertTLM(server=tlm_server, api_key="test", session=requests.Session(), timeout=5)
+    assert len(list(tlm.iter_certificates())) == TOTAL
+
+
+##########################################################################
+# Session whose first get calls fail to connect
+##########################################################################
+class FlakySession(requests.Session):
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def get(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise requests.ConnectionError("connection reset")
+        return super().get(*args, **kwargs)
+
+
+def test_connection_errors_are_retried(tlm_server):
+    tlm = DigiCertTLM(server=tlm_server, api_key="test", session=FlakySession(2), backoff_seconds=0, timeout=5)
+    assert len(list(tlm.iter_certificates())) == TOTAL
+
+
+def test_connection_errors_are_raised_after_max_retries(tlm_server):
+    tlm = DigiCertTLM(server=tlm_server, api_key="test", session=FlakySession(3), max_retries=2, backoff_seconds=0,
+                      timeout=5)
+    with pytest.raises(requests.ConnectionError):
+        list(tlm.iter_certificates())
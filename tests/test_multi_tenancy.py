@@ -0,0 +1,61 @@
+import os
+import oci
+import multi_tenancy
+from multi_tenancy import merge_tenancy_results, parse_tenancy_targets, scan_tenancies, scan_tenancy
+
+
+##########################################################################
+# Scan functions run in pool worker processes, so they are module level
+##########################################################################
+def fake_scan(target, options):
+    if target['name'] == "crashing":
+        os._exit(1)
+    if target['name'] == "failing":
+        raise ValueError("bad config")
+    return {"name": target['name'], "profile": target['profile'], "config_file": target['config_file'],
+            "status": "Success", "error": None, "tenancy_id": f"ocid1.tenancy.oc1..{target['name']}",
+            "certificates": options['certificates'], "region_errors": [],
+            "near_expiration": [{"id": target['name'], "expiration_date": f"2026-01-0{len(target['name']) % 9 + 1}"}],
+            "expiry_buckets": {0: 1, 30: 2}, "seconds": 0.1}
+
+
+def make_target(name):
+    return {"name": name, "config_file": "~/.oci/config", "profile": name}
+
+
+def test_crashed_worker_only_fails_its_tenancy():
+    targets = [make_target(name) for name in ["a", "crashing", "bb", "ccc"]]
+    results = {result['name']: result for result in scan_tenancies(targets, 2, {"certificates": 3}, fake_scan)}
+    assert sorted(results) == ["a", "bb", "ccc", "crashing"]
+    assert results['crashing']['status'] == "Error"
+    assert "BrokenProcessPool" in results['crashing']['error']
+    assert all(results[name]['status'] == "Success" for name in ["a", "bb", "ccc"])
+
+    report = merge_tenancy_results(results.values())
+    assert report['totals'] == {"tenancies": 4, "failed": 1, "certificates": 9, "near_expiration": 3}
+    assert report['failed_tenancies'] == ["crashing"]
+    assert report['expiry_buckets'] == {0: 3, 30: 6}
+    assert [record['tenancy'] for record in report['near_expiration']] == ["a", "bb", "ccc"]
+
+
+def test_errors_stay_with_their_tenancy(monkeypatch):
+    targets = [make_target("failing"), make_target("a")]
+    results = {result['name']: result for result in scan_tenancies(targets, 2, {"certificates": 1}, fake_scan)}
+    assert results['failing']['status'] == "Error" and "bad config" in results['failing']['error']
+    assert results['a']['status'] == "Success"
+
+    def failing_signer(target):
+        raise RuntimeError("no key file")
+    monkeypatch.setattr(multi_tenancy, "create_target_signer", failing_signer)
+    result = scan_tenancy(make_target("a"))
+    assert (result['status'], result['error']) == ("Error", "RuntimeError: no key file")
+
+
+def test_parse_tenancy_targets(tmp_path):
+    config_file = tmp_path / "config"
+    config_file.write_text("[DEFAULT]\nregion=us-phoenix-1\n[A]\nregion=us-ashburn-1\n")
+    targets = parse_tenancy_targets(["A"], [str(config_file)], all_profiles=True)
+    # Repeated names get their config file added
+    assert [(target['name'], target['config_file'], target['profile']) for target in targets] == \
+        [("A", oci.config.DEFAULT_LOCATION, "A"), (f"{config_file}:A", str(config_file), "A"),
+         ("DEFAULT", str(config_file), "DEFAULT")]
@@ -0,0 +1,267 @@
+import datetime
+import json
+import threading
+import oci
+import pytest
+from collection import COMPARTMENT_ID, SimulatedClientFactory, SimulatedTenancy
+from oci_certificates import OCICertificates
+from request_scheduler import RequestScheduler
+
+
+##########################################################################
+# Simulated clients whose calls fail for the given regions or compartments
+##########################################################################
+class FailingClient:
+
+    def __init__(self, client, fail):
+        self.__client = client
+        self.__fail = fail
+
+    def __getattr__(self, name):
+        call = getattr(self.__client, name)
+
+        def failing_call(*args, **kwargs):
+            if self.__fail(kwargs):
+                raise oci.exceptions.ServiceError(400, "InvalidParameter", {}, "Simulated failure")
+            return call(*args, **kwargs)
+        return failing_call
+
+
+class FailingClientFactory(SimulatedClientFactory):
+
+    def __init__(self, tenancy, failing_compartments=(), failing_regions=()):
+        super().__init__(tenancy)
+        self.failing_compartments = set(failing_compartments)
+        self.failing_regions = set(failing_regions)
+
+    def get_client(self, name, client_class, region):
+        client = super().get_client(name, client_class, region)
+        if name == "resource_search":
+            return FailingClient(client, lambda kwargs: region in self.failing_regions)
+        if name == "certificates_management":
+            return FailingClient(client, lambda kwargs: kwargs.get('compartment_id') in self.failing_compartments)
+        return client
+
+
+@pytest.fixture
+def tenancy():
+    return SimulatedTenancy(regions=3, compartments=4, certificates=120, page_size=7)
+
+
+def collect(factory, **kwargs):
+    return OCICertificates(config={}, signer=None, client_factory=factory, max_workers=4,
+                           scheduler=RequestScheduler(rate_per_second=1e9, burst=10 ** 9, backoff_seconds=0), **kwargs)
+
+
+def get_ids(oci_certs):
+    return [cert.id for cert in oci_certs.get_oci_certificates()]
+
+
+def test_failed_compartment_is_isolated(tenancy):
+    failing = COMPARTMENT_ID.format(1)
+    oci_certs = collect(FailingClientFactory(tenancy, failing_compartments=[failing]))
+    certificates = oci_certs.get_oci_certificates()
+    assert len(certificates) == 90
+    assert failing not in {cert.compartment_id for cert in certificates}
+    errors = oci_certs.get_errors()
+    assert {(error['region'], error['compartment'], error['status']) for error in errors} == \
+        {(region_name, failing, 400) for region_name, _ in tenancy.regions}
+
+
+def test_incremental_collection_keeps_the_baseline_of_failed_compartments(tenancy):
+    previous = collect(SimulatedClientFactory(tenancy)).get_oci_certificates()
+    failing = COMPARTMENT_ID.format(2)
+    oci_certs = collect(FailingClientFactory(tenancy, failing_compartments=[failing]),
+                        changed_since=datetime.datetime.now(datetime.timezone.utc), previous_certificates=previous)
+    assert sorted(get_ids(oci_certs)) == sorted(cert.id for cert in previous)
+    assert oci_certs.get_errors()
+
+
+##########################################################################
+# Simulated tenancy with deleted and renewed certificates, the search for
+# changes returns only the renewed ones
+##########################################################################
+class ChangingTenancy(SimulatedTenancy):
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.deleted = set()
+        self.renewed = set()
+        self.listed = []
+
+    def get_certificate_numbers(self, region_number, compartment_number):
+        return [number for number in super().get_certificate_numbers(region_number, compartment_number)
+                if number not in self.deleted]
+
+    def create_summary(self, number):
+        summary = super().create_summary(number)
+        if number in self.renewed:
+            summary.current_version_summary.validity.time_of_validity_not_after += datetime.timedelta(days=365)
+        return summary
+
+    def create_client(self, name, region):
+        client = super().create_client(name, region)
+        if name == "resource_search":
+            return ChangeSearchClient(self, client)
+        if name == "certificates_management":
+            return ListRecordingClient(self, client)
+        return client
+
+
+class ChangeSearchClient:
+
+    def __init__(self, tenancy, client):
+        self.__tenancy = tenancy
+        self.__client = client
+
+    def search_resources(self, search_details, **kwargs):
+        response = self.__client.search_resources(search_details, **kwargs)
+        if "timeUpdated" in search_details.query:
+            response.data.items = [item for item in response.data.items
+                                   if int(item.identifier.split("simulated")[1]) in self.__tenancy.renewed]
+        return response
+
+
+class ListRecordingClient:
+
+    def __init__(self, tenancy, client):
+        self.__tenancy = tenancy
+        self.__client = client
+
+    def list_certificates(self, compartment_id=None, page=None, **kwargs):
+        if page is None:
+            self.__tenancy.listed.append(compartment_id)
+        return self.__client.list_certificates(compartment_id=compartment_id, page=page, **kwargs)
+
+
+def test_incremental_collection_finds_renewals_and_deletions():
+    tenancy = ChangingTenancy(regions=3, compartments=4, certificates=120, page_size=7)
+    factory = SimulatedClientFactory(tenancy)
+    previous = collect(factory).get_oci_certificates()
+    # Certificates 0 and 3 are in the first region's compartments 0 and 1
+    tenancy.renewed.add(0)
+    tenancy.deleted.add(3)
+    tenancy.listed = []
+    oci_certs = collect(factory, changed_since=datetime.datetime.now(datetime.timezone.utc),
+                        previous_certificates=previous)
+    assert sorted(tenancy.listed) == [COMPARTMENT_ID.format(0), COMPARTMENT_ID.format(1)]
+    certificates = {cert.id: cert for cert in oci_certs.get_oci_certificates()}
+    previous_by_id = {cert.id: cert for cert in previous}
+    assert set(certificates) == set(previous_by_id) - {"ocid1.certificate.oc1.r00.simulated3"}
+    renewed_id = "ocid1.certificate.oc1.r00.simulated0"
+    assert certificates[renewed_id].not_after == previous_by_id[renewed_id].not_after + 365 * 86400
+    assert oci_certs.get_region_timings()['sim-region-0']['incremental']
+
+
+def test_cname_lookups_return_plain_dicts(tenancy):
+    oci_certs = collect(SimulatedClientFactory(tenancy))
+    common_name = tenancy.get_common_name(5)
+    matches = oci_certs.get_oci_certificates_with_cname(common_name)
+    assert [type(match) for match in matches] == [dict]
+    assert matches[0]['id'] == "ocid1.certificate.oc1.r02.simulated5"
+    by_name = oci_certs.get_oci_certificates_with_cnames([common_name, "alt5.example.com"], include_sans=True)
+    assert json.loads(json.dumps(by_name)) == {common_name: matches, "alt5.example.com": matches}
+
+
+def get_expected_ids(tenancy, regions=None):
+    compartment_ids = sorted(COMPARTMENT_ID.format(number) for number in range(tenancy.compartments))
+    return [f"ocid1.certificate.oc1.{region_key.lower()}.simulated{number}"
+            for region_number, (region_name, region_key) in enumerate(tenancy.regions)
+            if regions is None or region_name in regions
+            for compartment_id in compartment_ids
+            for number in tenancy.get_certificate_numbers(region_number,
+                                                          int(compartment_id[len(COMPARTMENT_ID.format("")):]))]
+
+
+@pytest.mark.parametrize("max_workers", [1, 8])
+def test_collection_order_is_deterministic(max_workers):
+    tenancy = SimulatedTenancy(regions=3, compartments=12, certificates=300, page_size=7, latency_seconds=0.001)
+    oci_certs = OCICertificates(config={}, signer=None, client_factory=SimulatedClientFactory(tenancy),
+                                max_workers=max_workers,
+                                scheduler=RequestScheduler(rate_per_second=1e9, burst=10 ** 9))
+    assert get_ids(oci_certs) == get_expected_ids(tenancy)
+    assert set(oci_certs.get_region_timings()) == {region_name for region_name, _ in tenancy.regions}
+
+
+def test_failed_region_is_isolated(tenancy):
+    oci_certs = collect(FailingClientFactory(tenancy, failing_regions=["sim-region-1"]))
+    assert get_ids(oci_certs) == get_expected_ids(tenancy, {"sim-region-0", "sim-region-2"})
+    assert [(error['id'], error['region']) for error in oci_certs.get_errors()] == \
+        [("search_resources", "sim-region-1")]
+
+
+class NotReadyIdentityClient:
+
+    def __init__(self, client):
+        self.__client = client
+
+    def get_tenancy(self, *args, **kwargs):
+        return self.__client.get_tenancy(*args, **kwargs)
+
+    def list_region_subscriptions(self, *args, **kwargs):
+        response = self.__client.list_region_subscriptions(*args, **kwargs)
+        response.data[1].status = "IN_PROGRESS"
+        return response
+
+
+class NotReadyClientFactory(SimulatedClientFactory):
+
+    def get_client(self, name, client_class, region):
+        client = super().get_client(name, client_class, region)
+        return NotReadyIdentityClient(client) if name == "identity" else client
+
+
+def test_regions_that_are_not_ready_are_skipped(tenancy):
+    oci_certs = collect(NotReadyClientFactory(tenancy))
+    assert oci_certs.get_regions() == ["sim-region-0", "sim-region-2"]
+    assert get_ids(oci_certs) == get_expected_ids(tenancy, {"sim-region-0", "sim-region-2"})
+    assert not oci_certs.get_errors()
+
+
+##########################################################################
+# Simulated tenancy whose searches wait for release once blocking is set
+##########################################################################
+class BlockingTenancy(SimulatedTenancy):
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.blocking = False
+        self.searching = threading.Event()
+        self.release = threading.Event()
+
+    def create_client(self, name, region):
+        client = super().create_client(name, region)
+        if name != "resource_search":
+            return client
+        tenancy = self
+
+        class BlockingSearchClient:
+            def search_resources(self, *args, **kwargs):
+                if tenancy.blocking:
+                    tenancy.searching.set()
+                    tenancy.release.wait(10)
+                return client.search_resources(*args, **kwargs)
+        return BlockingSearchClient()
+
+
+def test_refresh_does_not_block_events_and_readers():
+    tenancy = BlockingTenancy(regions=3, compartments=4, certificates=120, page_size=7)
+    oci_certs = collect(SimulatedClientFactory(tenancy))
+    tenancy.blocking = True
+    refresh = threading.Thread(target=oci_certs.refresh, kwargs={"regions": ["sim-region-0"], "full": True})
+    refresh.start()
+    try:
+        assert tenancy.searching.wait(5)
+        removed_id = "ocid1.certificate.oc1.r01.simulated1"
+        applied = threading.Thread(target=lambda: (oci_certs.remove_certificate(removed_id),
+                                                   oci_certs.get_oci_certificates_near_expiration()))
+        applied.start()
+        applied.join(5)
+        assert not applied.is_alive()
+        assert removed_id not in get_ids(oci_certs)
+    finally:
+        tenancy.release.set()
+        refresh.join(10)
+    # The change applied during the refresh survives it
+    assert get_ids(oci_certs) == [certificate_id for certificate_id in get_expected_ids(tenancy)
+                                  if certificate_id != removed_id]
@@ -0,0 +1,94 @@
+import asyncio
+import oci
+from collection import SimulatedClientFactory, SimulatedTenancy
+from oci_certificates import OCICertificates
+from oci_certificates_async import AsyncOCICertificates
+from request_scheduler import RequestScheduler, NO_RETRY
+
+
+##########################################################################
+# Simulated clients recording every call's retry strategy, the identity
+# client reports the second region as not READY
+##########################################################################
+class RecordingClient:
+
+    def __init__(self, client, calls):
+        self.__client = client
+        self.__calls = calls
+
+    def __getattr__(self, name):
+        call = getattr(self.__client, name)
+
+        def recording_call(*args, **kwargs):
+            self.__calls.append((name, kwargs.get('retry_strategy')))
+            response = call(*args, **kwargs)
+            if name == "list_region_subscriptions":
+                response.data[1].status = "IN_PROGRESS"
+            return response
+        return recording_call
+
+
+class RecordingClientFactory(SimulatedClientFactory):
+
+    def __init__(self, tenancy):
+        super().__init__(tenancy)
+        self.calls = []
+
+    def get_client(self, name, client_class, region):
+        return RecordingClient(super().get_client(name, client_class, region), self.calls)
+
+
+def create_scheduler():
+    return RequestScheduler(rate_per_second=1e9, burst=10 ** 9, backoff_seconds=0)
+
+
+def test_collect_matches_the_threaded_collector():
+    tenancy = SimulatedTenancy(regions=3, compartments=4, certificates=120, page_size=7)
+    factory = RecordingClientFactory(tenancy)
+    async_certs = AsyncOCICertificates(config={}, signer=None, client_factory=factory, scheduler=create_scheduler())
+    asyncio.run(async_certs.collect())
+    threaded_certs = OCICertificates(config={}, signer=None, client_factory=RecordingClientFactory(tenancy),
+                                     max_workers=4, scheduler=create_scheduler())
+
+    assert async_certs.get_regions() == threaded_certs.get_regions() == ["sim-region-0", "sim-region-2"]
+    assert sorted(cert.id for cert in async_certs.get_oci_certificates()) == \
+        sorted(cert.id for cert in threaded_certs.get_oci_certificates())
+    assert len(async_certs.get_oci_certificates()) == 80
+    assert not async_certs.get_errors()
+    # Every SDK call went through the scheduler without SDK retries
+    assert {strategy for _, strategy in factory.calls} == {NO_RETRY}
+    stats = async_certs.get_scheduler_stats()
+    assert set(stats) == {"sim-region-0/identity", "sim-region-0/resource_search", "sim-region-2/resource_search",
+                          "sim-region-0/certificates_management", "sim-region-2/certificates_management"}
+
+    # Regions and clients are reused on the next collection
+    identity_calls = sum(1 for name, _ in factory.calls if name == "list_region_subscriptions")
+    asyncio.run(async_certs.collect())
+    assert sum(1 for name, _ in factory.calls if name == "list_region_subscriptions") == identity_calls
+    assert len(async_certs.get_oci_certificates()) == 80
+
+
+def test_throttled_calls_are_retried_by_the_scheduler():
+    tenancy = SimulatedTenancy(regions=1, compartments=2, certificates=10, page_size=3)
+    factory = SimulatedClientFactory(tenancy)
+    throttled = []
+    get_client = factory.get_client
+
+    def get_throttled_client(name, client_class, region):
+        client = get_client(name, client_class, region)
+        if name == "certificates_management":
+            list_certificates = client.list_certificates
+
+            def throttled_list_certificates(**kwargs):
+                if not throttled:
+                    throttled.append(kwargs)
+                    raise oci.exceptions.ServiceError(429, "TooManyRequests", {}, "Throttled")
+                return list_certificates(**kwargs)
+            client.list_certificates = throttled_list_certificates
+        return client
+    factory.get_client = get_throttled_client
+
+    async_certs = AsyncOCICertificates(config={}, signer=None, client_factory=factory, scheduler=create_scheduler())
+    asyncio.run(async_certs.collect())
+    assert len(async_certs.get_oci_certificates()) == 10
+    assert async_certs.get_scheduler_stats()["sim-region-0/certificates_management"]["retries"] == 1
@@ -0,0 +1,90 @@
+import oci
+from oci_topic import MessageTemplate, StubNotificationClient, TopicPublisher, TopicRouter, parse_topic_routes
+
+
+def alerts(count, region="us-phoenix-1", compartment_id="ocid1.compartment.oc1..a"):
+    return [{"link": f"https://cloud.oracle.com/certificate/{i}", "expiration_date": "2026-11-01 00:00:00",
+             "region": region, "compartment_id": compartment_id} for i in range(count)]
+
+
+def test_messages_are_chunked_under_the_limit():
+    template = MessageTemplate(max_message_bytes=1000)
+    messages = list(template.build_messages(alerts(100)))
+    assert len(messages) > 1
+    assert all(len(message.encode('utf8')) <= 1000 for message in messages)
+    assert messages[0].startswith("100 certificates near expiration.\n")
+    assert messages[1].startswith("100 certificates near expiration, part 2.\n")
+    assert sum(message.count("Expiration date is") for message in messages) == 100
+
+
+def test_oversized_line_is_cut_at_a_character_boundary():
+    template = MessageTemplate(line="{link}\n", max_message_bytes=100)
+    messages = list(template.build_messages([{"link": "é" * 200}]))
+    assert len(messages) == 1
+    assert 98 <= len(messages[0].encode('utf8')) <= 100
+    assert messages[0].rstrip("é") == "1 certificates near expiration.\n"
+
+
+def test_compartment_route_wins_over_region_route():
+    router = TopicRouter("default", region_topics=parse_topic_routes("us-phoenix-1=phx, us-ashburn-1 = iad"),
+                         compartment_topics=parse_topic_routes("ocid1.compartment.oc1..b=team-b,malformed"))
+    records = alerts(1) + alerts(1, region="us-ashburn-1", compartment_id="ocid1.compartment.oc1..b") + \
+        alerts(1, region="eu-frankfurt-1")
+    assert [router.route(record) for record in records] == ["phx", "team-b", "default"]
+    assert {topic: len(grouped) for topic, grouped in router.group(records).items()} == \
+        {"phx": 1, "team-b": 1, "default": 1}
+
+
+def test_throttled_messages_are_retried():
+    client = StubNotificationClient(fail_first=2)
+    publisher = TopicPublisher(client, max_workers=1, max_retries=3, backoff_seconds=0)
+    results = publisher.publish_alerts({"topic-a": alerts(100), "topic-b": alerts(1)},
+                                       MessageTemplate(max_message_bytes=1000))
+    assert all(result['Status'] == "Success" for result in results)
+    assert results[0]['attempts'] == 3
+    assert len(client.messages) == len(results)
+    assert [message['title'] for message in client.messages[:2]] == \
+        ["Expired Certificates", "Expired Certificates (part 2)"]
+    assert client.messages[-1]['topic_id'] == "topic-b"
+
+
+def test_retries_give_up_after_max_retries():
+    publisher = TopicPublisher(StubNotificationClient(fail_first=10), max_retries=2, backoff_seconds=0)
+    result = publisher.publish("topic-a", "body")
+    assert result['Status'] == "Error"
+    assert result['attempts'] == 3
+
+
+class RejectingNotificationClient:
+
+    def __init__(self):
+        self.calls = 0
+
+    def publish_message(self, topic_id, message_details, **kwargs):
+        self.calls += 1
+        raise oci.exceptions.ServiceError(400, "InvalidParameter", {}, "Rejected")
+
+
+def test_client_errors_are_not_retried():
+    client = RejectingNotificationClient()
+    result = TopicPublisher(client, max_retries=3, backoff_seconds=0).publish("topic-a", "body")
+    assert result['Status'] == "Error"
+    assert client.calls == 1
+
+
+def test_headers_carry_the_total_near_expiration():
+    client = StubNotificationClient()
+    template = MessageTemplate(header="{total} certificates near expiration, {count} new.\n")
+    results = TopicPublisher(client, backoff_seconds=0).publish_alerts(
+        {"topic-a": alerts(2), "topic-b": alerts(1)}, template, total=5)
+    assert all(result['Status'] == "Success" for result in results)
+    assert [message['body'].splitlines()[0] for message in client.messages] == \
+        ["5 certificates near expiration, 2 new.", "5 certificates near expiration, 1 new."]
+
+
+def test_no_alerts_publishes_the_header_only():
+    client = StubNotificationClient()
+    TopicPublisher(client, backoff_seconds=0).publish_alerts({"topic-a": []}, total=3)
+    assert client.messages == [{"topic_id": "topic-a", "title": "Expired Certificates",
+                                "body": "3 certificates near expiration.\n"}]
+    assert list(MessageTemplate().build_messages([])) == ["0 certificates near expiration.\n"]
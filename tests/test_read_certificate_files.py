@@ -0,0 +1,100 @@
+import datetime
+import json
+import os
+import pytest
+import read_certificate_files
+
+x509 = pytest.importorskip("cryptography.x509")
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+
+def write_self_signed(directory, common_name):
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, common_name)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key()) \
+        .serial_number(x509.random_serial_number()).not_valid_before(now) \
+        .not_valid_after(now + datetime.timedelta(days=90)).sign(key, hashes.SHA256())
+    os.makedirs(directory)
+    key_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption()).decode()
+    with open(os.path.join(directory, "cert.pem"), 'w') as cert_file:
+        cert_file.write(cert.public_bytes(serialization.Encoding.PEM).decode())
+    with open(os.path.join(directory, "privkey.pem"), 'w') as key_file:
+        key_file.write(key_pem)
+    return key_pem
+
+
+def test_cache_holds_no_private_keys(tmp_path):
+    key_pem = write_self_signed(str(tmp_path / "tree" / "www"), "www.example.com")
+    cache_file = str(tmp_path / "cache.json")
+    for _ in range(2):
+        bundles = list(read_certificate_files.Certificate_Bundle_Scanner(max_workers=1, cache_file=cache_file)
+                       .scan(str(tmp_path / "tree")))
+        assert [bundle['private_key_pem'] for bundle in bundles] == [key_pem]
+        assert os.stat(cache_file).st_mode & 0o777 == 0o600
+        with open(cache_file) as f:
+            cache = json.load(f)
+        assert "PRIVATE KEY" not in json.dumps(cache)
+
+
+def make_certificate(subject_key, subject, issuer_key, issuer, days=90):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return x509.CertificateBuilder() \
+        .subject_name(x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, subject)])) \
+        .issuer_name(x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, issuer)])) \
+        .public_key(subject_key.public_key()).serial_number(x509.random_serial_number()) \
+        .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=days)) \
+        .sign(issuer_key, hashes.SHA256()).public_bytes(serialization.Encoding.PEM).decode()
+
+
+def write_file(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def scan(directory):
+    return list(read_certificate_files.Certificate_Bundle_Scanner(max_workers=1).scan(str(directory)))
+
+
+def test_chain_waits_for_issuers_found_later(tmp_path):
+    root_key, intermediate_key, issuing_key, leaf_key = [ec.generate_private_key(ec.SECP256R1()) for _ in range(4)]
+    intermediate = make_certificate(intermediate_key, "Intermediate", root_key, "Root")
+    issuing = make_certificate(issuing_key, "Issuing", intermediate_key, "Intermediate")
+    write_file(tmp_path / "a" / "cert.pem", make_certificate(leaf_key, "www.example.com", issuing_key, "Issuing"))
+    write_file(tmp_path / "a" / "chain.pem", issuing)
+    write_file(tmp_path / "a" / "privkey.pem", leaf_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()).decode())
+    write_file(tmp_path / "b" / "intermediate.pem", intermediate)
+    write_file(tmp_path / "c" / "root.pem", make_certificate(root_key, "Root", root_key, "Root"))
+
+    bundles = scan(tmp_path)
+    assert [bundle['common_name'] for bundle in bundles] == ["www.example.com"]
+    assert bundles[0]['cert_chain'] == issuing + intermediate
+
+
+def test_newer_certificate_replaces_yielded_bundle(tmp_path):
+    key = ec.generate_private_key(ec.SECP256R1())
+    key_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption()).decode()
+    write_file(tmp_path / "a" / "cert.pem", make_certificate(key, "www.example.com", key, "www.example.com", 30))
+    write_file(tmp_path / "a" / "privkey.pem", key_pem)
+    newer = make_certificate(key, "www.example.com", key, "www.example.com", 90)
+    write_file(tmp_path / "b" / "cert.pem", newer)
+
+    bundles = scan(tmp_path)
+    assert len(bundles) == 2
+    assert bundles[0]['spki'] == bundles[1]['spki']
+    assert bundles[1]['not_after'] > bundles[0]['not_after']
+    assert bundles[1]['certificate_pem'] == newer
+    assert bundles[1]['private_key_pem'] == key_pem
+
+
+def test_read_private_key_pem(tmp_path):
+    key_pem = write_self_signed(str(tmp_path / "www"), "www.example.com")
+    path = str(tmp_path / "www" / "privkey.pem")
+    fingerprint = [block['fingerprint'] for block in read_certificate_files.parse_pem_file(path)][0]
+    assert read_certificate_files.read_private_key_pem(path, fingerprint) == key_pem
+    assert read_certificate_files.read_private_key_pem(path, "0" * 64) is None
+    assert read_certificate_files.read_private_key_pem(str(tmp_path / "missing.pem"), fingerprint) is None
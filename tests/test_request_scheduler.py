@@ -0,0 +1,101 @@
+import threading
+import time
+import oci
+import pytest
+from request_scheduler import AdaptiveConcurrencyLimit, RequestScheduler, TokenBucket, get_backoff_delay, \
+    is_retryable_error
+
+
+def service_error(status):
+    return oci.exceptions.ServiceError(status, "Error", {}, f"status {status}")
+
+
+def test_token_bucket_waits_once_the_burst_is_spent():
+    bucket = TokenBucket(rate=20, capacity=2)
+    start = time.monotonic()
+    bucket.acquire()
+    bucket.acquire()
+    assert time.monotonic() - start < 0.04
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.04
+
+
+def test_concurrency_limit_halves_on_throttling_once_per_cooldown():
+    limit = AdaptiveConcurrencyLimit(initial=8, cooldown_seconds=60)
+    for _ in range(2):
+        limit.acquire()
+    limit.release(throttled=True)
+    limit.release(throttled=True)
+    assert limit.get_limit() == 4
+
+
+def test_concurrency_limit_grows_by_one_per_window_of_successes():
+    limit = AdaptiveConcurrencyLimit(initial=2, maximum=3)
+    for _ in range(6):
+        limit.acquire()
+        limit.release()
+    assert limit.get_limit() == 3
+
+
+def test_concurrency_limit_blocks_at_the_limit():
+    limit = AdaptiveConcurrencyLimit(initial=1)
+    limit.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (limit.acquire(), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.1)
+    limit.release()
+    assert acquired.wait(1)
+    thread.join()
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (service_error(429), True), (service_error(503), True), (service_error(400), False),
+    (service_error(404), False), (oci.exceptions.RequestException("reset"), True), (ValueError("bug"), False)])
+def test_retry_classification(error, retryable):
+    assert is_retryable_error(error) is retryable
+
+
+def test_backoff_is_capped():
+    assert all(0 <= get_backoff_delay(attempt, 1.0, 5.0) <= 5.0 for attempt in range(10))
+
+
+class FailingCall:
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "done"
+
+
+def test_scheduler_retries_and_counts():
+    scheduler = RequestScheduler(backoff_seconds=0)
+    call = FailingCall(service_error(429), service_error(503))
+    retries = []
+    assert scheduler.call("us-phoenix-1", "search", call, on_retry=retries.append) == "done"
+    assert len(retries) == 2
+    assert scheduler.get_stats()["us-phoenix-1/search"] == {
+        "calls": 3, "throttled": 1, "retries": 2, "failures": 0, "concurrency_limit": 3}
+
+
+def test_scheduler_only_retries_throttled_calls_that_are_not_idempotent():
+    scheduler = RequestScheduler(backoff_seconds=0)
+    assert scheduler.call("r", "s", FailingCall(service_error(429)), idempotent=False) == "done"
+    call = FailingCall(service_error(503))
+    with pytest.raises(oci.exceptions.ServiceError):
+        scheduler.call("r", "s", call, idempotent=False)
+    assert call.calls == 1
+    assert scheduler.get_stats()["r/s"]['failures'] == 1
+
+
+def test_scheduler_gives_up_after_max_retries():
+    scheduler = RequestScheduler(max_retries=2, backoff_seconds=0)
+    call = FailingCall(*[service_error(500)] * 5)
+    with pytest.raises(oci.exceptions.ServiceError):
+        scheduler.call("r", "s", call)
+    assert call.calls == 3